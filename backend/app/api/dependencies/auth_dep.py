@@ -2,8 +2,10 @@ from datetime import datetime
 from fastapi import Depends, Request
 
 from app.db.models.models import User
+from app.auth.principal import Principal
 from app.auth.repository import UserRepository
 from app.auth.utils.jwt_handler import jwt_handler
+from app.auth.utils.principal_cache import principal_cache
 from app.api.dependencies.repo_dep import get_user_repository
 from app.api.errors.exceptions import (
     AccessTokenNotFoundException,
@@ -30,7 +32,7 @@ async def get_refresh_token(request: Request) -> str:
 async def get_current_user(
     token: str = Depends(get_access_token),
     user_repo: UserRepository = Depends(get_user_repository),
-) -> User:
+) -> Principal:
     payload = jwt_handler.decode(token)
     if not payload:
         raise InvalidTokenException
@@ -44,9 +46,14 @@ async def get_current_user(
     except (TypeError, ValueError):
         raise InvalidTokenException
 
-    user = await user_repo.get_by_id(user_id)
+    user = await principal_cache.get(user_id)
     if not user:
-        raise UserNotFoundException(email)
+        # поколение читается до БД: инвалидация после этого момента отменит запись в кэш
+        generation = await principal_cache.generation(user_id)
+        user = await user_repo.get_principal(user_id)
+        if not user:
+            raise UserNotFoundException(email)
+        await principal_cache.set(user, generation)
 
     # защита от старых токенов после смены пароля
     token_pwd_reset_at = payload.get("pwd_reset_at")
@@ -59,3 +66,16 @@ async def get_current_user(
                 raise InvalidTokenException
 
     return user
+
+
+async def get_current_user_model(
+    principal: Principal = Depends(get_current_user),
+    user_repo: UserRepository = Depends(get_user_repository),
+) -> User:
+    """
+    Полная строка пользователя (без связей) — для эндпоинтов, которым мало Principal.
+    """
+    user = await user_repo.get_by_id(principal.id)
+    if not user:
+        raise UserNotFoundException(principal.email)
+    return user
@@ -1,22 +1,146 @@
+import re
+import math
+import functools
 from fastapi import Request
-from fastapi.responses import JSONResponse
-from slowapi import Limiter
-from slowapi.util import get_remote_address
-from slowapi.errors import RateLimitExceeded
-from typing import Protocol, Callable, TypeVar, Any
+from loguru import logger
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
+from typing import Protocol, Callable, TypeVar, Any, Literal, Optional, cast
 
 from app.core.config import settings
+from app.core.metrics import metrics
+from app.db.redis import redis_client
+from app.auth.utils.jwt_handler import jwt_handler
+from app.api.errors.exceptions import RateLimitExceededException, ProjectException
 
 F = TypeVar("F", bound=Callable[..., Any])
 
+KeyKind = Literal["ip", "user"]
+
 
 class LimiterProtocol(Protocol):
     def limit(self, *args: Any, **kwargs: Any) -> Callable[[F], F]:
         ...
 
 
+# GCRA: в ключе хранится теоретическое время следующего запроса (TAT, мс).
+# Время берётся из Redis (TIME), поэтому все воркеры считают по одним часам.
+# KEYS: ключ лимита; ARGV: интервал между запросами (мс), размер всплеска
+# Возвращает {1, 0} если запрос разрешён, иначе {0, через сколько мс повторить}
+_GCRA_LUA = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) * 1000 + math.floor(tonumber(t[2]) / 1000)
+local emission = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+
+local tat = tonumber(redis.call('GET', KEYS[1]))
+if not tat or tat < now then
+    tat = now
+end
+
+local allow_at = tat - (burst - 1) * emission
+if now < allow_at then
+    return {0, math.ceil(allow_at - now)}
+end
+
+local new_tat = tat + emission
+redis.call('SET', KEYS[1], string.format('%.3f', new_tat), 'PX', math.ceil(new_tat - now))
+return {1, 0}
+"""
+
+_PERIODS = {"second": 1, "minute": 60, "hour": 3600, "day": 86400}
+_RATE_RE = re.compile(r"^\s*(\d+)\s*(?:/|per)\s*(\d+)?\s*(second|minute|hour|day)s?\s*$")
+
+
+def parse_rate(rate: str) -> tuple[int, int]:
+    """
+    "5/minute" -> (5, 60): количество запросов и период в секундах.
+    """
+    match = _RATE_RE.match(rate)
+    if not match:
+        raise ValueError(f"Некорректный лимит: {rate}")
+
+    count, multiplier, unit = match.groups()
+    return int(count), int(multiplier or 1) * _PERIODS[unit]
+
+
+class RedisLimiter:
+    """
+    Распределённый лимитер на общем redis_client: один вызов Lua-скрипта на проверку,
+    так что лимит одинаков при любом количестве воркеров.
+    Ключ — маршрут + IP клиента или id пользователя (key="user").
+    """
+
+    def __init__(self, redis: Redis, prefix: str = "ratelimit") -> None:
+        self.redis = redis
+        self.prefix = prefix
+        self._script = redis.register_script(_GCRA_LUA)
+
+    async def load_script(self) -> None:
+        await self.redis.script_load(_GCRA_LUA)  # type: ignore
+
+    @staticmethod
+    def _client_ip(request: Request) -> str:
+        return request.client.host if request.client else "unknown"
+
+    def _identity(self, request: Request, key: KeyKind) -> str:
+        if key == "user":
+            token = request.cookies.get("access_token")
+            if token:
+                try:
+                    return f"user:{jwt_handler.decode(token)['user_id']}"
+                except (ProjectException, KeyError):
+                    pass
+        return f"ip:{self._client_ip(request)}"
+
+    async def hit(self, request: Request, *, scope: str, rate: str, key: KeyKind = "ip") -> None:
+        count, period = parse_rate(rate)
+        redis_key = f"{self.prefix}:{scope}:{self._identity(request, key)}"
+
+        try:
+            allowed, retry_after_ms = cast(
+                list[int],
+                await self._script(keys=[redis_key], args=[period * 1000 / count, count]),
+            )
+        except RedisError as e:
+            # при недоступном Redis пропускаем запрос, а не роняем API
+            logger.warning(f"Rate limiter: Redis недоступен, запрос пропущен: {e}")
+            metrics.inc("rate_limit_total", route=scope, result="error")
+            return
+
+        if not allowed:
+            metrics.inc("rate_limit_total", route=scope, result="rejected")
+            raise RateLimitExceededException(retry_after=math.ceil(retry_after_ms / 1000))
+
+        metrics.inc("rate_limit_total", route=scope, result="allowed")
+
+    def limit(self, rate: str, *, key: KeyKind = "ip", scope: Optional[str] = None) -> Callable[[F], F]:
+        parse_rate(rate)  # ошибки в строке лимита видны сразу при импорте роутера
+
+        def decorator(func: F) -> F:
+            route_scope = scope or f"{func.__module__}.{func.__name__}"
+
+            @functools.wraps(func)
+            async def wrapper(*args: Any, **kwargs: Any) -> Any:
+                request = kwargs.get("request")
+                if not isinstance(request, Request):
+                    request = next(
+                        (value for value in (*args, *kwargs.values()) if isinstance(value, Request)),
+                        None,
+                    )
+                if request is None:
+                    raise RuntimeError(f"Эндпоинт {route_scope} должен принимать request: Request")
+
+                await self.hit(request, scope=route_scope, rate=rate, key=key)
+                return await func(*args, **kwargs)
+
+            return cast(F, wrapper)
+
+        return decorator
+
+
 if settings.enable_rate_limiter:
-    limiter: LimiterProtocol = Limiter(key_func=get_remote_address)
+    limiter: LimiterProtocol = RedisLimiter(redis_client)
 else:
     class DummyLimiter:
         def limit(self, *args: Any, **kwargs: Any) -> Callable[[F], F]:
@@ -25,11 +149,3 @@ else:
             return decorator
 
     limiter: LimiterProtocol = DummyLimiter()
-
-
-async def rate_limit_exceeded_handler(request: Request, exc: RateLimitExceeded):
-    return JSONResponse(
-        status_code=429,
-        content={"error": "Вы отправили слишком много запросов, попробуйте позже..."}
-    )
-
@@ -65,6 +65,10 @@ class PasswordIdenticalToPreviousException(ProjectException):
     status_code = status.HTTP_400_BAD_REQUEST
     detail = "Пароль должен отличаться от предыдущего"
 
+class PasswordHashingOverloadedException(ProjectException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    detail = "Сервис временно перегружен, попробуйте позже"
+
 # --- Ошибки, связанные с токенами сброса пароля ---
 
 class InvalidPasswordResetTokenException(ProjectException):
@@ -77,6 +81,14 @@ class InvalidCredentialsException(ProjectException):
     status_code = status.HTTP_401_UNAUTHORIZED
     detail = "Неверные учётные данные"
 
+class TooManyLoginAttemptsException(ProjectException):
+    status_code = status.HTTP_429_TOO_MANY_REQUESTS
+    detail = "Слишком много неудачных попыток входа, попробуйте позже"
+
+    def __init__(self, retry_after: int):
+        super().__init__()
+        self.headers = {"Retry-After": str(retry_after)}
+
 class EmailNotConfirmedException(ProjectException):
     status_code = status.HTTP_403_FORBIDDEN
     detail="Email не подтверждён"
@@ -111,6 +123,16 @@ class TooEarlyResendException(ProjectException):
     status_code = status.HTTP_429_TOO_MANY_REQUESTS
     detail = "Слишком частые попытки. Попробуйте позже"
 
+# --- Ограничение частоты запросов ---
+
+class RateLimitExceededException(ProjectException):
+    status_code = status.HTTP_429_TOO_MANY_REQUESTS
+    detail = "Вы отправили слишком много запросов, попробуйте позже..."
+
+    def __init__(self, retry_after: int):
+        super().__init__()
+        self.headers = {"Retry-After": str(retry_after)}
+
 # --- Общие/внутренние ошибки ---
 
 class InternalServerErrorException(ProjectException):
@@ -182,3 +204,43 @@ class TransactionCategoryAccessDenied(TransactionException):
         super().__init__(
             detail=f"Категория {category_id} недоступна для данной транзакции"
         )
+
+class InvalidTransactionCursor(TransactionException):
+    status_code = status.HTTP_400_BAD_REQUEST
+
+    def __init__(self):
+        super().__init__(
+            detail="Некорректный курсор пагинации"
+        )
+
+class TransactionExportFormatUnavailable(TransactionException):
+    status_code = status.HTTP_501_NOT_IMPLEMENTED
+
+    def __init__(self, fmt: str):
+        super().__init__(
+            detail=f"Выгрузка в формате {fmt} недоступна на этом сервере"
+        )
+
+class TransactionImportNotFound(TransactionException):
+    status_code = status.HTTP_404_NOT_FOUND
+
+    def __init__(self, import_id: str):
+        super().__init__(
+            detail=f"Импорт {import_id} не найден"
+        )
+
+class TransactionPeriodUnavailable(TransactionException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+
+    def __init__(self):
+        super().__init__(
+            detail="Операции за этот месяц пока нельзя сохранить, повторите попытку позже"
+        )
+
+class TransactionImportTooLarge(TransactionException):
+    status_code = status.HTTP_413_CONTENT_TOO_LARGE
+
+    def __init__(self, max_bytes: int):
+        super().__init__(
+            detail=f"Файл выписки больше {max_bytes // (1024 * 1024)} МБ"
+        )
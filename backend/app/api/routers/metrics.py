@@ -0,0 +1,11 @@
+from typing import Any, Dict
+from fastapi import APIRouter
+
+from app.core.metrics import metrics
+
+router = APIRouter(prefix="/metrics", tags=["Метрики"])
+
+
+@router.get("/", include_in_schema=False)
+async def get_metrics() -> Dict[str, Any]:
+    return metrics.snapshot()
@@ -0,0 +1,15 @@
+from dataclasses import dataclass
+from datetime import datetime
+
+
+@dataclass(frozen=True, slots=True)
+class Principal:
+    """
+    Минимальный снимок пользователя для аутентификации запроса.
+    Содержит только те колонки, которые нужны get_current_user.
+    """
+    id: int
+    email: str
+    is_active: bool
+    email_confirmed: bool
+    last_password_reset: datetime | None
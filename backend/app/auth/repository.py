@@ -1,14 +1,46 @@
 from app.db.models.models import User
 from app.db.repository import BaseRepository
+from app.auth.principal import Principal
+from app.auth.utils.principal_cache import principal_cache
 from datetime import datetime, timezone, date
+import hashlib
 
-from typing import Optional, cast, Any
+from typing import Optional, Any, Literal, Sequence
+from sqlalchemy import select, update, values, column, or_, Integer, DateTime
 from redis.asyncio import Redis
 
 
 class UserRepository(BaseRepository[User]):
     model = User
 
+    async def get_principal(self, user_id: int) -> Optional[Principal]:
+        result = await self.session.execute(
+            select(
+                User.id,
+                User.email,
+                User.is_active,
+                User.email_confirmed,
+                User.last_password_reset,
+            ).where(User.id == user_id)
+        )
+        row = result.one_or_none()
+        if row is None:
+            return None
+
+        return Principal(
+            id=row.id,
+            email=row.email,
+            is_active=row.is_active,
+            email_confirmed=row.email_confirmed,
+            last_password_reset=row.last_password_reset,
+        )
+
+    # Любое изменение пользователя сбрасывает его снимок в кэше аутентификации
+    async def update(self, model_id: int, data: dict[str, Any]) -> Optional[User]:
+        user = await super().update(model_id, data)
+        await principal_cache.invalidate(model_id)
+        return user
+
     async def get_by_email(self, email: str) -> Optional[User]:
         return await self.find_one_or_none(email=email)
 
@@ -25,8 +57,6 @@ class UserRepository(BaseRepository[User]):
         birthday: date | None,
         email_confirmed: bool,
         email_confirmed_at: datetime | None,
-        confirmation_token: str | None,
-        confirmation_token_created_at: datetime | None,
     ) -> User:
         data: dict[str, Any] = {
             "email": email,
@@ -36,8 +66,6 @@ class UserRepository(BaseRepository[User]):
             "birthday": birthday,
             "email_confirmed": email_confirmed,
             "email_confirmed_at": email_confirmed_at,
-            "confirmation_token": confirmation_token,
-            "confirmation_token_created_at": confirmation_token_created_at,
         }
 
         return await self.add(data)
@@ -57,39 +85,125 @@ class UserRepository(BaseRepository[User]):
             {
             "email_confirmed": True,
             "email_confirmed_at": datetime.now(timezone.utc),
-            "confirmation_token": None,
-            "confirmation_token_created_at": None,
             }
         )
     
-    async def set_password_reset_token(
-    self,
-    user_id: int,
-    token: str,
-    ) -> Optional[User]:
-        return await self.update(
-            user_id,
-            {
-                "password_reset_token": token,
-                "password_reset_token_created_at": datetime.now(timezone.utc),
-            }
+    async def consume_legacy_token(
+        self,
+        user_id: int,
+        column: Literal["confirmation_token", "password_reset_token"],
+        token: str,
+    ) -> bool:
+        """
+        Гасит токен, выданный до переноса одноразовых токенов в Redis и хранящийся в колонке users.
+        Условный UPDATE: из двух параллельных запросов с одним токеном пройдёт только один.
+        """
+        result = await self.session.execute(
+            update(User)
+            .where(User.id == user_id, getattr(User, column) == token)
+            .values({column: None, f"{column}_created_at": None})
+            .returning(User.id)
         )
-    
-    async def update_last_login(self, user_id: int) -> None:
-        await self.update(
-            user_id,
-            {"last_login_at": datetime.now(timezone.utc)}
+        await self.session.commit()
+        return result.scalar_one_or_none() is not None
+
+    async def bulk_update_timestamps(
+        self,
+        field: str,
+        rows: Sequence[tuple[int, datetime]],
+    ) -> None:
+        """
+        Один UPDATE ... FROM (VALUES ...) на пачку (user_id, время).
+        Более старое значение не перетирает уже записанное более новое.
+        """
+        if not rows:
+            return
+
+        # UPDATE ... FROM блокирует строки в порядке плана соединения, а не в порядке VALUES:
+        # сначала берём блокировки по возрастанию id, чтобы параллельные сбросы не взаимоблокировались
+        await self.session.execute(
+            select(User.id)
+            .where(User.id.in_(sorted({user_id for user_id, _ in rows})))
+            .order_by(User.id)
+            .with_for_update()
         )
 
+        target = getattr(User, field)
+        v = values(
+            column("id", Integer),
+            column("value", DateTime(timezone=True)),
+            name="v",
+        ).data(list(rows))
+
+        stmt = (
+            update(User)
+            .where(User.id == v.c.id)
+            .where(or_(target.is_(None), target < v.c.value))
+            .values({field: v.c.value})
+        )
+        await self.session.execute(stmt)
+        await self.session.commit()
+
+
+
+# KEYS: refresh:<old_jti>, user_refresh:<user_id>, refresh:<new_jti>
+# ARGV: user_id, old_jti, new_jti, expires_in
+# Новый ключ живёт не дольше старого: срок сессии не продлевается ротацией
+_ROTATE_REFRESH_LUA = """
+if redis.call('GET', KEYS[1]) ~= ARGV[1] then
+    return 0
+end
+local ttl = tonumber(ARGV[4]) * 1000
+local remaining = redis.call('PTTL', KEYS[1])
+if remaining > 0 and remaining < ttl then
+    ttl = remaining
+end
+redis.call('DEL', KEYS[1])
+redis.call('SREM', KEYS[2], ARGV[2])
+redis.call('SET', KEYS[3], ARGV[1], 'PX', ttl)
+redis.call('SADD', KEYS[2], ARGV[3])
+if redis.call('PTTL', KEYS[2]) < ttl then
+    redis.call('PEXPIRE', KEYS[2], ttl)
+end
+return 1
+"""
+
+# KEYS: user_refresh:<user_id>, refresh:<jti>...
+# ARGV: jti из тех же ключей
+# Возвращает количество токенов, добавленных в множество после чтения SMEMBERS
+_REVOKE_ALL_REFRESH_LUA = """
+for i = 2, #KEYS do
+    redis.call('DEL', KEYS[i])
+end
+if #ARGV > 0 then
+    redis.call('SREM', KEYS[1], unpack(ARGV))
+end
+local remaining = redis.call('SCARD', KEYS[1])
+if remaining == 0 then
+    redis.call('DEL', KEYS[1])
+end
+return remaining
+"""
 
 
 class RefreshTokenRepository:
+    REFRESH_PREFIX = "refresh:"
+    SCRIPTS = (_ROTATE_REFRESH_LUA, _REVOKE_ALL_REFRESH_LUA)
+
     def __init__(self, redis: Redis):
         self.redis = redis
+        # register_script не ходит в Redis: вызов идёт через EVALSHA (с подгрузкой при NOSCRIPT)
+        self._rotate_script = redis.register_script(_ROTATE_REFRESH_LUA)
+        self._revoke_all_script = redis.register_script(_REVOKE_ALL_REFRESH_LUA)
 
-    @staticmethod
-    def _refresh_key(jti: str) -> str:
-        return f"refresh:{jti}"
+    @classmethod
+    async def load_scripts(cls, redis: Redis) -> None:
+        for script in cls.SCRIPTS:
+            await redis.script_load(script)  # type: ignore
+
+    @classmethod
+    def _refresh_key(cls, jti: str) -> str:
+        return f"{cls.REFRESH_PREFIX}{jti}"
 
     @staticmethod
     def _user_key(user_id: int) -> str:
@@ -115,6 +229,28 @@ class RefreshTokenRepository:
 
         await pipe.execute()
 
+    async def rotate(
+        self,
+        *,
+        old_jti: str,
+        new_jti: str,
+        user_id: int,
+        expires_in: int,
+    ) -> bool:
+        """
+        Атомарно проверяет, отзывает старый и сохраняет новый refresh-токен за один запрос.
+        False — старый токен уже отозван или принадлежит другому пользователю.
+        """
+        rotated = await self._rotate_script(
+            keys=[
+                self._refresh_key(old_jti),
+                self._user_key(user_id),
+                self._refresh_key(new_jti),
+            ],
+            args=[user_id, old_jti, new_jti, expires_in],
+        )
+        return rotated == 1
+
     async def get_user_id(self, jti: str) -> Optional[int]:
         value = await self.redis.get(self._refresh_key(jti))
         return int(value) if value else None
@@ -126,18 +262,184 @@ class RefreshTokenRepository:
         await pipe.execute()
 
     async def delete_all_for_user(self, user_id: int) -> None:
-        key = self._user_key(user_id)
-        jtis = cast(set[str], await self.redis.smembers(key)) # type: ignore
+        # ключи передаются через KEYS; повтор — если во время отзыва выдан новый токен
+        while True:
+            jtis = list(await self.redis.smembers(self._user_key(user_id)))  # type: ignore
+            remaining = await self._revoke_all_script(
+                keys=[self._user_key(user_id), *(self._refresh_key(jti) for jti in jtis)],
+                args=jtis,
+            )
+            if not remaining:
+                return
 
-        if not jtis:
-            return
+    async def exists(self, jti: str) -> bool:
+        return await self.redis.exists(self._refresh_key(jti)) == 1
 
-        pipe = self.redis.pipeline()
-        for jti in jtis:
-            pipe.delete(self._refresh_key(jti))
 
-        pipe.delete(key)
+# KEYS: <purpose>_token:<hash>, <purpose>_token_user:<user_id>
+# ARGV: user_id, ttl, префикс ключей токенов, hash нового токена
+_ISSUE_TOKEN_LUA = """
+local previous = redis.call('GET', KEYS[2])
+if previous then
+    redis.call('DEL', ARGV[3] .. previous)
+end
+redis.call('SET', KEYS[1], ARGV[1], 'EX', ARGV[2])
+redis.call('SET', KEYS[2], ARGV[4], 'EX', ARGV[2])
+return 1
+"""
+
+# KEYS: <purpose>_token:<hash>
+# ARGV: префикс пользовательских ключей, hash токена
+_CONSUME_TOKEN_LUA = """
+local user_id = redis.call('GET', KEYS[1])
+if not user_id then
+    return false
+end
+redis.call('DEL', KEYS[1])
+local user_key = ARGV[1] .. user_id
+if redis.call('GET', user_key) == ARGV[2] then
+    redis.call('DEL', user_key)
+end
+return user_id
+"""
+
+
+class OneTimeTokenRepository:
+    """
+    Одноразовые токены (подтверждение email, сброс пароля) в Redis.
+    Ключ — sha256 от токена, значение — user_id; истечение срока обеспечивает TTL Redis.
+    У пользователя одновременно действует только последний выданный токен.
+    """
+    EMAIL_CONFIRMATION = "email_confirm"
+    PASSWORD_RESET = "password_reset"
+    SCRIPTS = (_ISSUE_TOKEN_LUA, _CONSUME_TOKEN_LUA)
+
+    def __init__(self, redis: Redis, purpose: str):
+        self.redis = redis
+        self.token_prefix = f"{purpose}_token:"
+        self.user_prefix = f"{purpose}_token_user:"
+        self._issue_script = redis.register_script(_ISSUE_TOKEN_LUA)
+        self._consume_script = redis.register_script(_CONSUME_TOKEN_LUA)
+
+    @classmethod
+    async def load_scripts(cls, redis: Redis) -> None:
+        for script in cls.SCRIPTS:
+            await redis.script_load(script)  # type: ignore
+
+    @staticmethod
+    def _hash(token: str) -> str:
+        return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+    def _token_key(self, token: str) -> str:
+        return f"{self.token_prefix}{self._hash(token)}"
+
+    def _user_key(self, user_id: int) -> str:
+        return f"{self.user_prefix}{user_id}"
+
+    async def issue(self, *, user_id: int, token: str, expires_in: int) -> None:
+        await self._issue_script(
+            keys=[self._token_key(token), self._user_key(user_id)],
+            args=[user_id, expires_in, self.token_prefix, self._hash(token)],
+        )
+
+    async def verify(self, token: str) -> Optional[int]:
+        value = await self.redis.get(self._token_key(token))
+        return int(value) if value else None
+
+    async def consume(self, token: str) -> Optional[int]:
+        value = await self._consume_script(
+            keys=[self._token_key(token)],
+            args=[self.user_prefix, self._hash(token)],
+        )
+        return int(value) if value else None
+
+    async def has_active(self, user_id: int) -> bool:
+        return await self.redis.exists(self._user_key(user_id)) == 1
+
+
+# KEYS: счётчик неудач, ключ блокировки
+# ARGV: окно подсчёта (с), порог, первая блокировка (с), максимум блокировки (с)
+_LOGIN_FAILURE_LUA = """
+local window = tonumber(ARGV[1])
+local threshold = tonumber(ARGV[2])
+local count = redis.call('INCR', KEYS[1])
+if count == 1 then
+    redis.call('EXPIRE', KEYS[1], window)
+end
+if count >= threshold then
+    local lock = math.min(tonumber(ARGV[3]) * 2 ^ (count - threshold), tonumber(ARGV[4]))
+    lock = math.floor(lock)
+    redis.call('SET', KEYS[2], 1, 'EX', lock)
+    -- счётчик живёт дольше блокировки, чтобы следующая была вдвое длиннее
+    redis.call('EXPIRE', KEYS[1], lock + window)
+end
+return count
+"""
+
+
+class LoginAttemptRepository:
+    """
+    Счётчики неудачных входов по email и по IP с экспоненциальной блокировкой.
+    Проверка блокировки выполняется до поиска пользователя и bcrypt.
+    """
+    SCRIPTS = (_LOGIN_FAILURE_LUA,)
+
+    def __init__(
+        self,
+        redis: Redis,
+        *,
+        max_failures: int,
+        ip_max_failures: int,
+        window: int,
+        lockout_base: int,
+        lockout_max: int,
+    ):
+        self.redis = redis
+        self.max_failures = max_failures
+        self.ip_max_failures = ip_max_failures
+        self.window = window
+        self.lockout_base = lockout_base
+        self.lockout_max = lockout_max
+        self._failure_script = redis.register_script(_LOGIN_FAILURE_LUA)
+
+    @classmethod
+    async def load_scripts(cls, redis: Redis) -> None:
+        for script in cls.SCRIPTS:
+            await redis.script_load(script)  # type: ignore
+
+    @staticmethod
+    def _fail_key(kind: str, value: str) -> str:
+        return f"login_fail:{kind}:{value}"
+
+    @staticmethod
+    def _lock_key(kind: str, value: str) -> str:
+        return f"login_lock:{kind}:{value}"
+
+    async def locked_for(self, *, email: str, ip: str) -> int:
+        """
+        Сколько секунд ещё действует блокировка email или IP (0 — не заблокирован).
+        """
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.ttl(self._lock_key("email", email.lower()))
+        pipe.ttl(self._lock_key("ip", ip))
+        ttls = await pipe.execute()
+        return max(0, *ttls)
+
+    async def record_failure(self, *, email: str, ip: str) -> None:
+        pipe = self.redis.pipeline(transaction=False)
+        for kind, value, threshold in (
+            ("email", email.lower(), self.max_failures),
+            ("ip", ip, self.ip_max_failures),
+        ):
+            await self._failure_script(
+                keys=[self._fail_key(kind, value), self._lock_key(kind, value)],
+                args=[self.window, threshold, self.lockout_base, self.lockout_max],
+                client=pipe,
+            )
         await pipe.execute()
 
-    async def exists(self, jti: str) -> bool:
-        return await self.redis.exists(self._refresh_key(jti)) == 1
\ No newline at end of file
+    async def reset(self, *, email: str) -> None:
+        await self.redis.delete(
+            self._fail_key("email", email.lower()),
+            self._lock_key("email", email.lower()),
+        )
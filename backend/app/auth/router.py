@@ -1,4 +1,4 @@
-from fastapi import APIRouter, BackgroundTasks, status, Depends, Request
+from fastapi import APIRouter, status, Depends, Request
 from fastapi.responses import JSONResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from redis.asyncio import Redis
@@ -9,8 +9,15 @@ from app.api.dependencies.redis_dep import get_redis
 from app.auth.utils.cookie_handler import cookie_handler
 from app.auth.schemas.requests import UserCreateRequest, LoginRequest, ForgotPasswordRequest, ResetPasswordRequest
 from app.auth.schemas.responses import MessageResponse, TokenResponse
-from app.auth.repository import UserRepository, RefreshTokenRepository
+from app.core.config import settings
+from app.auth.repository import (
+    UserRepository,
+    RefreshTokenRepository,
+    OneTimeTokenRepository,
+    LoginAttemptRepository,
+)
 from app.api.dependencies.limiter import limiter
+from app.email.outbox import EmailOutbox
 from app.auth.service import RegistrationService, LoginService, RefreshService, LogoutService, PasswordResetService
 from app.api.errors.exceptions import UserAlreadyExistsException, PasswordValidationErrorException, RefreshTokenNotFoundException
 
@@ -23,14 +30,18 @@ router = APIRouter(prefix="/auth", tags=["Авторизация пользов
 async def register_user(
     request: Request,
     data: UserCreateRequest,
-    background_tasks: BackgroundTasks,
     session: AsyncSession = Depends(get_async_session),
+    redis: Redis = Depends(get_redis),
 ):
     user_repo = UserRepository(session=session)
-    auth_service = RegistrationService(user_repo=user_repo)
+    auth_service = RegistrationService(
+        user_repo=user_repo,
+        confirmation_tokens=OneTimeTokenRepository(redis, OneTimeTokenRepository.EMAIL_CONFIRMATION),
+        outbox=EmailOutbox(redis),
+    )
 
     try:
-        user = await auth_service.register_user(data, background_tasks)
+        user = await auth_service.register_user(data)
     except UserAlreadyExistsException as e:
         return JSONResponse(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -62,11 +73,20 @@ async def login(
 ):
     user_repo = UserRepository(session=session)
     refresh_repo = RefreshTokenRepository(redis=redis)
-    auth_service = LoginService(user_repo, refresh_repo)
+    attempts_repo = LoginAttemptRepository(
+        redis,
+        max_failures=settings.login_max_failures,
+        ip_max_failures=settings.login_ip_max_failures,
+        window=settings.login_failure_window,
+        lockout_base=settings.login_lockout_base,
+        lockout_max=settings.login_lockout_max,
+    )
+    auth_service = LoginService(user_repo, refresh_repo, attempts_repo)
 
     access_token, refresh_token = await auth_service.login_user(
         email=data.email,
         password=data.password,
+        ip=request.client.host if request.client else "unknown",
     )
 
     response = JSONResponse(
@@ -88,18 +108,16 @@ async def login(
 @limiter.limit("10/minute")
 async def refresh(
     request: Request,
-    session: AsyncSession = Depends(get_async_session),
     redis: Redis = Depends(get_redis),
 ):
     refresh_token = request.cookies.get("refresh_token")
     if not refresh_token:
         raise RefreshTokenNotFoundException
 
-    user_repo = UserRepository(session=session)
     refresh_repo = RefreshTokenRepository(redis=redis)
-    refresh_service = RefreshService(user_repo, refresh_repo)
+    refresh_service = RefreshService(refresh_repo)
 
-    access_token = await refresh_service.refresh(refresh_token)
+    access_token, refresh_token = await refresh_service.refresh(refresh_token)
 
     response = JSONResponse(
         content={
@@ -146,6 +164,8 @@ async def forgot_password(
     service = PasswordResetService(
         user_repo=UserRepository(session),
         refresh_repo=RefreshTokenRepository(redis),
+        reset_tokens=OneTimeTokenRepository(redis, OneTimeTokenRepository.PASSWORD_RESET),
+        outbox=EmailOutbox(redis),
     )
 
     await service.forgot_password(data.email)
@@ -166,6 +186,8 @@ async def reset_password(
     service = PasswordResetService(
         user_repo=UserRepository(session),
         refresh_repo=RefreshTokenRepository(redis),
+        reset_tokens=OneTimeTokenRepository(redis, OneTimeTokenRepository.PASSWORD_RESET),
+        outbox=EmailOutbox(redis),
     )
 
     await service.reset_password(
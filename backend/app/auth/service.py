@@ -1,62 +1,49 @@
+import secrets
 from uuid import uuid4
 from datetime import datetime, timezone
-from fastapi import BackgroundTasks
 from typing import Optional
 from loguru import logger
 from urllib.parse import quote
 
 from app.core.config import settings
-from app.email.utils.email_handler import email_handler
+from app.email.outbox import EmailOutbox
 from app.auth.utils.password_validator import validator
-from app.auth.utils.password_handler import password_handler
+from app.auth.utils.password_handler import password_handler, password_hasher
 from app.auth.utils.jwt_handler import jwt_handler
+from app.auth.utils.write_behind import user_write_behind
 from app.auth.schemas.requests import UserCreateRequest
-from app.auth.repository import UserRepository, RefreshTokenRepository
+from app.auth.repository import (
+    UserRepository,
+    RefreshTokenRepository,
+    OneTimeTokenRepository,
+    LoginAttemptRepository,
+)
 from app.api.errors.exceptions import (
     UserAlreadyExistsException,
     PasswordValidationErrorException,
     InvalidCredentialsException,
     EmailNotConfirmedException,
     InvalidTokenException,
-    UserNotFoundException,
+    ExpiredTokenException,
     InvalidPasswordResetTokenException,
     PasswordIdenticalToPreviousException,
+    PasswordHashingOverloadedException,
+    TooManyLoginAttemptsException,
 )
 
 
 class RegistrationService:
-    def __init__(self, user_repo: UserRepository):
-        self.user_repo = user_repo
-
-    async def _send_confirmation_email(
-        self,
-        email: str,
-        token: str,
-    ) -> None:
-        try:
-            link = (
-                f"{settings.allowed_hosts}/email/confirm"
-                f"?email={quote(email)}&token={token}"
-            )
-
-            html = email_handler.render_template(
-                "confirm_email.html",
-                {"confirmation_link": link},
-            )
-
-            await email_handler.send_email(
-                to=email,
-                subject="Подтверждение регистрации",
-                html_content=html,
-            )
-        except Exception as exc:
-            logger.error(f"Ошибка отправки письма {email}: {exc}")
-
-    async def register_user(
+    def __init__(
         self,
-        user_data: UserCreateRequest,
-        background_tasks: BackgroundTasks,
+        user_repo: UserRepository,
+        confirmation_tokens: OneTimeTokenRepository,
+        outbox: EmailOutbox,
     ):
+        self.user_repo = user_repo
+        self.confirmation_tokens = confirmation_tokens
+        self.outbox = outbox
+
+    async def register_user(self, user_data: UserCreateRequest):
         if await self.user_repo.is_email_taken(user_data.email):
             raise UserAlreadyExistsException(user_data.email)
 
@@ -68,18 +55,10 @@ class RegistrationService:
             raise PasswordValidationErrorException(errors)
         
 
-        hashed_password = password_handler.hash_password(user_data.password)
+        hashed_password = await password_hasher.hash_password(user_data.password)
 
-        email_confirmed: bool = True
+        email_confirmed: bool = not settings.enable_email_confirmation
         email_confirmed_at: Optional[datetime] = None
-        confirmation_token: Optional[str] = None
-        confirmation_token_created_at: Optional[datetime] = None
-        
-        if settings.enable_email_confirmation:
-            email_confirmed = False
-            email_confirmed_at = None
-            confirmation_token = str(uuid4())
-            confirmation_token_created_at = datetime.now(timezone.utc)
 
         user = await self.user_repo.create_user(
             email=user_data.email,
@@ -89,38 +68,66 @@ class RegistrationService:
             birthday=getattr(user_data, "birthday", None),
             email_confirmed=email_confirmed,
             email_confirmed_at= email_confirmed_at,
-            confirmation_token=confirmation_token,
-            confirmation_token_created_at=confirmation_token_created_at,
         )
 
         if settings.enable_email_confirmation:
-            assert confirmation_token is not None
-            background_tasks.add_task(
-                self._send_confirmation_email,
-                user.email,
-                confirmation_token,
+            confirmation_token = str(uuid4())
+            await self.confirmation_tokens.issue(
+                user_id=user.id,
+                token=confirmation_token,
+                expires_in=settings.email_confirm_token_expire * 60 * 60,
+            )
+            await self.outbox.enqueue(
+                to=user.email,
+                subject="Подтверждение регистрации",
+                template="confirm_email.html",
+                context={
+                    "confirmation_link": (
+                        f"{settings.allowed_hosts}/email/confirm"
+                        f"?email={quote(user.email)}&token={confirmation_token}"
+                    ),
+                },
             )
 
         return user
     
 
 class LoginService:
-    def __init__(self, user_repo: UserRepository, refresh_repo: RefreshTokenRepository):
+    def __init__(
+        self,
+        user_repo: UserRepository,
+        refresh_repo: RefreshTokenRepository,
+        attempts_repo: LoginAttemptRepository,
+    ):
         self.user_repo = user_repo
         self.refresh_repo = refresh_repo
+        self.attempts_repo = attempts_repo
+
+    async def login_user(self, email: str, password: str, ip: str):
+        # заблокированные email/IP отсекаются до запроса в БД и bcrypt
+        locked_for = await self.attempts_repo.locked_for(email=email, ip=ip)
+        if locked_for:
+            raise TooManyLoginAttemptsException(retry_after=locked_for)
 
-    async def login_user(self, email: str, password: str):
         user = await self.user_repo.get_by_email(email)
 
         if not user:
+            await password_hasher.simulate_verify()
+            await self.attempts_repo.record_failure(email=email, ip=ip)
             raise InvalidCredentialsException()
 
-        if not password_handler.verify_password(password, user.hashed_password):
+        if not await password_hasher.verify_password(password, user.hashed_password):
+            await self.attempts_repo.record_failure(email=email, ip=ip)
             raise InvalidCredentialsException()
 
+        await self.attempts_repo.reset(email=email)
+
         if settings.enable_email_confirmation and not user.email_confirmed:
             raise EmailNotConfirmedException()
 
+        if password_handler.needs_rehash(user.hashed_password):
+            await self._rehash_password(user.id, password)
+
         access_token = jwt_handler.create_access_token(
             user_id=user.id,
             email=user.email,
@@ -137,41 +144,59 @@ class LoginService:
             expires_in=expires_in,
         )
 
-        await self.user_repo.update_last_login(user.id)
+        user_write_behind.record(user.id, "last_login_at", datetime.now(timezone.utc))
 
         return access_token, refresh_token
 
+    # Пересчитываем хэш под текущее количество раундов, пока пароль известен в открытом виде
+    async def _rehash_password(self, user_id: int, password: str) -> None:
+        try:
+            hashed_password = await password_hasher.hash_password(password)
+        except PasswordHashingOverloadedException:
+            # перехэширование необязательно — попробуем при следующем входе
+            return
+
+        await self.user_repo.update(user_id, {"hashed_password": hashed_password})
+        logger.info(f"Хэш пароля пользователя {user_id} пересчитан под {password_handler.salt_rounds} раундов")
+
 class RefreshService:
-    def __init__(
-        self,
-        user_repo: UserRepository,
-        refresh_repo: RefreshTokenRepository,
-    ):
-        self.user_repo = user_repo
+    def __init__(self, refresh_repo: RefreshTokenRepository):
         self.refresh_repo = refresh_repo
 
-    async def refresh(self, refresh_token: str) -> str:
+    async def refresh(self, refresh_token: str) -> tuple[str, str]:
         payload = jwt_handler.decode(refresh_token)
 
         user_id = payload.get("user_id")
+        email = payload.get("sub")
         jti = payload.get("jti")
 
-        if not user_id or not jti:
+        if not user_id or not email or not jti:
             raise InvalidTokenException
 
-        if not await self.refresh_repo.exists(jti):
-            raise InvalidTokenException
+        # срок сессии отсчитывается от входа, ротация его не продлевает
+        new_refresh_token, new_jti, expires_in = jwt_handler.create_refresh_token(
+            user_id=user_id,
+            email=email,
+            expires_at=payload["exp"],
+        )
+        if expires_in <= 0:
+            raise ExpiredTokenException
 
-        user = await self.user_repo.get_by_id(user_id)
-        if not user:
-            raise UserNotFoundException(payload.get("sub"))
+        rotated = await self.refresh_repo.rotate(
+            old_jti=jti,
+            new_jti=new_jti,
+            user_id=user_id,
+            expires_in=expires_in,
+        )
+        if not rotated:
+            raise InvalidTokenException
 
         access_token = jwt_handler.create_access_token(
-            user_id=user.id,
-            email=user.email,
+            user_id=user_id,
+            email=email,
         )
 
-        return access_token
+        return access_token, new_refresh_token
 
 
 class LogoutService:
@@ -193,67 +218,84 @@ class PasswordResetService:
         self,
         user_repo: UserRepository,
         refresh_repo: RefreshTokenRepository,
+        reset_tokens: OneTimeTokenRepository,
+        outbox: EmailOutbox,
     ):
         self.user_repo = user_repo
         self.refresh_repo = refresh_repo
+        self.reset_tokens = reset_tokens
+        self.outbox = outbox
 
     async def forgot_password(self, email: str) -> None:
         user = await self.user_repo.get_by_email(email)
         if not user:
             return
 
-        token = jwt_handler.create_reset_token(email=user.email)
+        token = secrets.token_urlsafe(32)
 
-        await self.user_repo.update(
-            user.id,
-            {
-                "password_reset_token": token,
-                "password_reset_token_created_at": datetime.now(timezone.utc),
-            },
+        await self.reset_tokens.issue(
+            user_id=user.id,
+            token=token,
+            expires_in=settings.jwt_reset_token_expire * 60,
         )
 
-        try:
-            link = f"{settings.allowed_hosts}/reset-password?token={token}"
-            html = email_handler.render_template(
-                "reset_password.html",
-                {"reset_link": link},
-            )
-            await email_handler.send_email(
-                to=user.email,
-                subject="Сброс пароля",
-                html_content=html,
-            )
-        except Exception as exc:
-            logger.error(f"Ошибка отправки письма сброса пароля: {exc}")
+        await self.outbox.enqueue(
+            to=user.email,
+            subject="Сброс пароля",
+            template="reset_password.html",
+            context={"reset_link": f"{settings.allowed_hosts}/reset-password?token={token}"},
+        )
 
     
-    async def reset_password(self, token: str, new_password: str) -> None:
-        payload = jwt_handler.decode(token)
-        email = payload.get("sub")
-
+    # Ссылки, выданные до переноса токенов в Redis: подписанный JWT в users.password_reset_token.
+    # Срок проверяет сам JWT; ссылка не действует, если после неё выдана новая
+    async def _legacy_user_id(self, token: str) -> Optional[int]:
+        try:
+            email = jwt_handler.decode(token).get("sub")
+        except (InvalidTokenException, ExpiredTokenException):
+            return None
         if not email:
+            return None
+
+        user = await self.user_repo.find_one_or_none(email=email, password_reset_token=token)
+        if not user or await self.reset_tokens.has_active(user.id):
+            return None
+        return user.id
+
+    async def reset_password(self, token: str, new_password: str) -> None:
+        user_id = await self.reset_tokens.verify(token)
+        legacy = False
+        if not user_id:
+            user_id = await self._legacy_user_id(token)
+            legacy = True
+        if not user_id:
             raise InvalidPasswordResetTokenException
 
-        user = await self.user_repo.find_one_or_none(
-            email=email,
-            password_reset_token=token,
-        )
+        user = await self.user_repo.get_by_id(user_id)
         if not user:
             raise InvalidPasswordResetTokenException
 
-        if password_handler.verify_password(new_password, user.hashed_password):
+        if await password_hasher.verify_password(new_password, user.hashed_password):
             raise PasswordIdenticalToPreviousException
 
         errors = validator.validate(password=new_password, email=user.email)
         if errors:
             raise PasswordValidationErrorException(errors)
 
+        hashed_password = await password_hasher.hash_password(new_password)
+
+        # токен гасится атомарно: из двух параллельных сбросов пройдёт только один
+        if legacy:
+            consumed = await self.user_repo.consume_legacy_token(user.id, "password_reset_token", token)
+        else:
+            consumed = await self.reset_tokens.consume(token) is not None
+        if not consumed:
+            raise InvalidPasswordResetTokenException
+
         await self.user_repo.update(
             user.id,
             {
-                "hashed_password": password_handler.hash_password(new_password),
-                "password_reset_token": None,
-                "password_reset_token_created_at": None,
+                "hashed_password": hashed_password,
                 "last_password_reset": datetime.now(timezone.utc),
             },
         )
@@ -1,10 +1,15 @@
-from typing import TypedDict, NotRequired, cast, Dict, Any
+from typing import TypedDict, NotRequired, Optional, cast, Any
+from collections import OrderedDict
 from pathlib import Path
+import hashlib
+import time
 import jwt
+from jwt.algorithms import get_default_algorithms
 from uuid import uuid4
 from datetime import datetime, timedelta, timezone
 
 from app.core.config import settings
+from app.core.metrics import metrics
 from app.api.errors.exceptions import InvalidTokenException, ExpiredTokenException
 
 
@@ -17,14 +22,61 @@ class JWTPayload(TypedDict):
     pwd_reset_at: NotRequired[int]
 
 
+class VerifiedTokenCache:
+    """
+    LRU-кэш уже проверенных payload по sha256 от токена.
+    Запись живёт не дольше exp самого токена: просроченная удаляется при обращении.
+    """
+
+    def __init__(self, max_size: int) -> None:
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._items: OrderedDict[bytes, JWTPayload] = OrderedDict()
+
+    @staticmethod
+    def _key(token: str) -> bytes:
+        return hashlib.sha256(token.encode("utf-8")).digest()
+
+    def get(self, token: str) -> Optional[JWTPayload]:
+        key = self._key(token)
+        payload = self._items.get(key)
+
+        if payload is not None and payload["exp"] <= time.time():
+            del self._items[key]
+            payload = None
+
+        if payload is None:
+            self.misses += 1
+            metrics.inc("jwt_verify_cache_total", result="miss")
+            return None
+
+        self._items.move_to_end(key)
+        self.hits += 1
+        metrics.inc("jwt_verify_cache_total", result="hit")
+        return cast(JWTPayload, dict(payload))
+
+    def set(self, token: str, payload: JWTPayload) -> None:
+        if self.max_size <= 0 or "exp" not in payload:
+            return
+
+        key = self._key(token)
+        self._items[key] = cast(JWTPayload, dict(payload))
+        self._items.move_to_end(key)
+        while len(self._items) > self.max_size:
+            self._items.popitem(last=False)
+
+
 class JWTHandler:
     def __init__(self) -> None:
-        self.private_key: str = Path(settings.jwt_private_key_path).read_text()
-        self.public_key: str = Path(settings.jwt_public_key_path).read_text()
         self.algorithm: str = settings.jwt_algorithm
+        # PEM разбирается один раз, дальше pyjwt получает готовые объекты ключей
+        algorithm = get_default_algorithms()[self.algorithm]
+        self.private_key: Any = algorithm.prepare_key(Path(settings.jwt_private_key_path).read_text())
+        self.public_key: Any = algorithm.prepare_key(Path(settings.jwt_public_key_path).read_text())
+        self.verified_cache = VerifiedTokenCache(settings.jwt_verified_cache_size)
         self.access_exp_minutes: int = settings.jwt_access_token_expire
         self.refresh_exp_days: int = settings.jwt_refresh_token_expire
-        self.reset_token_exp = settings.jwt_reset_token_expire
         
     def create_access_token(
         self,
@@ -49,12 +101,16 @@ class JWTHandler:
         *,
         user_id: int,
         email: str,
+        expires_at: Optional[int] = None,
     ) -> tuple[str, str, int]:
+        """expires_at — конец сессии при ротации: новый токен не живёт дольше исходного."""
         payload = self._base_payload(
             email=email,
             expires_delta=timedelta(days=self.refresh_exp_days),
             user_id=user_id,
         )
+        if expires_at is not None:
+            payload["exp"] = min(payload["exp"], expires_at)
 
         token = jwt.encode(
             cast(dict[str, object], payload),
@@ -65,37 +121,19 @@ class JWTHandler:
         expires_in = payload["exp"] - payload["iat"]
         return token, payload["jti"], expires_in
 
-    def create_reset_token(
-    self,
-    *,
-    email: str,
-    ) -> str:
-        now = datetime.now(tz=timezone.utc)
-        exp = now + timedelta(minutes=self.reset_token_exp)
-
-        payload: Dict[str, Any] = {
-            "sub": email,
-            "iat": int(now.timestamp()),
-            "exp": int(exp.timestamp()),
-            "jti": str(uuid4()),
-        }
-
-
-        return jwt.encode(
-            payload,
-            self.private_key,
-            algorithm=self.algorithm,
-    )
-
-
     def decode(self, token: str) -> JWTPayload:
+        cached = self.verified_cache.get(token)
+        if cached is not None:
+            return cached
+
         try:
-            payload = jwt.decode(
+            payload = cast(JWTPayload, jwt.decode(
                 token,
                 self.public_key,
                 algorithms=[self.algorithm],
-            )
-            return cast(JWTPayload, payload)
+            ))
+            self.verified_cache.set(token, payload)
+            return payload
         except jwt.ExpiredSignatureError:
             raise ExpiredTokenException
         except jwt.InvalidTokenError:
@@ -1,5 +1,32 @@
+import asyncio
+import time
 import bcrypt
+from loguru import logger
+from redis.asyncio import Redis
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Literal, Optional, TypeVar
+
 from app.core.config import settings
+from app.core.metrics import metrics
+from app.api.errors.exceptions import PasswordHashingOverloadedException
+
+R = TypeVar("R")
+
+
+# Функции уровня модуля, чтобы их можно было передать в ProcessPoolExecutor
+def _hash_password(password: str, salt_rounds: int) -> str:
+    salt = bcrypt.gensalt(rounds=salt_rounds)
+    return bcrypt.hashpw(
+        password.encode("utf-8"),
+        salt
+    ).decode("utf-8")
+
+
+def _verify_password(password: str, hashed_password: str) -> bool:
+    return bcrypt.checkpw(
+        password.encode("utf-8"),
+        hashed_password.encode("utf-8")
+    )
 
 
 class PasswordHandler:
@@ -7,19 +34,179 @@ class PasswordHandler:
         self.salt_rounds = salt_rounds
 
     def hash_password(self, password: str) -> str:
-        salt = bcrypt.gensalt(rounds=self.salt_rounds)
-        return bcrypt.hashpw(
-            password.encode("utf-8"),
-            salt
-        ).decode("utf-8")
+        return _hash_password(password, self.salt_rounds)
 
     def verify_password(self, password: str, hashed_password: str) -> bool:
-        return bcrypt.checkpw(
-            password.encode("utf-8"),
-            hashed_password.encode("utf-8")
-        )
+        return _verify_password(password, hashed_password)
+
+    @staticmethod
+    def get_rounds(hashed_password: str) -> int | None:
+        # формат bcrypt: $2b$<cost>$<salt+hash>
+        try:
+            return int(hashed_password.split("$")[2])
+        except (IndexError, ValueError):
+            return None
+
+    def needs_rehash(self, hashed_password: str) -> bool:
+        # salt_rounds одинаков у всех процессов (конфиг или общий результат калибровки),
+        # поэтому стоимость меняется в обе стороны без перехэширования туда-обратно
+        return self.get_rounds(hashed_password) != self.salt_rounds
+
+    def calibrate(self, target_ms: int, min_rounds: int, max_rounds: int) -> int:
+        """
+        Возвращает наибольшее количество раундов, при котором одно хэширование
+        на этой машине укладывается в target_ms (но не меньше min_rounds).
+        Каждый следующий раунд удваивает стоимость, поэтому замер останавливается,
+        как только удвоенное время выходит за бюджет.
+        """
+        best = min_rounds
+        for rounds in range(min_rounds, max_rounds + 1):
+            started = time.perf_counter()
+            _hash_password("calibration", rounds)
+            elapsed_ms = (time.perf_counter() - started) * 1000
+
+            if elapsed_ms > target_ms:
+                break
+            best = rounds
+            if elapsed_ms * 2 > target_ms:
+                break
+
+        return best
+
+
+class AsyncPasswordHasher:
+    """
+    Выполняет bcrypt вне event loop в ограниченном пуле.
+    Одновременно работает не больше concurrency операций, ещё max_queue ждут своей очереди;
+    всё сверх этого сразу отклоняется с 503, чтобы всплеск логинов не останавливал остальной API.
+    """
+
+    def __init__(
+        self,
+        handler: PasswordHandler,
+        executor_kind: Literal["thread", "process"],
+        concurrency: int,
+        max_queue: int,
+    ) -> None:
+        self.handler = handler
+        self.executor_kind = executor_kind
+        self.concurrency = concurrency
+        self.max_queue = max_queue
+        self._executor: Optional[Executor] = None
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._waiting = 0
+        self._in_flight = 0
+        self._dummy_hashes: dict[int, str] = {}
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            if self.executor_kind == "process":
+                self._executor = ProcessPoolExecutor(max_workers=self.concurrency)
+            else:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.concurrency,
+                    thread_name_prefix="bcrypt",
+                )
+        return self._executor
+
+    def _report(self) -> None:
+        metrics.set_gauge("password_hash_queue_depth", self._waiting)
+        metrics.set_gauge("password_hash_in_flight", self._in_flight)
+
+    async def _run(self, operation: str, func: Callable[..., R], *args: Any) -> R:
+        if self._semaphore.locked() and self._waiting >= self.max_queue:
+            metrics.inc("password_hash_rejected_total", operation=operation)
+            raise PasswordHashingOverloadedException
+
+        self._waiting += 1
+        self._report()
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self._waiting -= 1
+
+        self._in_flight += 1
+        self._report()
+        started = time.perf_counter()
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._get_executor(), func, *args)
+        finally:
+            self._in_flight -= 1
+            self._semaphore.release()
+            metrics.observe("password_hash_seconds", time.perf_counter() - started, operation=operation)
+            self._report()
+
+    async def hash_password(self, password: str) -> str:
+        return await self._run("hash", _hash_password, password, self.handler.salt_rounds)
+
+    async def verify_password(self, password: str, hashed_password: str) -> bool:
+        return await self._run("verify", _verify_password, password, hashed_password)
+
+    async def simulate_verify(self) -> None:
+        """
+        Проверка пароля по фиктивному хэшу с текущим количеством раундов:
+        вход с несуществующим email по времени не отличается от неверного пароля.
+        Идёт через тот же ограниченный пул, что и настоящие проверки, поэтому и под нагрузкой
+        ведёт себя так же — ждёт в очереди или отклоняется с 503.
+        Фиктивный хэш вычисляется один раз на количество раундов.
+        """
+        rounds = self.handler.salt_rounds
+        dummy_hash = self._dummy_hashes.get(rounds)
+        if dummy_hash is None:
+            dummy_hash = await self._run("hash", _hash_password, "dummy-password", rounds)
+            self._dummy_hashes[rounds] = dummy_hash
+
+        await self._run("verify", _verify_password, "dummy-password", dummy_hash)
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
 
 
 password_handler = PasswordHandler(
     salt_rounds=settings.password_bcrypt_salt_rounds
 )
+
+
+# Результат калибровки, общий для всех процессов; чтобы откалибровать заново, ключ нужно удалить
+BCRYPT_ROUNDS_KEY = "password:bcrypt_rounds"
+
+
+async def calibrate_password_hashing(redis: Redis) -> None:
+    """
+    Количество раундов подбирает первый запущенный процесс и сохраняет в Redis (SET NX),
+    остальные берут сохранённое значение: иначе хосты с разной калибровкой
+    перехэшировали бы пароли друг за другом при каждом входе.
+    """
+    stored = await redis.get(BCRYPT_ROUNDS_KEY)
+    if stored is None:
+        loop = asyncio.get_running_loop()
+        calibrated = await loop.run_in_executor(
+            None,
+            password_handler.calibrate,
+            settings.password_bcrypt_target_ms,
+            settings.password_bcrypt_min_rounds,
+            settings.password_bcrypt_max_rounds,
+        )
+        await redis.set(BCRYPT_ROUNDS_KEY, calibrated, nx=True)
+        stored = await redis.get(BCRYPT_ROUNDS_KEY)
+
+    rounds = min(
+        max(int(stored), settings.password_bcrypt_min_rounds),
+        settings.password_bcrypt_max_rounds,
+    )
+    logger.info(
+        f"Калибровка bcrypt: {rounds} раундов "
+        f"(было {password_handler.salt_rounds}, бюджет {settings.password_bcrypt_target_ms} мс)"
+    )
+    password_handler.salt_rounds = rounds
+
+
+password_hasher = AsyncPasswordHasher(
+    handler=password_handler,
+    executor_kind=settings.password_hash_executor,
+    concurrency=settings.password_hash_concurrency,
+    max_queue=settings.password_hash_max_queue,
+)
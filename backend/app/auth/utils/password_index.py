@@ -0,0 +1,143 @@
+"""
+Компактный индекс часто используемых паролей.
+
+Формат файла: заголовок (magic, ширина хэша, количество записей), затем
+отсортированные по возрастанию хэши фиксированной ширины (blake2b от пароля в нижнем регистре).
+Файл открывается через mmap, поэтому страницы делятся между всеми воркерами через page cache,
+а проверка — бинарный поиск за O(log n) без загрузки списка в память процесса.
+
+Сборка индекса из текстового списка (по одному паролю на строку):
+
+    python -m app.auth.utils.password_index common_passwords_list.txt common_passwords.idx
+"""
+import argparse
+import hashlib
+import heapq
+import mmap
+import struct
+import tempfile
+from pathlib import Path
+from typing import BinaryIO, Iterable, Iterator
+
+MAGIC = b"FTPWIDX1"
+HASH_WIDTH = 8
+HEADER = struct.Struct("<8sIIQ")  # magic, ширина хэша, резерв, количество записей
+
+
+def password_hash(password: str) -> bytes:
+    return hashlib.blake2b(password.lower().encode("utf-8"), digest_size=HASH_WIDTH).digest()
+
+
+class CommonPasswordIndex:
+    def __init__(self, path: str | Path) -> None:
+        self.path = Path(path)
+        with self.path.open("rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, width, _, count = HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC or width != HASH_WIDTH:
+            self._mm.close()
+            raise ValueError(f"Файл {self.path} не является индексом паролей")
+
+        if len(self._mm) != HEADER.size + count * width:
+            self._mm.close()
+            raise ValueError(f"Индекс паролей {self.path} повреждён")
+
+        self._count = count
+
+    def __len__(self) -> int:
+        return self._count
+
+    def _item(self, position: int) -> bytes:
+        offset = HEADER.size + position * HASH_WIDTH
+        return self._mm[offset:offset + HASH_WIDTH]
+
+    def __contains__(self, password: object) -> bool:
+        if not isinstance(password, str):
+            return False
+
+        target = password_hash(password)
+        low, high = 0, self._count
+        while low < high:
+            middle = (low + high) // 2
+            if self._item(middle) < target:
+                low = middle + 1
+            else:
+                high = middle
+
+        return low < self._count and self._item(low) == target
+
+    def close(self) -> None:
+        self._mm.close()
+
+
+def _read_records(f: BinaryIO) -> Iterator[bytes]:
+    while record := f.read(HASH_WIDTH):
+        yield record
+
+
+def _write_sorted_run(hashes: list[bytes]) -> BinaryIO:
+    hashes.sort()
+    run = tempfile.TemporaryFile()
+    run.writelines(hashes)
+    run.seek(0)
+    return run
+
+
+def build_index(passwords: Iterable[str], target: str | Path, chunk_size: int = 1_000_000) -> int:
+    """
+    Собирает индекс внешней сортировкой: хэши сортируются кусками по chunk_size
+    во временные файлы и затем сливаются, так что память не зависит от размера списка.
+    Возвращает количество уникальных записей.
+    """
+    runs: list[BinaryIO] = []
+    chunk: list[bytes] = []
+
+    for line in passwords:
+        password = line.strip()
+        if not password:
+            continue
+        chunk.append(password_hash(password))
+        if len(chunk) >= chunk_size:
+            runs.append(_write_sorted_run(chunk))
+            chunk = []
+
+    if chunk:
+        runs.append(_write_sorted_run(chunk))
+
+    count = 0
+    try:
+        with Path(target).open("wb") as out:
+            out.write(HEADER.pack(MAGIC, HASH_WIDTH, 0, 0))
+            previous = None
+            for record in heapq.merge(*(_read_records(run) for run in runs)):
+                if record == previous:
+                    continue
+                out.write(record)
+                previous = record
+                count += 1
+
+            out.seek(0)
+            out.write(HEADER.pack(MAGIC, HASH_WIDTH, 0, count))
+    finally:
+        for run in runs:
+            run.close()
+
+    return count
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Сборка индекса часто используемых паролей")
+    parser.add_argument("source", help="Текстовый список паролей, по одному на строку")
+    parser.add_argument("target", help="Путь к создаваемому файлу индекса")
+    parser.add_argument("--chunk-size", type=int, default=1_000_000, help="Размер куска для внешней сортировки")
+    args = parser.parse_args()
+
+    with open(args.source, encoding="utf-8", errors="ignore") as f:
+        count = build_index(f, args.target, chunk_size=args.chunk_size)
+
+    print(f"Индекс {args.target}: {count} паролей")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,12 @@
 import re
 from difflib import SequenceMatcher
 from pathlib import Path
-from typing import Optional
+from typing import Container, Optional
+
+from loguru import logger
 
 from app.core.config import settings
+from app.auth.utils.password_index import CommonPasswordIndex
 
 
 class PasswordValidator:
@@ -16,12 +19,21 @@ class PasswordValidator:
         self,
         level: str = settings.password_validation_level,
         common_passwords_path: Optional[str] = settings.passwords_common_list_path,
+        common_passwords_index_path: Optional[str] = settings.passwords_common_index_path,
     ):
         self.level = level.lower()
         if self.level not in self.VALID_LEVELS:
             raise ValueError(f"Недопустимый уровень проверки пароля: {self.level}")
 
-        self._common_passwords: set[str] = set()
+        self._common_passwords: Container[str] = set()
+
+        # Собранный индекс открывается через mmap и не читается в память целиком
+        if common_passwords_index_path and Path(common_passwords_index_path).exists():
+            try:
+                self._common_passwords = CommonPasswordIndex(common_passwords_index_path)
+                return
+            except (OSError, ValueError) as e:
+                logger.warning(f"Индекс паролей не загружен, используется текстовый список: {e}")
 
         if common_passwords_path:
             path = Path(common_passwords_path)
@@ -0,0 +1,247 @@
+import asyncio
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Optional
+
+from loguru import logger
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
+
+from app.core.config import settings
+from app.db.redis import redis_client
+from app.auth.principal import Principal
+
+
+# Запись только если поколение пользователя не изменилось с момента чтения из БД.
+# KEYS[1] — principal:{id}, KEYS[2] — principal:gen:{id}; ARGV[1] — прочитанное поколение,
+# ARGV[2] — TTL, дальше пары поле/значение
+_SET_IF_GENERATION_LUA = """
+local generation = redis.call('GET', KEYS[2]) or '0'
+if generation ~= ARGV[1] then
+    return 0
+end
+redis.call('DEL', KEYS[1])
+redis.call('HSET', KEYS[1], unpack(ARGV, 3))
+redis.call('EXPIRE', KEYS[1], tonumber(ARGV[2]))
+return 1
+"""
+
+
+class PrincipalCache:
+    """
+    Двухуровневый кэш Principal по user_id:
+    L1 — LRU в памяти процесса, L2 — Redis hash с TTL.
+    Инвалидация рассылается через pub/sub, чтобы каждый воркер сбросил свою L1-запись.
+
+    invalidate увеличивает поколение пользователя. Поколение читается до запроса в БД
+    и передаётся в set: если между чтением из БД и записью в кэш прошла инвалидация
+    (например, сброс пароля), устаревший Principal не попадёт ни в L2, ни в L1.
+    """
+    CHANNEL = "principal:invalidate"
+
+    def __init__(self, redis: Redis, ttl: int, max_size: int) -> None:
+        self.redis = redis
+        self.ttl = ttl
+        self.max_size = max_size
+        self._local: OrderedDict[int, tuple[float, Principal]] = OrderedDict()
+        self._listener: Optional[asyncio.Task[None]] = None
+        self._retries: set[asyncio.Task[None]] = set()
+        # register_script не ходит в Redis: вызов идёт через EVALSHA (с подгрузкой при NOSCRIPT)
+        self._set_script = redis.register_script(_SET_IF_GENERATION_LUA)
+
+    @staticmethod
+    def _key(user_id: int) -> str:
+        return f"principal:{user_id}"
+
+    @staticmethod
+    def _generation_key(user_id: int) -> str:
+        return f"principal:gen:{user_id}"
+
+    async def load_script(self) -> None:
+        await self.redis.script_load(_SET_IF_GENERATION_LUA)  # type: ignore
+
+    @staticmethod
+    def _dump(principal: Principal) -> dict[str, str]:
+        return {
+            "id": str(principal.id),
+            "email": principal.email,
+            "is_active": "1" if principal.is_active else "0",
+            "email_confirmed": "1" if principal.email_confirmed else "0",
+            "last_password_reset": (
+                principal.last_password_reset.isoformat()
+                if principal.last_password_reset else ""
+            ),
+        }
+
+    @staticmethod
+    def _load(data: dict[str, str]) -> Principal:
+        last_password_reset = data.get("last_password_reset")
+        return Principal(
+            id=int(data["id"]),
+            email=data["email"],
+            is_active=data["is_active"] == "1",
+            email_confirmed=data["email_confirmed"] == "1",
+            last_password_reset=(
+                datetime.fromisoformat(last_password_reset)
+                if last_password_reset else None
+            ),
+        )
+
+    # --- L1 ---
+
+    def _get_local(self, user_id: int) -> Optional[Principal]:
+        entry = self._local.get(user_id)
+        if entry is None:
+            return None
+
+        expires_at, principal = entry
+        if expires_at <= time.monotonic():
+            self._local.pop(user_id, None)
+            return None
+
+        self._local.move_to_end(user_id)
+        return principal
+
+    def _set_local(self, principal: Principal, ttl: Optional[float] = None) -> None:
+        expires_in = self.ttl if ttl is None else min(ttl, self.ttl)
+        self._local[principal.id] = (time.monotonic() + expires_in, principal)
+        self._local.move_to_end(principal.id)
+        while len(self._local) > self.max_size:
+            self._local.popitem(last=False)
+
+    def drop_local(self, user_id: int) -> None:
+        self._local.pop(user_id, None)
+
+    # --- L1 + L2 ---
+
+    async def get(self, user_id: int) -> Optional[Principal]:
+        principal = self._get_local(user_id)
+        if principal is not None:
+            return principal
+
+        try:
+            pipe = self.redis.pipeline(transaction=False)
+            pipe.hgetall(self._key(user_id))
+            pipe.pttl(self._key(user_id))
+            data, pttl = await pipe.execute()
+        except RedisError as e:
+            logger.warning(f"Principal cache: Redis недоступен при чтении: {e}")
+            return None
+
+        if not data:
+            return None
+
+        principal = self._load(data)
+        # L1 не переживает запись L2: устаревший снимок живёт не дольше исходного TTL
+        self._set_local(principal, ttl=pttl / 1000 if pttl > 0 else None)
+        return principal
+
+    async def generation(self, user_id: int) -> Optional[str]:
+        """Текущее поколение пользователя; None — Redis недоступен, кэшировать нельзя."""
+        try:
+            return await self.redis.get(self._generation_key(user_id)) or "0"
+        except RedisError as e:
+            logger.warning(f"Principal cache: Redis недоступен при чтении поколения: {e}")
+            return None
+
+    async def set(self, principal: Principal, generation: Optional[str]) -> None:
+        if generation is None:
+            return
+
+        fields = [item for pair in self._dump(principal).items() for item in pair]
+        try:
+            stored = await self._set_script(
+                keys=[self._key(principal.id), self._generation_key(principal.id)],
+                args=[generation, self.ttl, *fields],
+            )
+        except RedisError as e:
+            logger.warning(f"Principal cache: Redis недоступен при записи: {e}")
+            return
+
+        # поколение сменилось: данные из БД могли устареть, L1 тоже не трогаем
+        if stored:
+            self._set_local(principal)
+
+    async def _invalidate_remote(self, user_id: int) -> bool:
+        try:
+            async with self.redis.pipeline(transaction=True) as pipe:
+                pipe.incr(self._generation_key(user_id))
+                # поколение живёт дольше любой записи кэша, созданной до инвалидации
+                pipe.expire(self._generation_key(user_id), self.ttl * 2)
+                pipe.delete(self._key(user_id))
+                pipe.publish(self.CHANNEL, user_id)
+                await pipe.execute()
+            return True
+        except RedisError as e:
+            logger.error(f"Principal cache: не удалось инвалидировать пользователя {user_id}: {e}")
+            return False
+
+    async def _retry_invalidate(self, user_id: int) -> None:
+        # дольше ttl повторять незачем: записи L1/L2, созданные до инвалидации, к этому времени истекли
+        deadline = time.monotonic() + self.ttl
+        delay = 0.5
+        while time.monotonic() < deadline:
+            await asyncio.sleep(min(delay, max(0.0, deadline - time.monotonic())))
+            if await self._invalidate_remote(user_id):
+                return
+            delay = min(delay * 2, 5.0)
+
+    async def invalidate(self, user_id: int) -> None:
+        """
+        Сбрасывает снимок пользователя во всех процессах. Если Redis недоступен, инвалидация
+        повторяется в фоне; устаревший снимок в любом случае живёт не дольше ttl.
+        """
+        self.drop_local(user_id)
+        if not await self._invalidate_remote(user_id):
+            task = asyncio.create_task(self._retry_invalidate(user_id))
+            self._retries.add(task)
+            task.add_done_callback(self._retries.discard)
+
+    # --- Pub/sub ---
+
+    async def _listen(self) -> None:
+        while True:
+            pubsub = self.redis.pubsub(ignore_subscribe_messages=True)
+            try:
+                await pubsub.subscribe(self.CHANNEL)
+                # сообщения, пропущенные до переподписки, могли устареть — сбрасываем L1 целиком
+                self._local.clear()
+                async for message in pubsub.listen():
+                    try:
+                        self.drop_local(int(message["data"]))
+                    except (TypeError, ValueError):
+                        continue
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Principal cache: подписка прервана, переподключение: {e}")
+                await asyncio.sleep(1)
+            finally:
+                await pubsub.aclose()
+
+    def start_listener(self) -> None:
+        if self._listener is None or self._listener.done():
+            self._listener = asyncio.create_task(self._listen())
+
+    async def stop_listener(self) -> None:
+        for task in list(self._retries):
+            task.cancel()
+        await asyncio.gather(*self._retries, return_exceptions=True)
+
+        if self._listener is None:
+            return
+
+        self._listener.cancel()
+        try:
+            await self._listener
+        except asyncio.CancelledError:
+            pass
+        self._listener = None
+
+
+principal_cache = PrincipalCache(
+    redis=redis_client,
+    ttl=settings.principal_cache_ttl,
+    max_size=settings.principal_cache_max_size,
+)
@@ -0,0 +1,95 @@
+import asyncio
+from collections import defaultdict
+from datetime import datetime
+from typing import Optional
+
+from loguru import logger
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.core.config import settings
+from app.core.metrics import metrics
+from app.db.database import async_session_factory
+from app.auth.repository import UserRepository
+
+
+class UserWriteBehindBuffer:
+    """
+    Копит служебные отметки пользователей (last_login_at и т.п.) в памяти процесса
+    и периодически применяет их пакетными UPDATE вместо UPDATE + COMMIT на каждый вход.
+    Для одного пользователя хранится только самое позднее значение.
+    """
+    FIELDS = frozenset({"last_login_at"})
+
+    def __init__(
+        self,
+        session_factory: async_sessionmaker[AsyncSession],
+        flush_interval: float,
+        batch_size: int,
+    ) -> None:
+        self.session_factory = session_factory
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self._pending: dict[str, dict[int, datetime]] = defaultdict(dict)
+        self._flusher: Optional[asyncio.Task[None]] = None
+        self._stopping = asyncio.Event()
+        self._lock = asyncio.Lock()
+
+    def record(self, user_id: int, field: str, value: datetime) -> None:
+        if field not in self.FIELDS:
+            raise ValueError(f"Поле {field} не поддерживается отложенной записью")
+
+        pending = self._pending[field]
+        current = pending.get(user_id)
+        if current is None or current < value:
+            pending[user_id] = value
+
+    def _restore(self, field: str, rows: dict[int, datetime]) -> None:
+        for user_id, value in rows.items():
+            self.record(user_id, field, value)
+
+    async def flush(self) -> None:
+        async with self._lock:
+            pending, self._pending = self._pending, defaultdict(dict)
+
+            for field, rows in pending.items():
+                # пачки по возрастанию id: блокировки в bulk_update_timestamps берутся в том же порядке
+                items = sorted(rows.items())
+                for start in range(0, len(items), self.batch_size):
+                    batch = items[start:start + self.batch_size]
+                    try:
+                        async with self.session_factory() as session:
+                            await UserRepository(session).bulk_update_timestamps(field, batch)
+                        metrics.inc("write_behind_rows_total", len(batch), field=field)
+                    except Exception as e:
+                        logger.exception(f"Write-behind: не удалось записать {field}: {e}")
+                        # вернём остаток в буфер, попробуем при следующем сбросе
+                        self._restore(field, dict(items[start:]))
+                        break
+
+    async def _run(self) -> None:
+        # не отменяем задачу посреди сброса: иначе вынутая из буфера пачка потеряется
+        while not self._stopping.is_set():
+            try:
+                await asyncio.wait_for(self._stopping.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                await self.flush()
+
+    def start(self) -> None:
+        if self._flusher is None or self._flusher.done():
+            self._stopping.clear()
+            self._flusher = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        self._stopping.set()
+        if self._flusher is not None:
+            await self._flusher
+            self._flusher = None
+
+        await self.flush()
+
+
+user_write_behind = UserWriteBehindBuffer(
+    session_factory=async_session_factory,
+    flush_interval=settings.write_behind_flush_interval,
+    batch_size=settings.write_behind_batch_size,
+)
@@ -4,7 +4,15 @@ from loguru import logger
 
 from app.core.settings.app import AppSettings
 from app.db.db_events import connect_to_database, close_database_connection
+from app.db.redis import redis_client
 from app.db.redis_events import connect_to_redis, close_redis_connection
+from app.auth.repository import RefreshTokenRepository, OneTimeTokenRepository, LoginAttemptRepository
+from app.api.dependencies.limiter import limiter, RedisLimiter
+from app.auth.utils.write_behind import user_write_behind
+from app.auth.utils.principal_cache import principal_cache
+from app.auth.utils.password_handler import password_hasher, calibrate_password_hashing
+from app.finance.transactions.importing.service import cancel_running_imports
+from app.db.partitions import transaction_partitions
 
 
 def create_start_app_handler(app: FastAPI, settings: AppSettings) -> Callable[[], Coroutine[Any, Any, None]]:
@@ -12,12 +20,29 @@ def create_start_app_handler(app: FastAPI, settings: AppSettings) -> Callable[[]
     async def start_app() -> None:
         await connect_to_database(app, settings)
         await connect_to_redis(app)
+        await RefreshTokenRepository.load_scripts(redis_client)
+        await OneTimeTokenRepository.load_scripts(redis_client)
+        await LoginAttemptRepository.load_scripts(redis_client)
+        if isinstance(limiter, RedisLimiter):
+            await limiter.load_script()
+        await principal_cache.load_script()
+        principal_cache.start_listener()
+        user_write_behind.start()
+        transaction_partitions.start()
+        if settings.password_bcrypt_calibrate:
+            await calibrate_password_hashing(redis_client)
     return start_app
 
 
 def create_stop_app_handler(app: FastAPI) -> Callable[[], Coroutine[Any, Any, None]]:
     @logger.catch
     async def stop_app() -> None:
+        # буфер сбрасывается до закрытия пула соединений с БД
+        await user_write_behind.stop()
+        await principal_cache.stop_listener()
+        password_hasher.shutdown()
+        await cancel_running_imports()
+        await transaction_partitions.stop()
         await close_database_connection(app)
         await close_redis_connection(app)
     return stop_app
\ No newline at end of file
@@ -0,0 +1,64 @@
+from collections import defaultdict
+from threading import Lock
+from typing import Any, Dict, Tuple
+
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+class Metrics:
+    """
+    Простейший реестр метрик процесса: счётчики, gauge-значения и тайминги.
+    Снимок отдаётся эндпоинтом /metrics (если он включён в настройках).
+    """
+
+    def __init__(self) -> None:
+        self._lock = Lock()
+        self._counters: Dict[str, Dict[LabelKey, float]] = defaultdict(lambda: defaultdict(float))
+        self._gauges: Dict[str, Dict[LabelKey, float]] = defaultdict(dict)
+        self._timings: Dict[str, Dict[LabelKey, list[float]]] = defaultdict(dict)
+
+    @staticmethod
+    def _labels(labels: Dict[str, Any]) -> LabelKey:
+        return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+    def inc(self, name: str, value: float = 1, **labels: Any) -> None:
+        with self._lock:
+            self._counters[name][self._labels(labels)] += value
+
+    def set_gauge(self, name: str, value: float, **labels: Any) -> None:
+        with self._lock:
+            self._gauges[name][self._labels(labels)] = value
+
+    def observe(self, name: str, seconds: float, **labels: Any) -> None:
+        # храним count / sum / max, без гистограмм
+        with self._lock:
+            stat = self._timings[name].setdefault(self._labels(labels), [0, 0.0, 0.0])
+            stat[0] += 1
+            stat[1] += seconds
+            stat[2] = max(stat[2], seconds)
+
+    def snapshot(self) -> Dict[str, Any]:
+        def series(values: Dict[LabelKey, Any]) -> list[Dict[str, Any]]:
+            return [{"labels": dict(key), "value": value} for key, value in values.items()]
+
+        with self._lock:
+            return {
+                "counters": {name: series(values) for name, values in self._counters.items()},
+                "gauges": {name: series(values) for name, values in self._gauges.items()},
+                "timings": {
+                    name: [
+                        {
+                            "labels": dict(key),
+                            "count": count,
+                            "sum": total,
+                            "max": peak,
+                        }
+                        for key, (count, total, peak) in values.items()
+                    ]
+                    for name, values in self._timings.items()
+                },
+            }
+
+
+metrics = Metrics()
@@ -1,6 +1,6 @@
 import logging
 import sys
-from typing import Any, Dict, Tuple, Literal
+from typing import Any, Dict, Tuple, Literal, Optional
 from loguru import logger
 from pydantic import PostgresDsn, RedisDsn
 
@@ -12,7 +12,15 @@ class AppSettings(BaseAppSettings):
     # --- Пароли ---
     password_validation_level: Literal["none", "light", "medium", "strong"]  # Уровень строгости валидации паролей
     passwords_common_list_path: str  # Путь к файлу со списком часто используемых паролей
+    passwords_common_index_path: Optional[str] = None  # Путь к собранному индексу паролей (приоритетнее текстового списка)
     password_bcrypt_salt_rounds: int # Количество раундов при генерации соли для шифрования пароля
+    password_bcrypt_calibrate: bool = False  # Подбирать количество раундов bcrypt под password_bcrypt_target_ms (один раз на все процессы, хранится в Redis)
+    password_bcrypt_target_ms: int = 250  # Допустимое время одного хэширования при калибровке (в миллисекундах)
+    password_bcrypt_min_rounds: int = 10  # Нижняя граница раундов при калибровке
+    password_bcrypt_max_rounds: int = 16  # Верхняя граница раундов при калибровке
+    password_hash_executor: Literal["thread", "process"] = "thread"  # Пул для bcrypt: потоки или процессы
+    password_hash_concurrency: int = 4  # Максимум одновременных операций bcrypt в процессе
+    password_hash_max_queue: int = 32  # Максимум ожидающих операций, сверх него — 503
 
     # --- Аргументы FastAPI ---
     debug: bool
@@ -27,11 +35,17 @@ class AppSettings(BaseAppSettings):
     database_url: PostgresDsn
     connection_count: int
     additional_connections: int
+    write_behind_flush_interval: float = 5.0  # Период сброса отложенных служебных записей пользователей (в секундах)
+    write_behind_batch_size: int = 1000  # Максимум строк в одном пакетном UPDATE
 
     # --- Redis ---
     redis_url: RedisDsn
     redis_max_connections: int
 
+    # --- Кэш аутентифицированных пользователей ---
+    principal_cache_ttl: int = 60  # Время жизни снимка пользователя в L1/L2 кэше (в секундах)
+    principal_cache_max_size: int = 10_000  # Максимум записей в локальном (L1) LRU-кэше процесса
+
     # --- Логгер ---
     logging_level: int = logging.INFO
     loggers: Tuple[str, str] = ("uvicorn.asgi", "uvicorn.access")
@@ -46,10 +60,13 @@ class AppSettings(BaseAppSettings):
     jwt_reset_token_expire: int  # Время жизни токена для сброса пароля (в минутах)
     jwt_private_key_path: str  # Путь к файлу с приватным ключом для JWT
     jwt_public_key_path: str  # Путь к файлу с публичным ключом для JWT
+    jwt_verified_cache_size: int = 10_000  # Максимум проверенных токенов в кэше процесса
     cookie_secure: bool
 
     # --- Email ---
     email_templates_path: str  # Путь к шаблонам email-сообщений
+    email_templates_bytecode_cache_dir: Optional[str] = None  # Каталог байткода шаблонов (по умолчанию во временном каталоге)
+    email_templates_auto_reload: bool = False  # Перечитывать изменённые шаблоны (для разработки)
     enable_email_confirmation: bool  # Включение подтверждения по email
     email_confirm_token_expire: int  # Время жизни токена подтверждения email (в минутах)
 
@@ -59,9 +76,51 @@ class AppSettings(BaseAppSettings):
     smtp_password: str  # Пароль для SMTP-сервера
     smtp_host: str  # Хост SMTP-сервера
     smtp_port: int  # Порт SMTP-сервера
+    smtp_pool_size: int = 4  # Максимум одновременных SMTP-соединений в пуле
+    smtp_pool_idle_timeout: float = 60.0  # Через сколько секунд простоя соединение закрывается
+    smtp_pool_max_messages: int = 100  # Писем через одно соединение до переподключения
+    smtp_pool_health_check_interval: float = 15.0  # Простой (в секундах), после которого перед отправкой шлётся NOOP
+
+    # --- Очередь писем ---
+    email_outbox_stream: str = "email:outbox"  # Redis Stream с исходящими письмами
+    email_outbox_dead_maxlen: int = 10_000  # Примерный предел длины потока dead letter
+    email_worker_batch_size: int = 16  # Писем, забираемых воркером за раз
+    email_worker_block_ms: int = 5000  # Ожидание новых писем в XREADGROUP (в мс)
+    # Через сколько мс неподтверждённое письмо отправляется повторно; должно быть больше худшего
+    # времени пачки: 3 попытки tenacity по несколько SMTP-команд с таймаутом 10 с, 16 писем на 4 соединения
+    email_worker_claim_idle_ms: int = 900_000
+    email_worker_max_attempts: int = 5  # Попыток отправки до переноса в dead letter
+
+    # --- Транзакции ---
+    transactions_stream_batch_size: int = 1000  # Строк в одной пачке при потоковой выдаче
+    transactions_export_batch_size: int = 10_000  # Строк в одной пачке (row group Parquet) при выгрузке
+    transactions_bulk_max_items: int = 5000  # Максимум транзакций в POST /transactions/bulk
+    transactions_import_batch_size: int = 5000  # Строк выписки, загружаемых одним COPY
+    transactions_import_max_bytes: int = 200 * 1024 * 1024  # Максимальный размер файла выписки
+    transactions_import_progress_ttl: int = 24 * 3600  # Время жизни прогресса импорта в Redis (в секундах)
+    transactions_partition_months_ahead: int = 3  # На сколько месяцев вперёд создаются секции transactions
+    transactions_history_years: int = 5  # За сколько лет назад создаются секции и принимаются операции
+    transactions_partition_lock_timeout_ms: int = 2000  # Ожидание блокировки при подключении секции (в мс)
+    transactions_partition_check_interval: float = 6 * 3600  # Период проверки секций (в секундах)
+    transactions_partition_retry_interval: float = 60  # Повтор, если секция не дождалась блокировки (в секундах)
+
+    # --- Недельная сводка ---
+    digest_chunk_size: int = 500  # Пользователей в одной пачке рассылки
+    digest_send_concurrency: int = 4  # Одновременных отправок
+    digest_send_rate: float = 10.0  # Писем в секунду (0 — без ограничения)
+    digest_top_categories: int = 3  # Категорий расходов в письме
+    digest_checkpoint_ttl: int = 14 * 24 * 3600  # Время жизни прогресса рассылки в Redis (в секундах)
 
     # --- Ограничения ---
     enable_rate_limiter: bool  # Включение ограничителя частоты запросов
+    login_max_failures: int = 5  # Неудачных входов на email до блокировки
+    login_ip_max_failures: int = 50  # Неудачных входов с одного IP до блокировки
+    login_failure_window: int = 900  # Окно подсчёта неудачных входов (в секундах)
+    login_lockout_base: int = 30  # Первая блокировка (в секундах), каждая следующая вдвое дольше
+    login_lockout_max: int = 3600  # Максимальная длительность блокировки (в секундах)
+
+    # --- Метрики ---
+    enable_metrics_endpoint: bool = False  # Публикация снимка метрик по GET /metrics
 
     @property
     # --- Аргументы FastAPI ---
@@ -1,6 +1,8 @@
 import asyncio
+import re
 from logging.config import fileConfig
 import sys
+from typing import Optional
 
 from sqlalchemy import pool
 from sqlalchemy.engine import Connection
@@ -26,10 +28,23 @@ def get_database_url() -> str:
     return str(settings.database_url)
 
 
+# Месячные секции transactions и секция DEFAULT создаются миграциями и app/db/partitions.py,
+# в моделях их нет: без фильтра autogenerate предложил бы их удалить. Первичный ключ, который
+# есть у модели Transaction и отсутствует у секционированной таблицы, autogenerate не сравнивает
+PARTITION_TABLE = re.compile(r"^transactions_(default|p\d{4}_\d{2})$")
+
+
+def include_name(name: Optional[str], type_: str, parent_names: dict[str, Optional[str]]) -> bool:
+    if type_ == "table" and name is not None:
+        return not PARTITION_TABLE.match(name)
+    return True
+
+
 def run_migrations_offline() -> None:
     context.configure(
         url=get_database_url(),
         target_metadata=target_metadata,
+        include_name=include_name,
         literal_binds=True,
         dialect_opts={"paramstyle": "named"},
     )
@@ -42,6 +57,7 @@ def do_run_migrations(connection: Connection) -> None:
     context.configure(
         connection=connection,
         target_metadata=target_metadata,
+        include_name=include_name,
     )
 
     with context.begin_transaction():
@@ -0,0 +1,193 @@
+"""transactions default partition holds only undated rows
+
+Revision ID: 2f6b8a0c4e71
+Revises: 7d1c3b9e5f24
+Create Date: 2026-10-18 19:00:00.000000
+
+После 5b2e8d4f6a10 история оставалась в секции DEFAULT, и каждая новая месячная секция
+проверяла DEFAULT полным чтением (EXISTS в create_transactions_partition и проверка
+при создании секции под ACCESS EXCLUSIVE на DEFAULT).
+
+Миграция раскладывает датированные строки DEFAULT по месячным секциям — каждый месяц
+отдельной транзакцией, на время переноса запись в DEFAULT блокируется (SHARE ROW EXCLUSIVE),
+чтение — нет. Затем на DEFAULT добавляется CHECK (occurred_at IS NULL): по нему Postgres
+доказывает, что в DEFAULT нет строк новой секции, и не читает её при подключении секции.
+
+Новая create_transactions_partition создаёт пустую таблицу и подключает её через ATTACH PARTITION:
+родитель блокируется в режиме SHARE UPDATE EXCLUSIVE (чтение и запись продолжаются),
+DEFAULT — ACCESS EXCLUSIVE, но только на время изменения каталога, без чтения строк.
+Строка с датой за месяц без секции теперь не попадёт в DEFAULT, а нарушит CHECK,
+поэтому секции заранее создаёт фоновая задача приложения за всё окно допустимых дат,
+а запись с датой вне окна отклоняется валидацией (app/db/partitions.py).
+"""
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '2f6b8a0c4e71'
+down_revision: Union[str, Sequence[str], None] = '7d1c3b9e5f24'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+CONSTRAINT = 'transactions_default_occurred_at_null'
+
+DEFAULT_MONTHS_SQL = sa.text("""
+    SELECT DISTINCT date_trunc('month', occurred_at AT TIME ZONE 'UTC')::date AS month
+    FROM transactions_default
+    WHERE occurred_at IS NOT NULL
+    ORDER BY month
+""")
+
+# create_transactions_partition из 5b2e8d4f6a10 переносит строки месяца из DEFAULT в новую секцию;
+# блокировка не даёт параллельной вставке добавить в DEFAULT строку этого месяца до ATTACH
+MOVE_MONTH_SQL = """
+    LOCK TABLE transactions_default IN SHARE ROW EXCLUSIVE MODE;
+    PERFORM create_transactions_partition({month});
+"""
+
+CREATE_PARTITION_FUNCTION = """
+CREATE OR REPLACE FUNCTION create_transactions_partition(month_start date) RETURNS boolean
+LANGUAGE plpgsql AS $$
+DECLARE
+    partition_name text := format('transactions_p%s', to_char(month_start, 'YYYY_MM'));
+    next_month date := (date_trunc('month', month_start) + interval '1 month')::date;
+    -- границы считаются в UTC, а не в часовом поясе сессии
+    range_from timestamptz := make_timestamptz(
+        extract(year FROM month_start)::int, extract(month FROM month_start)::int, 1, 0, 0, 0, 'UTC'
+    );
+    range_to timestamptz := make_timestamptz(
+        extract(year FROM next_month)::int, extract(month FROM next_month)::int, 1, 0, 0, 0, 'UTC'
+    );
+BEGIN
+    IF to_regclass(partition_name) IS NOT NULL THEN
+        RETURN false;
+    END IF;
+
+    -- несколько процессов приложения могут запустить создание одновременно
+    PERFORM pg_advisory_xact_lock(hashtext('create_transactions_partition'));
+    IF to_regclass(partition_name) IS NOT NULL THEN
+        RETURN false;
+    END IF;
+
+    -- ATTACH вместо CREATE ... PARTITION OF: родитель не блокируется для чтения и записи;
+    -- DEFAULT не читается благодаря CHECK (occurred_at IS NULL)
+    EXECUTE format(
+        'CREATE TABLE %I (LIKE transactions INCLUDING DEFAULTS INCLUDING CONSTRAINTS)',
+        partition_name
+    );
+    EXECUTE format(
+        'ALTER TABLE transactions ATTACH PARTITION %I FOR VALUES FROM (%L) TO (%L)',
+        partition_name, range_from, range_to
+    );
+
+    RETURN true;
+END;
+$$
+"""
+
+# версия из 5b2e8d4f6a10: без CHECK на DEFAULT в ней могут оказаться строки любого месяца
+PREVIOUS_PARTITION_FUNCTION = """
+CREATE OR REPLACE FUNCTION create_transactions_partition(month_start date) RETURNS boolean
+LANGUAGE plpgsql AS $$
+DECLARE
+    partition_name text := format('transactions_p%s', to_char(month_start, 'YYYY_MM'));
+    next_month date := (date_trunc('month', month_start) + interval '1 month')::date;
+    -- границы считаются в UTC, а не в часовом поясе сессии
+    range_from timestamptz := make_timestamptz(
+        extract(year FROM month_start)::int, extract(month FROM month_start)::int, 1, 0, 0, 0, 'UTC'
+    );
+    range_to timestamptz := make_timestamptz(
+        extract(year FROM next_month)::int, extract(month FROM next_month)::int, 1, 0, 0, 0, 'UTC'
+    );
+BEGIN
+    IF to_regclass(partition_name) IS NOT NULL THEN
+        RETURN false;
+    END IF;
+
+    -- несколько процессов приложения могут запустить создание одновременно
+    PERFORM pg_advisory_xact_lock(hashtext('create_transactions_partition'));
+    IF to_regclass(partition_name) IS NOT NULL THEN
+        RETURN false;
+    END IF;
+
+    IF EXISTS (
+        SELECT 1 FROM transactions_default
+        WHERE occurred_at >= range_from AND occurred_at < range_to
+    ) THEN
+        -- строки месяца уже лежат в DEFAULT: переносим их и подключаем таблицу как секцию
+        EXECUTE format(
+            'CREATE TABLE %I (LIKE transactions INCLUDING DEFAULTS INCLUDING CONSTRAINTS)',
+            partition_name
+        );
+        EXECUTE format(
+            'WITH moved AS ('
+            '    DELETE FROM transactions_default WHERE occurred_at >= $1 AND occurred_at < $2'
+            '    RETURNING id, user_id, category_id, amount, description, occurred_at, created_at'
+            ') INSERT INTO %I (id, user_id, category_id, amount, description, occurred_at, created_at)'
+            ' SELECT * FROM moved',
+            partition_name
+        ) USING range_from, range_to;
+        EXECUTE format(
+            'ALTER TABLE transactions ATTACH PARTITION %I FOR VALUES FROM (%L) TO (%L)',
+            partition_name, range_from, range_to
+        );
+    ELSE
+        EXECUTE format(
+            'CREATE TABLE %I PARTITION OF transactions FOR VALUES FROM (%L) TO (%L)',
+            partition_name, range_from, range_to
+        );
+    END IF;
+
+    RETURN true;
+END;
+$$
+"""
+
+
+def _move_month_block(month: str) -> str:
+    return f"DO $$ BEGIN {MOVE_MONTH_SQL.format(month=month)} END $$"
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    add_constraint = (
+        f'ALTER TABLE transactions_default ADD CONSTRAINT {CONSTRAINT} CHECK (occurred_at IS NULL) NOT VALID'
+    )
+    validate_constraint = f'ALTER TABLE transactions_default VALIDATE CONSTRAINT {CONSTRAINT}'
+
+    if op.get_context().as_sql:
+        # при генерации SQL месяцы неизвестны: перенос одним блоком в транзакции миграции
+        op.execute(f"""
+            DO $$
+            DECLARE
+                target_month date;
+            BEGIN
+                FOR target_month IN {DEFAULT_MONTHS_SQL.text} LOOP
+                    {MOVE_MONTH_SQL.format(month='target_month')}
+                END LOOP;
+            END
+            $$
+        """)
+        op.execute(add_constraint)
+        op.execute(validate_constraint)
+    else:
+        months = op.get_bind().execute(DEFAULT_MONTHS_SQL).scalars().all()
+        with op.get_context().autocommit_block():
+            for month in months:
+                op.execute(_move_month_block(f"DATE '{month.isoformat()}'"))
+            # место удалённых строк освобождается до проверки CHECK, которая читает всю таблицу
+            op.execute('VACUUM transactions_default')
+            # NOT VALID и VALIDATE в разных транзакциях: проверка строк не блокирует запись в DEFAULT
+            op.execute(add_constraint)
+            op.execute(validate_constraint)
+
+    op.execute(CREATE_PARTITION_FUNCTION)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute(PREVIOUS_PARTITION_FUNCTION)
+    op.execute(f'ALTER TABLE transactions_default DROP CONSTRAINT IF EXISTS {CONSTRAINT}')
@@ -0,0 +1,45 @@
+"""transactions description trigram index
+
+Revision ID: 3a7d5e9c1f08
+Revises: 8c4e1f2a9b37
+Create Date: 2026-10-18 11:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3a7d5e9c1f08'
+down_revision: Union[str, Sequence[str], None] = '8c4e1f2a9b37'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_transactions_description_trgm',
+            'transactions',
+            ['description'],
+            unique=False,
+            postgresql_using='gin',
+            postgresql_ops={'description': 'gin_trgm_ops'},
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            'ix_transactions_description_trgm',
+            table_name='transactions',
+            postgresql_concurrently=True,
+            if_exists=True,
+        )
+    # расширение не удаляется: им могут пользоваться другие объекты базы
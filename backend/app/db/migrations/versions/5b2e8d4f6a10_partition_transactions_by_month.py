@@ -0,0 +1,212 @@
+"""partition transactions by month
+
+Revision ID: 5b2e8d4f6a10
+Revises: 3a7d5e9c1f08
+Create Date: 2026-10-18 15:00:00.000000
+
+Существующая таблица без копирования данных становится секцией DEFAULT новой
+секционированной таблицы transactions (RANGE по occurred_at): переименование
+и ATTACH ... DEFAULT не перезаписывают строки, индексы секции подключаются к индексам
+родителя без перестроения. В DEFAULT остаются строки без даты и строки за месяцы,
+для которых ещё нет секции.
+
+Функция create_transactions_partition(month) создаёт секцию месяца и переносит в неё
+строки этого месяца из DEFAULT. Миграция создаёт секции с текущего месяца
+на MONTHS_AHEAD месяцев вперёд, следующие заранее создаёт приложение (app/db/partitions.py).
+Историю по секциям раскладывает следующая миграция 2f6b8a0c4e71, после неё в DEFAULT
+остаются только строки без даты.
+
+Первичного ключа у секционированной таблицы нет: он должен включать ключ секционирования,
+а occurred_at допускает NULL. Уникальность id обеспечивает последовательность,
+поиск по id — индекс ix_transactions_id. Его индекс секции DEFAULT строится CONCURRENTLY
+до переименования таблицы (запись не блокируется) и затем подключается, а не строится
+по всей истории внутри транзакции миграции под ACCESS EXCLUSIVE.
+"""
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5b2e8d4f6a10'
+down_revision: Union[str, Sequence[str], None] = '3a7d5e9c1f08'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+MONTHS_AHEAD = 3
+
+# имена индексов транзакций -> имена тех же индексов у секции DEFAULT
+INDEXES = {
+    'ix_transactions_category_id': 'transactions_default_category_id_idx',
+    'ix_transactions_user_occurred_at_id': 'transactions_default_user_occurred_at_id_idx',
+    'ix_transactions_user_category_amount': 'transactions_default_user_category_amount_idx',
+    'ix_transactions_description_trgm': 'transactions_default_description_trgm_idx',
+}
+
+# индекс по id взамен индекса первичного ключа; у существующей таблицы строится заранее
+ID_INDEX = 'ix_transactions_id'
+DEFAULT_ID_INDEX = 'transactions_default_id_idx'
+
+CREATE_PARTITION_FUNCTION = """
+CREATE OR REPLACE FUNCTION create_transactions_partition(month_start date) RETURNS boolean
+LANGUAGE plpgsql AS $$
+DECLARE
+    partition_name text := format('transactions_p%s', to_char(month_start, 'YYYY_MM'));
+    next_month date := (date_trunc('month', month_start) + interval '1 month')::date;
+    -- границы считаются в UTC, а не в часовом поясе сессии
+    range_from timestamptz := make_timestamptz(
+        extract(year FROM month_start)::int, extract(month FROM month_start)::int, 1, 0, 0, 0, 'UTC'
+    );
+    range_to timestamptz := make_timestamptz(
+        extract(year FROM next_month)::int, extract(month FROM next_month)::int, 1, 0, 0, 0, 'UTC'
+    );
+BEGIN
+    IF to_regclass(partition_name) IS NOT NULL THEN
+        RETURN false;
+    END IF;
+
+    -- несколько процессов приложения могут запустить создание одновременно
+    PERFORM pg_advisory_xact_lock(hashtext('create_transactions_partition'));
+    IF to_regclass(partition_name) IS NOT NULL THEN
+        RETURN false;
+    END IF;
+
+    IF EXISTS (
+        SELECT 1 FROM transactions_default
+        WHERE occurred_at >= range_from AND occurred_at < range_to
+    ) THEN
+        -- строки месяца уже лежат в DEFAULT: переносим их и подключаем таблицу как секцию
+        EXECUTE format(
+            'CREATE TABLE %I (LIKE transactions INCLUDING DEFAULTS INCLUDING CONSTRAINTS)',
+            partition_name
+        );
+        EXECUTE format(
+            'WITH moved AS ('
+            '    DELETE FROM transactions_default WHERE occurred_at >= $1 AND occurred_at < $2'
+            '    RETURNING id, user_id, category_id, amount, description, occurred_at, created_at'
+            ') INSERT INTO %I (id, user_id, category_id, amount, description, occurred_at, created_at)'
+            ' SELECT * FROM moved',
+            partition_name
+        ) USING range_from, range_to;
+        EXECUTE format(
+            'ALTER TABLE transactions ATTACH PARTITION %I FOR VALUES FROM (%L) TO (%L)',
+            partition_name, range_from, range_to
+        );
+    ELSE
+        EXECUTE format(
+            'CREATE TABLE %I PARTITION OF transactions FOR VALUES FROM (%L) TO (%L)',
+            partition_name, range_from, range_to
+        );
+    END IF;
+
+    RETURN true;
+END;
+$$
+"""
+
+
+def _create_indexes() -> None:
+    op.create_index('ix_transactions_category_id', 'transactions', ['category_id'], unique=False)
+    op.create_index(
+        'ix_transactions_user_occurred_at_id',
+        'transactions',
+        ['user_id', sa.text('occurred_at DESC NULLS LAST'), sa.text('id DESC')],
+        unique=False,
+    )
+    op.create_index(
+        'ix_transactions_user_category_amount',
+        'transactions',
+        ['user_id', 'category_id'],
+        unique=False,
+        postgresql_include=['amount'],
+    )
+    op.create_index(
+        'ix_transactions_description_trgm',
+        'transactions',
+        ['description'],
+        unique=False,
+        postgresql_using='gin',
+        postgresql_ops={'description': 'gin_trgm_ops'},
+    )
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Если построение прервётся, останется индекс в статусе INVALID —
+    # его нужно удалить и повторить миграцию
+    with op.get_context().autocommit_block():
+        op.execute(f'CREATE INDEX CONCURRENTLY IF NOT EXISTS {DEFAULT_ID_INDEX} ON transactions (id)')
+
+    op.rename_table('transactions', 'transactions_default')
+    for name, partition_name in INDEXES.items():
+        op.execute(f'ALTER INDEX {name} RENAME TO {partition_name}')
+    op.drop_constraint('transactions_pkey', 'transactions_default', type_='primary')
+    op.execute('ALTER SEQUENCE transactions_id_seq OWNED BY NONE')
+
+    op.execute("""
+        CREATE TABLE transactions (
+            id integer NOT NULL DEFAULT nextval('transactions_id_seq'),
+            user_id integer NOT NULL,
+            category_id integer NOT NULL,
+            amount numeric(12, 2) NOT NULL,
+            description varchar(255),
+            occurred_at timestamptz,
+            created_at timestamptz NOT NULL DEFAULT now(),
+            CONSTRAINT check_amount_positive CHECK (amount > 0),
+            CONSTRAINT transactions_user_id_fkey
+                FOREIGN KEY (user_id) REFERENCES users (id) ON DELETE CASCADE,
+            CONSTRAINT transactions_category_id_fkey
+                FOREIGN KEY (category_id) REFERENCES categories (id) ON DELETE RESTRICT
+        ) PARTITION BY RANGE (occurred_at)
+    """)
+    op.execute('ALTER SEQUENCE transactions_id_seq OWNED BY transactions.id')
+
+    # других секций пока нет, поэтому проверка строк DEFAULT не нужна и подключение мгновенное
+    op.execute('ALTER TABLE transactions ATTACH PARTITION transactions_default DEFAULT')
+
+    # одинаковые индексы секции подключаются к индексам родителя, а не строятся заново
+    _create_indexes()
+    op.create_index(ID_INDEX, 'transactions', ['id'], unique=False)
+
+    op.execute(CREATE_PARTITION_FUNCTION)
+    op.execute(f"""
+        SELECT create_transactions_partition(
+            (date_trunc('month', now() AT TIME ZONE 'UTC') + make_interval(months => m))::date
+        )
+        FROM generate_series(0, {MONTHS_AHEAD}) AS m
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute('DROP FUNCTION IF EXISTS create_transactions_partition(date)')
+
+    op.execute("""
+        CREATE TABLE transactions_unpartitioned (
+            id integer NOT NULL DEFAULT nextval('transactions_id_seq'),
+            user_id integer NOT NULL,
+            category_id integer NOT NULL,
+            amount numeric(12, 2) NOT NULL,
+            description varchar(255),
+            occurred_at timestamptz,
+            created_at timestamptz NOT NULL DEFAULT now(),
+            CONSTRAINT transactions_pkey PRIMARY KEY (id),
+            CONSTRAINT check_amount_positive CHECK (amount > 0),
+            CONSTRAINT transactions_user_id_fkey
+                FOREIGN KEY (user_id) REFERENCES users (id) ON DELETE CASCADE,
+            CONSTRAINT transactions_category_id_fkey
+                FOREIGN KEY (category_id) REFERENCES categories (id) ON DELETE RESTRICT
+        )
+    """)
+    op.execute("""
+        INSERT INTO transactions_unpartitioned
+            (id, user_id, category_id, amount, description, occurred_at, created_at)
+        SELECT id, user_id, category_id, amount, description, occurred_at, created_at
+        FROM transactions
+    """)
+    op.execute('ALTER SEQUENCE transactions_id_seq OWNED BY NONE')
+    op.execute('DROP TABLE transactions')
+    op.rename_table('transactions_unpartitioned', 'transactions')
+    op.execute('ALTER SEQUENCE transactions_id_seq OWNED BY transactions.id')
+    _create_indexes()
@@ -0,0 +1,76 @@
+"""transactions user description trigram index
+
+Revision ID: 7d1c3b9e5f24
+Revises: 5b2e8d4f6a10
+Create Date: 2026-10-18 18:00:00.000000
+
+Поиск по описанию всегда ограничен пользователем, а глобальный индекс по description
+для частых слов («кофе», «такси») возвращает совпадения всех пользователей, которые затем
+отбрасываются по user_id. Составной GIN-индекс (user_id, description gin_trgm_ops)
+с расширением btree_gin пересекает оба условия внутри индекса.
+
+У секционированной таблицы CREATE INDEX CONCURRENTLY не поддерживается, поэтому индекс
+создаётся на родителе через ON ONLY (без построения), строится CONCURRENTLY на каждой секции
+и подключается к родительскому через ATTACH PARTITION. Запись в секции во время построения
+не блокируется. При генерации SQL (--sql) секции неизвестны, и индекс создаётся одной командой.
+"""
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7d1c3b9e5f24'
+down_revision: Union[str, Sequence[str], None] = '5b2e8d4f6a10'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+INDEX = 'ix_transactions_user_description_trgm'
+COLUMNS = '(user_id, description gin_trgm_ops)'
+
+PARTITIONS_SQL = sa.text("""
+    SELECT c.relname
+    FROM pg_inherits i
+    JOIN pg_class c ON c.oid = i.inhrelid
+    WHERE i.inhparent = 'transactions'::regclass
+    ORDER BY c.relname
+""")
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute("CREATE EXTENSION IF NOT EXISTS btree_gin")
+
+    if op.get_context().as_sql:
+        op.execute(f"CREATE INDEX IF NOT EXISTS {INDEX} ON transactions USING gin {COLUMNS}")
+    else:
+        op.execute(f"CREATE INDEX IF NOT EXISTS {INDEX} ON ONLY transactions USING gin {COLUMNS}")
+        partitions = op.get_bind().execute(PARTITIONS_SQL).scalars().all()
+        # Если построение прервётся, останется индекс секции в статусе INVALID —
+        # его нужно удалить и повторить миграцию
+        with op.get_context().autocommit_block():
+            for partition in partitions:
+                partition_index = f'{partition}_user_id_description_idx'
+                op.execute(
+                    f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {partition_index} "
+                    f"ON {partition} USING gin {COLUMNS}"
+                )
+                op.execute(f"ALTER INDEX {INDEX} ATTACH PARTITION {partition_index}")
+
+    # глобальный индекс по description больше не нужен: поиск всегда идёт с user_id
+    op.drop_index('ix_transactions_description_trgm', table_name='transactions', if_exists=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.create_index(
+        'ix_transactions_description_trgm',
+        'transactions',
+        ['description'],
+        unique=False,
+        postgresql_using='gin',
+        postgresql_ops={'description': 'gin_trgm_ops'},
+    )
+    op.drop_index(INDEX, table_name='transactions', if_exists=True)
+    # расширение не удаляется: им могут пользоваться другие объекты базы
@@ -0,0 +1,74 @@
+"""transactions composite indexes
+
+Revision ID: 8c4e1f2a9b37
+Revises: d37238fc3c7a
+Create Date: 2026-10-18 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8c4e1f2a9b37'
+down_revision: Union[str, Sequence[str], None] = 'd37238fc3c7a'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # CREATE INDEX CONCURRENTLY не работает внутри транзакции и не блокирует запись в таблицу.
+    # Если построение прервётся, останется индекс в статусе INVALID — его нужно удалить и повторить миграцию.
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_transactions_user_occurred_at_id',
+            'transactions',
+            ['user_id', sa.text('occurred_at DESC NULLS LAST'), sa.text('id DESC')],
+            unique=False,
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+        op.create_index(
+            'ix_transactions_user_category_amount',
+            'transactions',
+            ['user_id', 'category_id'],
+            unique=False,
+            postgresql_include=['amount'],
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+        # префикс нового составного индекса, только замедлял запись
+        op.drop_index(
+            'ix_transactions_user_id',
+            table_name='transactions',
+            postgresql_concurrently=True,
+            if_exists=True,
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_transactions_user_id',
+            'transactions',
+            ['user_id'],
+            unique=False,
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+        op.drop_index(
+            'ix_transactions_user_category_amount',
+            table_name='transactions',
+            postgresql_concurrently=True,
+            if_exists=True,
+        )
+        op.drop_index(
+            'ix_transactions_user_occurred_at_id',
+            table_name='transactions',
+            postgresql_concurrently=True,
+            if_exists=True,
+        )
@@ -1,6 +1,6 @@
 from datetime import date, datetime, timezone
 from sqlalchemy.orm import Mapped, mapped_column, relationship
-from sqlalchemy import Integer, Boolean, Date, DateTime, String, Text, ForeignKey, Numeric, CheckConstraint, func
+from sqlalchemy import Integer, Boolean, Date, DateTime, String, Text, ForeignKey, Numeric, CheckConstraint, Index, func
 from decimal import Decimal
 
 from app.db.models.base import Base, IDMixin
@@ -21,6 +21,8 @@ class User(Base, IDMixin):
 
     email_confirmed: Mapped[bool] = mapped_column(Boolean, nullable=False, server_default="false")
     email_confirmed_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True),nullable=True)
+    # Токены подтверждения и сброса хранятся в Redis (OneTimeTokenRepository); колонки больше не заполняются,
+    # только читаются и очищаются для ссылок, выданных до переноса, пока не истечёт их срок
     confirmation_token: Mapped[str | None] = mapped_column(String(255), nullable=True)
     confirmation_token_created_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True),nullable=True)
 
@@ -33,8 +35,9 @@ class User(Base, IDMixin):
     last_login_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True),nullable=True)
 
 
-    categories: Mapped[list["Category"]] = relationship("Category", back_populates="user", cascade="all, delete-orphan", lazy="selectin")
-    transactions: Mapped[list["Transaction"]] = relationship("Transaction", back_populates="user", lazy="selectin")
+    # Связи не загружаются неявно: нужные подгружаются в запросе через options(selectinload(...))
+    categories: Mapped[list["Category"]] = relationship("Category", back_populates="user", cascade="all, delete-orphan", lazy="raise")
+    transactions: Mapped[list["Transaction"]] = relationship("Transaction", back_populates="user", lazy="raise")
 
 
 
@@ -46,16 +49,20 @@ class Category(Base, IDMixin):
     name: Mapped[str] = mapped_column(String(100), nullable=False)
     type: Mapped[str] = mapped_column(String(10), nullable=False)
 
-    user: Mapped["User"] = relationship("User", back_populates="categories", lazy="joined")
-    transactions: Mapped[list["Transaction"]] = relationship("Transaction", back_populates="category", lazy="selectin")
+    user: Mapped["User"] = relationship("User", back_populates="categories", lazy="raise")
+    transactions: Mapped[list["Transaction"]] = relationship("Transaction", back_populates="category", lazy="raise")
 
 
 
 class Transaction(Base, IDMixin):
+    # Таблица секционирована по месяцам occurred_at (миграция 5b2e8d4f6a10, app/db/partitions.py).
+    # В БД у неё нет первичного ключа (ключ секционирования допускает NULL);
+    # primary_key здесь нужен ORM, уникальность id обеспечивает последовательность
     __tablename__ = "transactions"
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
-    user_id: Mapped[int] = mapped_column(ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
+    # отдельный индекс по user_id не нужен: его заменяют составные индексы ниже
+    user_id: Mapped[int] = mapped_column(ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
     category_id: Mapped[int] = mapped_column(ForeignKey("categories.id", ondelete="RESTRICT"), nullable=False, index=True)
     amount: Mapped[Decimal] = mapped_column(Numeric(12, 2), nullable=False)
     description: Mapped[str | None] = mapped_column(String(255))
@@ -67,5 +74,32 @@ class Transaction(Base, IDMixin):
         CheckConstraint("amount > 0", name="check_amount_positive"),
     )
 
-    user: Mapped["User"] = relationship("User", back_populates="transactions", lazy="joined")
-    category: Mapped["Category"] = relationship("Category", back_populates="transactions", lazy="joined")
+    user: Mapped["User"] = relationship("User", back_populates="transactions", lazy="raise")
+    category: Mapped["Category"] = relationship("Category", back_populates="transactions", lazy="raise")
+
+
+# Списки транзакций: WHERE user_id = ? ORDER BY occurred_at DESC NULLS LAST, id DESC — без сортировки
+Index(
+    "ix_transactions_user_occurred_at_id",
+    Transaction.user_id,
+    Transaction.occurred_at.desc().nulls_last(),
+    Transaction.id.desc(),
+)
+# Суммы по категориям: index-only scan без обращения к таблице
+Index(
+    "ix_transactions_user_category_amount",
+    Transaction.user_id,
+    Transaction.category_id,
+    postgresql_include=["amount"],
+)
+# Поиск по id: в секционированной таблице вместо первичного ключа
+Index("ix_transactions_id", Transaction.id)
+# Поиск по подстроке в описании пользователя (user_id = ? AND ILIKE '%...%'),
+# требует расширений pg_trgm и btree_gin
+Index(
+    "ix_transactions_user_description_trgm",
+    Transaction.user_id,
+    Transaction.description,
+    postgresql_using="gin",
+    postgresql_ops={"description": "gin_trgm_ops"},
+)
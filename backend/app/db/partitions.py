@@ -0,0 +1,207 @@
+"""
+Месячные секции таблицы transactions.
+
+В секции DEFAULT лежат только строки без даты (CHECK (occurred_at IS NULL), миграция 2f6b8a0c4e71),
+поэтому строка за месяц без секции не может быть записана. Секции создаёт только
+TransactionPartitionMaintainer (фоновая задача приложения) и CLI ниже, каждую в отдельной короткой
+транзакции, — никогда в транзакции пользовательской записи: подключение секции берёт ACCESS EXCLUSIVE
+на DEFAULT, и в длинной транзакции записи (импорт) эта блокировка остановила бы все чтения transactions.
+
+Секции создаются за окно occurred_at_bounds — transactions_history_years лет назад и
+transactions_partition_months_ahead месяцев вперёд, — и записи с датой вне окна отклоняются
+валидацией (схемы запросов и парсеры выписок). Последний месяц окна создаётся с запасом:
+в день смены месяца запись в него ещё не разрешена, и у задачи есть check_interval на создание.
+
+Подключение секции блокирует родителя в режиме SHARE UPDATE EXCLUSIVE, а DEFAULT — ACCESS EXCLUSIVE
+на время изменения каталога (без чтения строк), но ждёт завершения запросов, уже читающих DEFAULT
+(например, выгрузки через курсор). Ожидание ограничено lock_timeout: секция, не успевшая
+подключиться, создаётся при следующей проверке, а чтения за ней в очереди не застревают.
+Секции можно создать и вручную:
+
+    python -m app.db.partitions [--from 2024-01] [--months-ahead 3]
+"""
+import argparse
+import asyncio
+from datetime import date, datetime, timezone
+from typing import Optional
+
+from loguru import logger
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError, IntegrityError
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from app.core.config import settings
+from app.core.metrics import metrics
+from app.db.database import engine
+
+_CREATE_PARTITION = text("SELECT create_transactions_partition(CAST(:month AS date))")
+
+# CHECK (occurred_at IS NULL) секции DEFAULT из миграции 2f6b8a0c4e71
+DEFAULT_PARTITION_CONSTRAINT = "transactions_default_occurred_at_null"
+LOCK_NOT_AVAILABLE = "55P03"  # SQLSTATE истёкшего lock_timeout
+
+
+def month_start(value: date) -> date:
+    return value.replace(day=1)
+
+
+def add_months(value: date, months: int) -> date:
+    index = value.year * 12 + value.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def transaction_month(value: datetime) -> date:
+    """Месяц секции для occurred_at: границы секций в UTC, дата без пояса считается UTC."""
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc)
+    return value.date().replace(day=1)
+
+
+def _utc_month(value: date) -> datetime:
+    return datetime(value.year, value.month, 1, tzinfo=timezone.utc)
+
+
+def partition_window(now: Optional[datetime] = None) -> tuple[date, date]:
+    """Первый и последний месяц (включительно), секции которых поддерживаются созданными."""
+    current = month_start((now or datetime.now(timezone.utc)).date())
+    return (
+        add_months(current, -12 * settings.transactions_history_years),
+        add_months(current, settings.transactions_partition_months_ahead),
+    )
+
+
+def occurred_at_bounds(now: Optional[datetime] = None) -> tuple[datetime, datetime]:
+    """
+    Допустимый occurred_at: [начало, конец). Последний месяц окна секций в него не входит —
+    это запас на время между сменой месяца и очередной проверкой секций.
+    """
+    first, last = partition_window(now)
+    return _utc_month(first), _utc_month(last)
+
+
+def validate_occurred_at(value: datetime) -> datetime:
+    """Проверка даты операции для схем и парсеров: ValueError, если дата вне occurred_at_bounds."""
+    start, end = occurred_at_bounds()
+    aware = value if value.tzinfo is not None else value.replace(tzinfo=timezone.utc)
+    if not start <= aware < end:
+        raise ValueError(
+            f"дата операции должна быть не раньше {start:%d.%m.%Y} и раньше {end:%d.%m.%Y}"
+        )
+    return value
+
+
+def is_missing_partition_error(error: IntegrityError) -> bool:
+    """Строка с датой попала в DEFAULT: секция её месяца ещё не создана."""
+    return DEFAULT_PARTITION_CONSTRAINT in str(error.orig)
+
+
+async def ensure_transaction_partitions(
+    engine: AsyncEngine,
+    first: date,
+    last: date,
+) -> tuple[list[date], list[date]]:
+    """
+    Создаёт недостающие секции за месяцы first..last включительно,
+    возвращает созданные и пропущенные месяцы.
+    Каждая секция — отдельная транзакция с lock_timeout: месяц, не дождавшийся блокировки,
+    пропускается до следующего вызова.
+    """
+    created: list[date] = []
+    skipped: list[date] = []
+    month = month_start(first)
+    while month <= last:
+        try:
+            async with engine.begin() as conn:
+                await conn.execute(
+                    text(f"SET LOCAL lock_timeout = {int(settings.transactions_partition_lock_timeout_ms)}")
+                )
+                if (await conn.execute(_CREATE_PARTITION, {"month": month})).scalar():
+                    created.append(month)
+                    metrics.inc("transaction_partitions_created_total")
+                    logger.info(f"[Partitions] Создана секция transactions за {month:%Y-%m}")
+        except DBAPIError as e:
+            if getattr(e.orig, "sqlstate", None) != LOCK_NOT_AVAILABLE:
+                raise
+            # DEFAULT читает длинный запрос: повторим при следующей проверке
+            skipped.append(month)
+            metrics.inc("transaction_partitions_failed_total")
+            logger.warning(f"[Partitions] Секция transactions за {month:%Y-%m} не создана: {e.orig}")
+        month = add_months(month, 1)
+    return created, skipped
+
+
+class TransactionPartitionMaintainer:
+    """Фоновая задача: при старте и затем раз в check_interval секунд создаёт секции окна partition_window."""
+
+    def __init__(self, engine: AsyncEngine, check_interval: float, retry_interval: float) -> None:
+        self.engine = engine
+        self.check_interval = check_interval
+        self.retry_interval = retry_interval
+        self._task: Optional[asyncio.Task[None]] = None
+        self._stopping = asyncio.Event()
+
+    async def run_once(self) -> tuple[list[date], list[date]]:
+        return await ensure_transaction_partitions(self.engine, *partition_window())
+
+    async def _run(self) -> None:
+        while not self._stopping.is_set():
+            # месяцы, не дождавшиеся блокировки, повторяются раньше очередной проверки
+            interval = self.retry_interval
+            try:
+                _, skipped = await self.run_once()
+                if not skipped:
+                    interval = self.check_interval
+            except Exception as e:
+                logger.exception(f"[Partitions] Не удалось создать секции transactions: {e}")
+            try:
+                await asyncio.wait_for(self._stopping.wait(), timeout=interval)
+            except asyncio.TimeoutError:
+                pass
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._stopping.clear()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        self._stopping.set()
+        if self._task is not None:
+            await self._task
+            self._task = None
+
+
+transaction_partitions = TransactionPartitionMaintainer(
+    engine=engine,
+    check_interval=settings.transactions_partition_check_interval,
+    retry_interval=settings.transactions_partition_retry_interval,
+)
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description="Создание месячных секций таблицы transactions")
+    parser.add_argument(
+        "--from",
+        dest="first",
+        type=lambda value: date.fromisoformat(f"{value}-01"),
+        default=None,
+        help="Первый месяц (YYYY-MM); по умолчанию начало окна transactions_history_years",
+    )
+    parser.add_argument("--months-ahead", type=int, default=settings.transactions_partition_months_ahead)
+    args = parser.parse_args()
+
+    settings.configure_logging()
+    current = month_start(datetime.now(timezone.utc).date())
+    first, _ = partition_window()
+    try:
+        created, skipped = await ensure_transaction_partitions(
+            engine,
+            args.first or first,
+            add_months(current, args.months_ahead),
+        )
+        logger.info(f"[Partitions] Готово: создано секций — {len(created)}, пропущено — {len(skipped)}")
+    finally:
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
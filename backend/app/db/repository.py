@@ -1,5 +1,6 @@
 from typing import Generic, TypeVar, Type, Any, Optional, Sequence
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql.base import ExecutableOption
 from sqlalchemy import select, update, delete
 from app.db.models.base import IDMixin
 
@@ -13,21 +14,37 @@ class BaseRepository(Generic[T]):
     def __init__(self, session: AsyncSession):
         self.session = session
 
-    async def get_by_id(self, model_id: int) -> Optional[T]:
+    # options — явная подгрузка связей для конкретного запроса, например selectinload(User.categories)
+    async def get_by_id(
+        self,
+        model_id: int,
+        *,
+        options: Sequence[ExecutableOption] = (),
+    ) -> Optional[T]:
         result = await self.session.execute(
-            select(self.model).where(self.model.id == model_id)
+            select(self.model).where(self.model.id == model_id).options(*options)
         )
         return result.scalar_one_or_none()
     
-    async def find_one_or_none(self, **filters: Any) -> Optional[T]:
+    async def find_one_or_none(
+        self,
+        *,
+        options: Sequence[ExecutableOption] = (),
+        **filters: Any,
+    ) -> Optional[T]:
         result = await self.session.execute(
-            select(self.model).filter_by(**filters)
+            select(self.model).filter_by(**filters).options(*options)
         )
         return result.scalar_one_or_none()
 
-    async def get_all(self, **filters: Any) -> Sequence[T]:
+    async def get_all(
+        self,
+        *,
+        options: Sequence[ExecutableOption] = (),
+        **filters: Any,
+    ) -> Sequence[T]:
         result = await self.session.execute(
-            select(self.model).filter_by(**filters)
+            select(self.model).filter_by(**filters).options(*options)
         )
         return result.scalars().all()
 
@@ -0,0 +1,37 @@
+import json
+from typing import Any, Dict
+
+from redis.asyncio import Redis
+
+from app.core.config import settings
+from app.core.metrics import metrics
+
+
+class EmailOutbox:
+    """
+    Очередь исходящих писем в Redis Stream.
+    Запрос только добавляет запись (XADD), рендерит и отправляет письмо app.email.worker,
+    так что медленный или недоступный SMTP не задерживает ответ API и письмо не теряется при падении процесса.
+    """
+    GROUP = "email_senders"
+
+    def __init__(self, redis: Redis, stream: str = settings.email_outbox_stream) -> None:
+        self.redis = redis
+        self.stream = stream
+
+    @property
+    def dead_letter_stream(self) -> str:
+        return f"{self.stream}:dead"
+
+    async def enqueue(self, *, to: str, subject: str, template: str, context: Dict[str, Any]) -> str:
+        message_id = await self.redis.xadd(
+            self.stream,
+            {
+                "to": to,
+                "subject": subject,
+                "template": template,
+                "context": json.dumps(context, ensure_ascii=False),
+            },
+        )
+        metrics.inc("email_outbox_total", result="enqueued", template=template)
+        return message_id
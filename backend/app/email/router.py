@@ -1,16 +1,17 @@
 from fastapi import APIRouter, Depends, status, Request
 from sqlalchemy.ext.asyncio import AsyncSession
+from redis.asyncio import Redis
 
-from app.db.models.models import User
+from app.auth.principal import Principal
 from app.db.database import get_async_session
 from app.api.dependencies.limiter import limiter
-from app.auth.repository import UserRepository
+from app.api.dependencies.redis_dep import get_redis
+from app.auth.repository import UserRepository, OneTimeTokenRepository
 from app.api.dependencies.auth_dep import get_current_user
-from app.api.dependencies.repo_dep import get_user_repository
 from app.email.schemas.responses import MessageResponse
 from app.email.schemas.requests import EmailConfirmationRequest
 from app.email.service import ConfirmyEmailService, ResendConfirmationService
-from app.api.errors.exceptions import UserNotFoundException
+from app.email.outbox import EmailOutbox
 
 
 router = APIRouter(prefix="/email", tags=["Модуль работы с email"])
@@ -22,9 +23,13 @@ async def confirm_email(
     request: Request,
     data: EmailConfirmationRequest,
     session: AsyncSession = Depends(get_async_session),
+    redis: Redis = Depends(get_redis),
 ):
     user_repo = UserRepository(session)
-    service = ConfirmyEmailService(user_repo)
+    service = ConfirmyEmailService(
+        user_repo,
+        OneTimeTokenRepository(redis, OneTimeTokenRepository.EMAIL_CONFIRMATION),
+    )
 
     await service.confirm_email(email=data.email, token=str(data.confirmation_token))
     return MessageResponse(message="Email успешно подтверждён")
@@ -32,17 +37,16 @@ async def confirm_email(
 
 
 @router.post("/resend", response_model=MessageResponse, status_code=status.HTTP_200_OK)
-@limiter.limit("2/minute")
+@limiter.limit("2/minute", key="user")
 async def resend_confirmation(
     request: Request,
-    current_user: User = Depends(get_current_user),
-    user_repo: UserRepository = Depends(get_user_repository),
+    current_user: Principal = Depends(get_current_user),
+    redis: Redis = Depends(get_redis),
 ):
-    service = ResendConfirmationService(user_repo)
-    user = await user_repo.get_by_email(current_user.email)
+    service = ResendConfirmationService(
+        OneTimeTokenRepository(redis, OneTimeTokenRepository.EMAIL_CONFIRMATION),
+        EmailOutbox(redis),
+    )
 
-    if not user:
-        raise UserNotFoundException(current_user.email)
-
-    await service.resend_confirmation(user)
+    await service.resend_confirmation(current_user)
     return MessageResponse(message="Если аккаунт существует, письмо отправлено повторно")
\ No newline at end of file
@@ -1,11 +1,12 @@
 from uuid import uuid4
 from datetime import datetime, timedelta, timezone
+from typing import Optional
 from loguru import logger
 
-from app.db.models.models import User
+from app.auth.principal import Principal
 from app.core.config import settings
-from app.auth.repository import UserRepository
-from app.email.utils.email_handler import email_handler
+from app.auth.repository import UserRepository, OneTimeTokenRepository
+from app.email.outbox import EmailOutbox
 from app.api.errors.exceptions import (
     TooEarlyResendException,
     EmailAlreadyConfirmedException,
@@ -14,33 +15,43 @@ from app.api.errors.exceptions import (
 
 
 class ConfirmyEmailService:
-    def __init__(self, user_repo: UserRepository):
+    def __init__(self, user_repo: UserRepository, confirmation_tokens: OneTimeTokenRepository):
         self.user_repo = user_repo
+        self.confirmation_tokens = confirmation_tokens
+
+    # Ссылки, выданные до переноса токенов в Redis: токен хранится в users.confirmation_token.
+    # Действуют до истечения своего срока, если после них не выдавалась новая ссылка
+    async def _legacy_user_id(self, email: str, token: str) -> Optional[int]:
+        user = await self.user_repo.find_one_or_none(email=email, confirmation_token=token)
+        if not user or not user.confirmation_token_created_at:
+            return None
+
+        expires_at = user.confirmation_token_created_at + timedelta(hours=settings.email_confirm_token_expire)
+        if datetime.now(timezone.utc) > expires_at or await self.confirmation_tokens.has_active(user.id):
+            return None
+        return user.id
 
     async def confirm_email(self, email: str, token: str) -> None:
-        user = await self.user_repo.find_one_or_none(
-            email=email,
-            confirmation_token=token,
-        )
+        user_id = await self.confirmation_tokens.verify(token)
+        legacy = False
+        if not user_id:
+            user_id = await self._legacy_user_id(email, token)
+            legacy = True
+        if not user_id:
+            raise InvalidOrExpiredEmailTokenException
 
-        if not user or user.email_confirmed:
+        user = await self.user_repo.get_principal(user_id)
+        if not user or user.email != email or user.email_confirmed:
             raise InvalidOrExpiredEmailTokenException
 
-        created_at = user.confirmation_token_created_at
-        if not created_at or datetime.now(timezone.utc) - created_at > timedelta(
-            hours=settings.email_confirm_token_expire
-        ):
+        if legacy:
+            consumed = await self.user_repo.consume_legacy_token(user.id, "confirmation_token", token)
+        else:
+            consumed = await self.confirmation_tokens.consume(token) is not None
+        if not consumed:
             raise InvalidOrExpiredEmailTokenException
 
-        updated_user = await self.user_repo.update(
-            user.id,
-            {
-                "email_confirmed": True,
-                "email_confirmed_at": datetime.now(timezone.utc),
-                "confirmation_token": None,
-                "confirmation_token_created_at": None,
-            },
-        )
+        updated_user = await self.user_repo.confirm_email(user.id)
 
         if not updated_user:
             logger.error(
@@ -51,41 +62,30 @@ class ConfirmyEmailService:
         logger.info(f"Email пользователя {email} успешно подтверждён", extra={"log_info": True})
 
 class ResendConfirmationService:
-    def __init__(self, user_repo: UserRepository):
-        self.user_repo = user_repo
+    def __init__(self, confirmation_tokens: OneTimeTokenRepository, outbox: EmailOutbox):
+        self.confirmation_tokens = confirmation_tokens
+        self.outbox = outbox
 
-    async def resend_confirmation(self, user: User) -> None:
+    async def resend_confirmation(self, user: Principal) -> None:
         if user.email_confirmed:
             raise EmailAlreadyConfirmedException
 
-        created_at = user.confirmation_token_created_at
-        if created_at and datetime.now(timezone.utc) - created_at < timedelta(
-            hours=settings.email_confirm_token_expire
-        ):
+        # пока прежняя ссылка действует, новую не отправляем
+        if await self.confirmation_tokens.has_active(user.id):
             raise TooEarlyResendException
 
         new_token = str(uuid4())
-        created_at = datetime.now(timezone.utc)
-        await self.user_repo.update(
-            user.id,
-            {
-                "confirmation_token": new_token,
-                "confirmation_token_created_at": created_at,
-            },
+        await self.confirmation_tokens.issue(
+            user_id=user.id,
+            token=new_token,
+            expires_in=settings.email_confirm_token_expire * 60 * 60,
         )
 
-        try:
-            link = f"{settings.allowed_hosts}/email/confirm?email={user.email}&token={new_token}"
-            html_content = email_handler.render_template(
-                "confirm_email.html",
-                {"confirmation_link": link}
-            )
-            await email_handler.send_email(
-                to=user.email,
-                subject="Подтверждение регистрации",
-                html_content=html_content,
-            )
-        except Exception as e:
-            logger.error(
-                f"Ошибка отправки email для подтверждения ({user.email}): {type(e).__name__}: {e}"
-            )
+        await self.outbox.enqueue(
+            to=user.email,
+            subject="Подтверждение регистрации",
+            template="confirm_email.html",
+            context={
+                "confirmation_link": f"{settings.allowed_hosts}/email/confirm?email={user.email}&token={new_token}",
+            },
+        )
@@ -2,11 +2,12 @@ import socket
 from typing import Any, Dict
 from functools import lru_cache
 from email.mime.text import MIMEText
-from jinja2 import Environment, FileSystemLoader, select_autoescape
-from aiosmtplib import SMTP, SMTPAuthenticationError, SMTPConnectError, SMTPException
+from aiosmtplib import SMTPAuthenticationError, SMTPConnectError, SMTPException
 from tenacity import retry, stop_after_attempt, wait_exponential, retry_if_exception_type
 
 from app.core.config import settings
+from app.email.utils.smtp_pool import SMTPConnectionPool
+from app.email.utils.templates import EmailTemplates
 from loguru import logger
 
 
@@ -25,9 +26,20 @@ class EmailHandler:
         self.smtp_username = smtp_username
         self.smtp_password = smtp_password
         self.email_from = email_from
-        self.env = Environment(
-            loader=FileSystemLoader(template_path),
-            autoescape=select_autoescape(["html", "xml"])
+        self.pool = SMTPConnectionPool(
+            hostname=smtp_host,
+            port=smtp_port,
+            username=smtp_username,
+            password=smtp_password,
+            size=settings.smtp_pool_size,
+            idle_timeout=settings.smtp_pool_idle_timeout,
+            max_messages=settings.smtp_pool_max_messages,
+            health_check_interval=settings.smtp_pool_health_check_interval,
+        )
+        self.templates = EmailTemplates(
+            template_path,
+            bytecode_cache_dir=settings.email_templates_bytecode_cache_dir,
+            auto_reload=settings.email_templates_auto_reload,
         )
 
     @retry(
@@ -43,20 +55,7 @@ class EmailHandler:
         msg["To"] = to
 
         try:
-            smtp = SMTP(
-                hostname=self.smtp_host,
-                port=self.smtp_port,
-                timeout=10,
-                start_tls=self.smtp_port == 587,
-                use_tls=self.smtp_port == 465,
-            )
-            try:
-                await smtp.connect()
-                await smtp.login(self.smtp_username, self.smtp_password)
-                await smtp.send_message(msg)
-            finally:
-                if smtp.is_connected:
-                    await smtp.quit()
+            await self.pool.send_message(msg)
         except SMTPAuthenticationError as e:
             logger.error(f"[SMTP] Ошибка авторизации при отправке на {to}: {type(e).__name__}: {e}")
             raise
@@ -73,9 +72,11 @@ class EmailHandler:
             logger.exception(f"[SMTP] Неизвестная ошибка при отправке на {to}: {type(e).__name__}: {e}")
             raise
 
+    async def close(self) -> None:
+        await self.pool.close()
+
     def render_template(self, template_name: str, context: Dict[str, Any]) -> str:
-        template = self.env.get_template(template_name)
-        return template.render(**context)
+        return self.templates.render(template_name, context)
 
 
 @lru_cache
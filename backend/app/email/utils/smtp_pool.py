@@ -0,0 +1,150 @@
+import asyncio
+import time
+from dataclasses import dataclass, field
+from email.message import Message
+
+from aiosmtplib import SMTP, SMTPServerDisconnected, SMTPResponseException
+from loguru import logger
+
+from app.core.metrics import metrics
+
+
+@dataclass(slots=True)
+class _PooledConnection:
+    smtp: SMTP
+    last_used: float = field(default_factory=time.monotonic)
+    messages: int = 0
+
+
+class SMTPConnectionPool:
+    """
+    Пул авторизованных SMTP-сессий, переиспользуемых между отправками.
+    Соединение закрывается после max_messages писем или idle_timeout секунд простоя;
+    перед выдачей давно не использованное соединение проверяется командой NOOP.
+    Если сервер закрыл переиспользованное соединение, письмо один раз повторяется через новое.
+    """
+
+    def __init__(
+        self,
+        *,
+        hostname: str,
+        port: int,
+        username: str,
+        password: str,
+        size: int,
+        idle_timeout: float,
+        max_messages: int,
+        health_check_interval: float,
+        timeout: float = 10,
+    ) -> None:
+        self.hostname = hostname
+        self.port = port
+        self.username = username
+        self.password = password
+        self.size = size
+        self.idle_timeout = idle_timeout
+        self.max_messages = max_messages
+        self.health_check_interval = health_check_interval
+        self.timeout = timeout
+        self._idle: list[_PooledConnection] = []
+        self._semaphore = asyncio.Semaphore(size)
+
+    async def _connect(self) -> _PooledConnection:
+        smtp = SMTP(
+            hostname=self.hostname,
+            port=self.port,
+            timeout=self.timeout,
+            start_tls=self.port == 587,
+            use_tls=self.port == 465,
+        )
+        await smtp.connect()
+        try:
+            # локальные серверы вроде MailHog работают без авторизации
+            if self.username:
+                await smtp.login(self.username, self.password)
+        except BaseException:
+            smtp.close()
+            raise
+
+        metrics.inc("smtp_connections_total", result="opened")
+        return _PooledConnection(smtp)
+
+    async def _discard(self, conn: _PooledConnection) -> None:
+        metrics.inc("smtp_connections_total", result="closed")
+        if not conn.smtp.is_connected:
+            return
+        try:
+            await asyncio.wait_for(conn.smtp.quit(), timeout=self.timeout)
+        except Exception:
+            conn.smtp.close()
+
+    def _expired(self, conn: _PooledConnection, now: float) -> bool:
+        return now - conn.last_used >= self.idle_timeout or conn.messages >= self.max_messages
+
+    async def _evict_idle(self) -> None:
+        now = time.monotonic()
+        expired = [conn for conn in self._idle if self._expired(conn, now)]
+        if expired:
+            self._idle = [conn for conn in self._idle if not self._expired(conn, now)]
+            for conn in expired:
+                await self._discard(conn)
+
+    async def _is_alive(self, conn: _PooledConnection) -> bool:
+        if not conn.smtp.is_connected:
+            return False
+        if time.monotonic() - conn.last_used < self.health_check_interval:
+            return True
+        try:
+            await conn.smtp.noop()
+            return True
+        except (SMTPServerDisconnected, SMTPResponseException, ConnectionError, TimeoutError):
+            return False
+
+    async def _checkout(self) -> tuple[_PooledConnection, bool]:
+        await self._evict_idle()
+        while self._idle:
+            # последнее возвращённое соединение — самое «тёплое»
+            conn = self._idle.pop()
+            if await self._is_alive(conn):
+                metrics.inc("smtp_connections_total", result="reused")
+                return conn, True
+            await self._discard(conn)
+
+        return await self._connect(), False
+
+    async def _checkin(self, conn: _PooledConnection) -> None:
+        conn.last_used = time.monotonic()
+        if conn.messages >= self.max_messages or not conn.smtp.is_connected:
+            await self._discard(conn)
+        else:
+            self._idle.append(conn)
+        await self._evict_idle()
+
+    async def send_message(self, message: Message) -> None:
+        async with self._semaphore:
+            conn, reused = await self._checkout()
+            try:
+                await conn.smtp.send_message(message)
+            except (SMTPServerDisconnected, ConnectionError) as e:
+                await self._discard(conn)
+                if not reused:
+                    raise
+                logger.info(f"[SMTP] Соединение из пула разорвано сервером, переподключение: {e}")
+                conn = await self._connect()
+                try:
+                    await conn.smtp.send_message(message)
+                except BaseException:
+                    await self._discard(conn)
+                    raise
+            except BaseException:
+                await self._discard(conn)
+                raise
+
+            conn.messages += 1
+            await self._checkin(conn)
+
+    async def close(self) -> None:
+        idle, self._idle = self._idle, []
+        for conn in idle:
+            await self._discard(conn)
+
@@ -0,0 +1,82 @@
+import time
+from typing import Any, Iterable, Iterator, Mapping, Optional
+
+from jinja2 import Environment, FileSystemBytecodeCache, FileSystemLoader, Template, select_autoescape
+from loguru import logger
+
+from app.core.metrics import metrics
+
+
+class EmailTemplates:
+    """
+    Скомпилированные шаблоны писем.
+    Все шаблоны компилируются один раз при старте (precompile) и дальше берутся из словаря
+    без обращения к файловой системе; байткод сохраняется в каталог, поэтому следующие
+    процессы и реплики не компилируют шаблоны заново.
+    С auto_reload (разработка) словарь не используется, чтобы изменения файлов подхватывались.
+    """
+    EXTENSIONS = ("html", "txt")
+
+    def __init__(
+        self,
+        template_path: str,
+        bytecode_cache_dir: Optional[str] = None,
+        auto_reload: bool = False,
+    ) -> None:
+        self.env = Environment(
+            loader=FileSystemLoader(template_path),
+            autoescape=select_autoescape(["html", "xml"]),
+            bytecode_cache=FileSystemBytecodeCache(bytecode_cache_dir),
+            auto_reload=auto_reload,
+        )
+        self._templates: dict[str, Template] = {}
+
+    def precompile(self) -> int:
+        started = time.perf_counter()
+        for name in self.env.list_templates(extensions=self.EXTENSIONS):
+            self._templates[name] = self.env.get_template(name)
+
+        logger.info(
+            f"Шаблоны писем скомпилированы: {len(self._templates)} "
+            f"за {(time.perf_counter() - started) * 1000:.1f} мс"
+        )
+        return len(self._templates)
+
+    def get(self, name: str) -> Template:
+        # при auto_reload шаблон берётся из кэша Environment, который проверяет mtime файла
+        if self.env.auto_reload:
+            return self.env.get_template(name)
+
+        template = self._templates.get(name)
+        if template is None:
+            template = self._templates[name] = self.env.get_template(name)
+        return template
+
+    def render(self, name: str, context: Mapping[str, Any]) -> str:
+        template = self.get(name)
+        started = time.perf_counter()
+        try:
+            return template.render(context)
+        finally:
+            metrics.observe("email_template_render_seconds", time.perf_counter() - started, template=name)
+
+    def render_batch(self, name: str, contexts: Iterable[Mapping[str, Any]]) -> Iterator[str]:
+        """
+        Рендерит один шаблон для множества контекстов (массовые рассылки).
+        Шаблон ищется один раз, результаты отдаются по мере готовности,
+        суммарное время рендера записывается одной метрикой на всю пачку.
+        """
+        template = self.get(name)
+        count = 0
+        elapsed = 0.0
+        try:
+            for context in contexts:
+                # время между yield принадлежит вызывающему коду и в метрику не попадает
+                started = time.perf_counter()
+                html = template.render(context)
+                elapsed += time.perf_counter() - started
+                count += 1
+                yield html
+        finally:
+            metrics.observe("email_template_batch_seconds", elapsed, template=name)
+            metrics.inc("email_template_rendered_total", count, template=name)
@@ -0,0 +1,194 @@
+"""
+Отправитель писем из очереди EmailOutbox.
+
+    python -m app.email.worker
+
+Воркеры читают поток через consumer group, поэтому реплик может быть сколько угодно:
+каждое письмо получает один воркер. Неподтверждённые записи (ошибка отправки или упавший воркер)
+через email_worker_claim_idle_ms забираются повторно через XAUTOCLAIM; после
+email_worker_max_attempts попыток запись целиком переносится в поток <stream>:dead
+(длина ограничена email_outbox_dead_maxlen), откуда её можно вернуть в очередь.
+"""
+import asyncio
+import json
+import os
+import signal
+import socket
+from typing import Any, Dict
+
+from loguru import logger
+from redis.asyncio import Redis
+from redis.exceptions import RedisError, ResponseError
+
+from app.core.config import settings
+from app.core.metrics import metrics
+from app.db.redis import redis_client
+from app.email.outbox import EmailOutbox
+from app.email.utils.email_handler import EmailHandler, email_handler
+
+
+class EmailOutboxWorker:
+    def __init__(
+        self,
+        redis: Redis,
+        handler: EmailHandler,
+        *,
+        consumer: str,
+        stream: str = settings.email_outbox_stream,
+        batch_size: int = settings.email_worker_batch_size,
+        block_ms: int = settings.email_worker_block_ms,
+        claim_idle_ms: int = settings.email_worker_claim_idle_ms,
+        max_attempts: int = settings.email_worker_max_attempts,
+    ) -> None:
+        self.redis = redis
+        self.handler = handler
+        self.consumer = consumer
+        self.outbox = EmailOutbox(redis, stream)
+        self.batch_size = batch_size
+        self.block_ms = block_ms
+        self.claim_idle_ms = claim_idle_ms
+        self.max_attempts = max_attempts
+        self._stopping = asyncio.Event()
+
+    @property
+    def stream(self) -> str:
+        return self.outbox.stream
+
+    async def ensure_group(self) -> None:
+        try:
+            await self.redis.xgroup_create(self.stream, EmailOutbox.GROUP, id="0", mkstream=True)
+        except ResponseError as e:
+            if "BUSYGROUP" not in str(e):
+                raise
+
+    async def _ack(self, message_id: str) -> None:
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.xack(self.stream, EmailOutbox.GROUP, message_id)
+            pipe.xdel(self.stream, message_id)
+            await pipe.execute()
+
+    async def _dead_letter(self, message_id: str, fields: Dict[str, str], error: str, attempt: int) -> None:
+        # запись сохраняется вместе с контекстом шаблона, чтобы письмо можно было отправить повторно
+        record = {
+            **fields,
+            "source_id": message_id,
+            "error": error,
+            "attempts": attempt,
+        }
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.xadd(
+                self.outbox.dead_letter_stream,
+                record,  # type: ignore[arg-type]
+                maxlen=settings.email_outbox_dead_maxlen,
+                approximate=True,
+            )
+            pipe.xack(self.stream, EmailOutbox.GROUP, message_id)
+            pipe.xdel(self.stream, message_id)
+            await pipe.execute()
+
+    async def _send(self, fields: Dict[str, str]) -> None:
+        context: Dict[str, Any] = json.loads(fields["context"])
+        html = self.handler.render_template(fields["template"], context)
+        await self.handler.send_email(to=fields["to"], subject=fields["subject"], html_content=html)
+
+    async def _process(self, message_id: str, fields: Dict[str, str], attempt: int) -> None:
+        try:
+            await self._send(fields)
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+            if attempt >= self.max_attempts:
+                logger.error(f"[Outbox] Письмо {message_id} для {fields.get('to')} отправлено в dead letter: {error}")
+                await self._dead_letter(message_id, fields, error, attempt)
+                metrics.inc("email_outbox_total", result="dead", template=fields.get("template", ""))
+            else:
+                # запись остаётся в pending и будет забрана повторно через claim_idle_ms
+                logger.warning(f"[Outbox] Попытка {attempt} отправки {message_id} не удалась: {error}")
+                metrics.inc("email_outbox_total", result="retry", template=fields.get("template", ""))
+            return
+
+        await self._ack(message_id)
+        metrics.inc("email_outbox_total", result="sent", template=fields.get("template", ""))
+
+    async def _claim_stale(self) -> list[tuple[str, Dict[str, str], int]]:
+        _, claimed, *_ = await self.redis.xautoclaim(
+            self.stream,
+            EmailOutbox.GROUP,
+            self.consumer,
+            min_idle_time=self.claim_idle_ms,
+            start_id="0-0",
+            count=self.batch_size,
+        )
+        # записи, удалённые из потока до повторной доставки, приходят без полей
+        claimed = [(message_id, fields) for message_id, fields in claimed if fields]
+        if not claimed:
+            return []
+
+        pending = await self.redis.xpending_range(
+            self.stream,
+            EmailOutbox.GROUP,
+            min=claimed[0][0],
+            max=claimed[-1][0],
+            count=len(claimed),
+            consumername=self.consumer,
+        )
+        deliveries = {item["message_id"]: item["times_delivered"] for item in pending}
+        return [
+            (message_id, fields, deliveries.get(message_id, self.max_attempts))
+            for message_id, fields in claimed
+        ]
+
+    async def _read_new(self) -> list[tuple[str, Dict[str, str], int]]:
+        response = await self.redis.xreadgroup(
+            EmailOutbox.GROUP,
+            self.consumer,
+            {self.stream: ">"},
+            count=self.batch_size,
+            block=self.block_ms,
+        )
+        return [
+            (message_id, fields, 1)
+            for _, entries in response
+            for message_id, fields in entries
+        ]
+
+    async def run_once(self) -> int:
+        batch = await self._claim_stale() or await self._read_new()
+        await asyncio.gather(*(self._process(*entry) for entry in batch))
+        return len(batch)
+
+    async def run(self) -> None:
+        await self.ensure_group()
+        logger.info(f"[Outbox] Воркер {self.consumer} читает {self.stream}")
+        while not self._stopping.is_set():
+            try:
+                await self.run_once()
+            except RedisError as e:
+                logger.error(f"[Outbox] Ошибка Redis: {e}")
+                await asyncio.sleep(1)
+
+    def stop(self) -> None:
+        self._stopping.set()
+
+
+async def main() -> None:
+    settings.configure_logging()
+    email_handler.templates.precompile()
+    worker = EmailOutboxWorker(
+        redis_client,
+        email_handler,
+        consumer=f"{socket.gethostname()}-{os.getpid()}",
+    )
+
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, worker.stop)
+
+    try:
+        await worker.run()
+    finally:
+        await email_handler.close()
+        await redis_client.aclose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,6 +1,8 @@
 # app/finance/analytics/repository.py
-from sqlalchemy import select, func
+from sqlalchemy import Select, select, func
+from datetime import datetime
 from decimal import Decimal
+from typing import Any, Optional
 
 from app.db.models.models import Transaction, Category
 from app.db.repository import BaseRepository
@@ -9,11 +11,33 @@ from app.db.repository import BaseRepository
 class AnalyticsRepository(BaseRepository[Transaction]):
     model = Transaction
 
-    async def summary(self, user_id: int):
+    # Условия на occurred_at позволяют планировщику читать только секции нужных месяцев
+    @staticmethod
+    def _in_period(
+        stmt: Select[Any],
+        date_from: Optional[datetime],
+        date_to: Optional[datetime],
+    ) -> Select[Any]:
+        if date_from:
+            stmt = stmt.where(Transaction.occurred_at >= date_from)
+        if date_to:
+            stmt = stmt.where(Transaction.occurred_at <= date_to)
+        return stmt
+
+    async def summary(
+        self,
+        user_id: int,
+        date_from: Optional[datetime] = None,
+        date_to: Optional[datetime] = None,
+    ):
         rows = await self.session.execute(
-            select(Transaction.amount, Category.type)
-            .join(Category)
-            .where(Transaction.user_id == user_id)
+            self._in_period(
+                select(Transaction.amount, Category.type)
+                .join(Category)
+                .where(Transaction.user_id == user_id),
+                date_from,
+                date_to,
+            )
         )
     
         income = Decimal(0)
@@ -27,15 +51,24 @@ class AnalyticsRepository(BaseRepository[Transaction]):
 
         return income, expense
 
-    async def by_category(self, user_id: int):
+    async def by_category(
+        self,
+        user_id: int,
+        date_from: Optional[datetime] = None,
+        date_to: Optional[datetime] = None,
+    ):
         rows = await self.session.execute(
-            select(
-                Category.id.label("category_id"),
-                Category.name.label("category_name"),
-                func.sum(Transaction.amount).label("total")
+            self._in_period(
+                select(
+                    Category.id.label("category_id"),
+                    Category.name.label("category_name"),
+                    func.sum(Transaction.amount).label("total")
+                )
+                .join(Category, Transaction.category_id == Category.id)
+                .where(Transaction.user_id == user_id),
+                date_from,
+                date_to,
             )
-            .join(Category, Transaction.category_id == Category.id)
-            .where(Transaction.user_id == user_id)
             .group_by(Category.id)
         )
         return rows.all()  # возвращает список Row
@@ -3,8 +3,9 @@ from fastapi import APIRouter, Depends
 from typing import List
 
 from app.api.dependencies.auth_dep import get_current_user
-from app.db.models.models import User
+from app.auth.principal import Principal
 from app.finance.analytics.service import AnalyticsService
+from app.finance.analytics.schemas.filters import AnalyticsPeriod
 from app.finance.analytics.schemas.responses import (
     AnalyticsSummaryResponse,
     AnalyticsByCategoryResponse,
@@ -16,15 +17,17 @@ router = APIRouter(prefix="/analytics", tags=["Аналитика"])
 
 @router.get("/summary", response_model=AnalyticsSummaryResponse)
 async def get_summary(
-    current_user: User = Depends(get_current_user),
+    period: AnalyticsPeriod = Depends(),
+    current_user: Principal = Depends(get_current_user),
     service: AnalyticsService = Depends(get_analytics_service),
 ):
-    return await service.summary(user_id=current_user.id)
+    return await service.summary(user_id=current_user.id, period=period)
 
 
 @router.get("/by-category", response_model=List[AnalyticsByCategoryResponse])
 async def get_by_category(
-    current_user: User = Depends(get_current_user),
+    period: AnalyticsPeriod = Depends(),
+    current_user: Principal = Depends(get_current_user),
     service: AnalyticsService = Depends(get_analytics_service),
 ):
-    return await service.by_category(user_id=current_user.id)
+    return await service.by_category(user_id=current_user.id, period=period)
@@ -0,0 +1,8 @@
+# app/finance/analytics/schemas/filters.py
+from datetime import datetime
+from pydantic import BaseModel
+from typing import Optional
+
+class AnalyticsPeriod(BaseModel):
+    date_from: Optional[datetime] = None
+    date_to: Optional[datetime] = None
@@ -2,6 +2,7 @@
 from typing import List
 
 from app.finance.analytics.repository import AnalyticsRepository
+from app.finance.analytics.schemas.filters import AnalyticsPeriod
 from app.finance.analytics.schemas.responses import (
     AnalyticsSummaryResponse,
     AnalyticsByCategoryResponse,
@@ -12,8 +13,8 @@ class AnalyticsService:
     def __init__(self, repo: AnalyticsRepository):
         self.repo = repo
 
-    async def summary(self, user_id: int) -> AnalyticsSummaryResponse:
-        income, expense = await self.repo.summary(user_id)
+    async def summary(self, user_id: int, period: AnalyticsPeriod) -> AnalyticsSummaryResponse:
+        income, expense = await self.repo.summary(user_id, **period.model_dump())
 
         return AnalyticsSummaryResponse(
             income=income,
@@ -21,8 +22,8 @@ class AnalyticsService:
             balance=income-expense,
         )
 
-    async def by_category(self, user_id: int) -> List[AnalyticsByCategoryResponse]:
-        rows = await self.repo.by_category(user_id)
+    async def by_category(self, user_id: int, period: AnalyticsPeriod) -> List[AnalyticsByCategoryResponse]:
+        rows = await self.repo.by_category(user_id, **period.model_dump())
 
         return [
             AnalyticsByCategoryResponse(
@@ -1,5 +1,6 @@
-from sqlalchemy import select, exists
-from typing import Any, Sequence
+from sqlalchemy import Integer, select, insert, exists, any_, bindparam
+from sqlalchemy.dialects.postgresql import ARRAY
+from typing import Any, Collection, Sequence
 from app.db.models.models import Category
 from app.db.repository import BaseRepository
 
@@ -41,3 +42,20 @@ class CategoryRepository(BaseRepository[Category]):
             select(Category).where(Category.user_id == user_id)
         )
         return result.scalars().all()
+
+    async def owned_ids(self, *, user_id: int, category_ids: Collection[int]) -> set[int]:
+        # один запрос на любое количество id: WHERE id = ANY($1::integer[])
+        result = await self.session.execute(
+            select(Category.id).where(
+                Category.user_id == user_id,
+                Category.id == any_(bindparam("category_ids", list(category_ids), type_=ARRAY(Integer))),
+            )
+        )
+        return set(result.scalars().all())
+
+    async def create_in_transaction(self, *, user_id: int, name: str, type: str) -> int:
+        # без commit: категория фиксируется вместе с остальной работой вызывающего (например, импортом)
+        result = await self.session.execute(
+            insert(Category).values(user_id=user_id, name=name, type=type).returning(Category.id)
+        )
+        return result.scalar_one()
@@ -2,7 +2,7 @@ from fastapi import APIRouter, Depends, status
 from typing import List
 
 from app.api.dependencies.auth_dep import get_current_user
-from app.db.models.models import User
+from app.auth.principal import Principal
 from app.finance.categories.schemas.requests import CategoryCreateRequest, CategoryUpdateRequest
 from app.finance.categories.schemas.responses import CategoryResponse
 from app.finance.categories.service import CategoryService
@@ -15,7 +15,7 @@ router = APIRouter(prefix="/categories", tags=["Категории для Тра
 @router.post("/", response_model=CategoryResponse, status_code=status.HTTP_201_CREATED)
 async def create_category(
     data: CategoryCreateRequest,
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
     service: CategoryService = Depends(get_category_service)
 ):
     """
@@ -27,7 +27,7 @@ async def create_category(
 # --- LIST ---
 @router.get("/", response_model=List[CategoryResponse])
 async def list_categories(
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
     service: CategoryService = Depends(get_category_service)
 ):
     """
@@ -40,7 +40,7 @@ async def list_categories(
 @router.get("/{category_id}", response_model=CategoryResponse)
 async def get_category(
     category_id: int,
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
     service: CategoryService = Depends(get_category_service)
 ):
     """
@@ -54,7 +54,7 @@ async def get_category(
 async def update_category(
     category_id: int,
     data: CategoryUpdateRequest,
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
     service: CategoryService = Depends(get_category_service)
 ):
     """
@@ -67,7 +67,7 @@ async def update_category(
 @router.delete("/{category_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_category(
     category_id: int,
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
     service: CategoryService = Depends(get_category_service)
 ):
     """
@@ -0,0 +1,228 @@
+"""
+Недельная сводка расходов для всех пользователей.
+
+    python -m app.finance.reports.digest [--week-start 2026-10-05]
+
+Пользователи обходятся пачками по id; для каждой пачки итоги и топ категорий считаются
+двумя агрегирующими запросами, письма рендерятся одним шаблоном через render_batch
+и отправляются через пул SMTP с ограничением параллельности и частоты.
+После каждой пачки в Redis сохраняется последний обработанный id, а отправленные
+пользователи отмечаются в множестве, поэтому прерванный запуск продолжается с места остановки
+и никому не отправляет письмо повторно.
+"""
+import argparse
+import asyncio
+import time
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import date, datetime, time as dt_time, timedelta, timezone
+from decimal import Decimal
+from typing import Any, Dict, Optional, Sequence
+
+from loguru import logger
+from redis.asyncio import Redis
+from sqlalchemy import Row
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.core.config import settings
+from app.core.metrics import metrics
+from app.db.database import async_session_factory, engine
+from app.db.redis import redis_client
+from app.email.outbox import EmailOutbox
+from app.email.utils.email_handler import EmailHandler, email_handler
+from app.finance.reports.repository import DigestRepository
+
+TEMPLATE = "weekly_digest.html"
+SUBJECT = "Ваша неделя в FinTrack"
+
+
+class _SendRateLimiter:
+    """Равномерно распределяет отправки: не больше rate писем в секунду на весь процесс."""
+
+    def __init__(self, rate: float) -> None:
+        self.interval = 1 / rate if rate > 0 else 0.0
+        self._next_slot = 0.0
+        self._lock = asyncio.Lock()
+
+    async def wait(self) -> None:
+        if not self.interval:
+            return
+        async with self._lock:
+            now = time.monotonic()
+            delay = self._next_slot - now
+            self._next_slot = max(now, self._next_slot) + self.interval
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+@dataclass(slots=True)
+class DigestStats:
+    processed: int = 0
+    sent: int = 0
+    skipped: int = 0
+    deferred: int = 0
+
+
+def _format_amount(value: Decimal) -> str:
+    return f"{value:,.2f}".replace(",", " ")
+
+
+def previous_week_start(today: Optional[date] = None) -> date:
+    today = today or datetime.now(timezone.utc).date()
+    return today - timedelta(days=today.weekday() + 7)
+
+
+class WeeklyDigestJob:
+    def __init__(
+        self,
+        session_factory: async_sessionmaker[AsyncSession],
+        redis: Redis,
+        handler: EmailHandler,
+        week_start: date,
+        *,
+        chunk_size: int = settings.digest_chunk_size,
+        concurrency: int = settings.digest_send_concurrency,
+        rate: float = settings.digest_send_rate,
+        top_categories: int = settings.digest_top_categories,
+    ) -> None:
+        self.session_factory = session_factory
+        self.redis = redis
+        self.handler = handler
+        self.outbox = EmailOutbox(redis)
+        self.week_start = week_start
+        self.start = datetime.combine(week_start, dt_time.min, tzinfo=timezone.utc)
+        self.end = self.start + timedelta(days=7)
+        self.chunk_size = chunk_size
+        self.top_categories = top_categories
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._rate_limiter = _SendRateLimiter(rate)
+
+        key = f"digest:weekly:{week_start.isoformat()}"
+        self.cursor_key = f"{key}:cursor"
+        self.sent_key = f"{key}:sent"
+
+    async def _checkpoint(self, last_user_id: int) -> None:
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.set(self.cursor_key, last_user_id, ex=settings.digest_checkpoint_ttl)
+            pipe.expire(self.sent_key, settings.digest_checkpoint_ttl)
+            await pipe.execute()
+
+    async def _mark_sent(self, user_id: int) -> None:
+        # срок задаётся в той же транзакции, что и SADD: без него ключ, созданный до первой
+        # контрольной точки, остался бы в Redis навсегда, если рассылка упадёт раньше
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.sadd(self.sent_key, user_id)
+            pipe.expire(self.sent_key, settings.digest_checkpoint_ttl)
+            await pipe.execute()
+
+    async def _load_chunk(self, after_id: int) -> tuple[Sequence[Row], list[tuple[Row, Dict[str, Any]]]]:
+        async with self.session_factory() as session:
+            repo = DigestRepository(session)
+            users = await repo.recipients_after(after_id, self.chunk_size)
+            if not users:
+                return [], []
+
+            user_ids = [user.id for user in users]
+            totals = {
+                row.user_id: row
+                for row in await repo.weekly_totals(user_ids, self.start, self.end)
+            }
+            top: dict[int, list[Dict[str, str]]] = defaultdict(list)
+            for row in await repo.weekly_top_categories(user_ids, self.start, self.end, self.top_categories):
+                top[row.user_id].append({"name": row.category_name, "total": _format_amount(row.total)})
+
+        period_end = (self.end - timedelta(days=1)).strftime("%d.%m.%Y")
+        items: list[tuple[Row, Dict[str, Any]]] = []
+        for user in users:
+            row = totals.get(user.id)
+            # без операций за неделю письмо не отправляется
+            if row is None:
+                continue
+            items.append((user, {
+                "first_name": user.first_name,
+                "period_start": self.start.strftime("%d.%m.%Y"),
+                "period_end": period_end,
+                "income": _format_amount(row.income),
+                "expense": _format_amount(row.expense),
+                "balance": _format_amount(row.income - row.expense),
+                "transactions_count": row.transactions_count,
+                "top_categories": top.get(user.id, []),
+            }))
+
+        return users, items
+
+    async def _send(self, user: Row, context: Dict[str, Any], html: str, stats: DigestStats) -> None:
+        async with self._semaphore:
+            await self._rate_limiter.wait()
+            try:
+                await self.handler.send_email(to=user.email, subject=SUBJECT, html_content=html)
+            except Exception as e:
+                # не теряем письмо: отдаём его в очередь, там будут повторы и dead letter
+                logger.warning(f"[Digest] Письмо для {user.email} передано в очередь после ошибки: {e}")
+                await self.outbox.enqueue(to=user.email, subject=SUBJECT, template=TEMPLATE, context=context)
+                stats.deferred += 1
+                metrics.inc("digest_emails_total", result="deferred")
+            else:
+                stats.sent += 1
+                metrics.inc("digest_emails_total", result="sent")
+
+            await self._mark_sent(user.id)
+
+    async def run(self) -> DigestStats:
+        stats = DigestStats()
+        after_id = int(await self.redis.get(self.cursor_key) or 0)
+        if after_id:
+            logger.info(f"[Digest] Продолжение рассылки за неделю {self.week_start} после пользователя {after_id}")
+
+        while True:
+            users, items = await self._load_chunk(after_id)
+            if not users:
+                break
+
+            sent_flags = await self.redis.smismember(self.sent_key, [user.id for user, _ in items]) if items else []
+            pending = [item for item, sent in zip(items, sent_flags) if not sent]
+            stats.skipped += len(users) - len(pending)
+
+            htmls = self.handler.templates.render_batch(TEMPLATE, (context for _, context in pending))
+            await asyncio.gather(*(
+                self._send(user, context, html, stats)
+                for (user, context), html in zip(pending, htmls)
+            ))
+
+            after_id = users[-1].id
+            stats.processed += len(users)
+            await self._checkpoint(after_id)
+            logger.info(f"[Digest] Обработано {stats.processed} пользователей, отправлено {stats.sent}")
+
+        return stats
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description="Рассылка недельной сводки расходов")
+    parser.add_argument(
+        "--week-start",
+        type=date.fromisoformat,
+        default=None,
+        help="Понедельник отчётной недели (по умолчанию прошлая неделя)",
+    )
+    args = parser.parse_args()
+
+    settings.configure_logging()
+    email_handler.templates.precompile()
+    job = WeeklyDigestJob(
+        async_session_factory,
+        redis_client,
+        email_handler,
+        args.week_start or previous_week_start(),
+    )
+    try:
+        stats = await job.run()
+        logger.info(f"[Digest] Готово: {stats}")
+    finally:
+        await email_handler.close()
+        await redis_client.aclose()
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,90 @@
+# app/finance/reports/repository.py
+from datetime import datetime
+from typing import Sequence
+
+from sqlalchemy import Row, select, func, case
+
+from app.db.models.models import User, Transaction, Category
+from app.db.repository import BaseRepository
+
+
+class DigestRepository(BaseRepository[Transaction]):
+    """
+    Агрегаты для недельной рассылки: каждая выборка считается сразу для пачки пользователей,
+    а не запросом на пользователя.
+    """
+    model = Transaction
+
+    async def recipients_after(self, after_id: int, limit: int) -> Sequence[Row]:
+        # keyset-пагинация по id: стоимость не растёт с номером пачки
+        rows = await self.session.execute(
+            select(User.id, User.email, User.first_name)
+            .where(
+                User.id > after_id,
+                User.is_active.is_(True),
+                User.email_confirmed.is_(True),
+            )
+            .order_by(User.id)
+            .limit(limit)
+        )
+        return rows.all()
+
+    async def weekly_totals(self, user_ids: Sequence[int], start: datetime, end: datetime) -> Sequence[Row]:
+        rows = await self.session.execute(
+            select(
+                Transaction.user_id,
+                func.coalesce(
+                    func.sum(case((Category.type == "income", Transaction.amount))), 0
+                ).label("income"),
+                func.coalesce(
+                    func.sum(case((Category.type != "income", Transaction.amount))), 0
+                ).label("expense"),
+                func.count().label("transactions_count"),
+            )
+            .join(Category, Transaction.category_id == Category.id)
+            .where(
+                Transaction.user_id.in_(user_ids),
+                Transaction.occurred_at >= start,
+                Transaction.occurred_at < end,
+            )
+            .group_by(Transaction.user_id)
+        )
+        return rows.all()
+
+    async def weekly_top_categories(
+        self,
+        user_ids: Sequence[int],
+        start: datetime,
+        end: datetime,
+        limit: int,
+    ) -> Sequence[Row]:
+        totals = (
+            select(
+                Transaction.user_id,
+                Category.name.label("category_name"),
+                func.sum(Transaction.amount).label("total"),
+            )
+            .join(Category, Transaction.category_id == Category.id)
+            .where(
+                Transaction.user_id.in_(user_ids),
+                Transaction.occurred_at >= start,
+                Transaction.occurred_at < end,
+                Category.type != "income",
+            )
+            .group_by(Transaction.user_id, Category.id, Category.name)
+            .subquery()
+        )
+        ranked = select(
+            totals,
+            func.row_number().over(
+                partition_by=totals.c.user_id,
+                order_by=totals.c.total.desc(),
+            ).label("position"),
+        ).subquery()
+
+        rows = await self.session.execute(
+            select(ranked.c.user_id, ranked.c.category_name, ranked.c.total)
+            .where(ranked.c.position <= limit)
+            .order_by(ranked.c.user_id, ranked.c.position)
+        )
+        return rows.all()
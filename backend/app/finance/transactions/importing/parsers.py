@@ -0,0 +1,194 @@
+# app/finance/transactions/importing/parsers.py
+"""
+Построчные парсеры банковских выписок. Оба парсера — генераторы: файл читается по строке,
+поэтому память не зависит от размера выписки.
+"""
+import csv
+import re
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal, InvalidOperation
+from typing import Iterable, Iterator, Literal, Optional, Union
+
+from app.db.partitions import validate_occurred_at
+
+ImportFormat = Literal["csv", "ofx"]
+
+DESCRIPTION_MAX_LENGTH = 255
+
+
+@dataclass(slots=True)
+class ParsedRow:
+    line: int
+    occurred_at: datetime
+    amount: Decimal  # со знаком: отрицательная сумма — расход
+    description: Optional[str]
+    category: Optional[str]
+
+
+@dataclass(slots=True)
+class RowError:
+    line: int
+    reason: str
+
+
+ParseResult = Union[ParsedRow, RowError]
+
+
+class StatementFormatError(ValueError):
+    """Файл целиком не похож на выписку в ожидаемом формате."""
+
+
+# Допустимые заголовки колонок CSV (в нижнем регистре)
+CSV_COLUMNS: dict[str, tuple[str, ...]] = {
+    "date": ("date", "дата", "дата операции", "occurred_at", "transaction date"),
+    "amount": ("amount", "сумма", "сумма операции"),
+    "description": ("description", "описание", "назначение", "memo", "details"),
+    "category": ("category", "категория"),
+}
+CSV_DATE_FORMATS = ("%Y-%m-%d", "%Y-%m-%d %H:%M:%S", "%d.%m.%Y", "%d.%m.%Y %H:%M:%S", "%d/%m/%Y")
+
+
+def parse_amount(value: str) -> Decimal:
+    # "1 234,50", "-1234.50", "1,234.50", "1.234,50": дробная часть отделяется последним из , и .
+    cleaned = "".join(value.split())
+    if "," in cleaned and "." in cleaned:
+        thousands = "," if cleaned.rfind(".") > cleaned.rfind(",") else "."
+        cleaned = cleaned.replace(thousands, "")
+    cleaned = cleaned.replace(",", ".")
+    try:
+        return Decimal(cleaned)
+    except InvalidOperation:
+        raise ValueError(f"некорректная сумма {value!r}")
+
+
+def _parse_csv_date(value: str) -> datetime:
+    value = value.strip()
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        for fmt in CSV_DATE_FORMATS:
+            try:
+                parsed = datetime.strptime(value, fmt)
+                break
+            except ValueError:
+                continue
+        else:
+            raise ValueError(f"некорректная дата {value!r}")
+
+    return validate_occurred_at(parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc))
+
+
+def _clean_description(value: Optional[str]) -> Optional[str]:
+    if value is None:
+        return None
+    value = " ".join(value.split())
+    return value[:DESCRIPTION_MAX_LENGTH] or None
+
+
+def parse_csv(lines: Iterable[str]) -> Iterator[ParseResult]:
+    lines = iter(lines)
+    header_line = next(lines, None)
+    if header_line is None:
+        raise StatementFormatError("Пустой файл")
+
+    try:
+        dialect = csv.Sniffer().sniff(header_line, delimiters=",;\t")
+    except csv.Error:
+        dialect = csv.excel  # type: ignore[assignment]
+
+    header = [column.strip().lower() for column in next(csv.reader([header_line], dialect))]
+    positions: dict[str, int] = {}
+    for field, aliases in CSV_COLUMNS.items():
+        for index, column in enumerate(header):
+            if column in aliases:
+                positions[field] = index
+                break
+
+    missing = {"date", "amount"} - positions.keys()
+    if missing:
+        raise StatementFormatError(f"В CSV нет колонок: {', '.join(sorted(missing))}")
+
+    def cell(record: list[str], field: str) -> Optional[str]:
+        index = positions.get(field)
+        if index is None or index >= len(record):
+            return None
+        return record[index].strip() or None
+
+    for line_number, record in enumerate(csv.reader(lines, dialect), start=2):
+        if not any(value.strip() for value in record):
+            continue
+        try:
+            yield ParsedRow(
+                line=line_number,
+                occurred_at=_parse_csv_date(cell(record, "date") or ""),
+                amount=parse_amount(cell(record, "amount") or ""),
+                description=_clean_description(cell(record, "description")),
+                category=cell(record, "category"),
+            )
+        except ValueError as e:
+            yield RowError(line=line_number, reason=str(e))
+
+
+_OFX_TAG = re.compile(r"<(/?)([A-Z0-9.]+)>([^<\r\n]*)", re.IGNORECASE)
+
+
+def _parse_ofx_date(value: str) -> datetime:
+    # 20240131120000.000[-5:EST] — часовой пояс в квадратных скобках необязателен
+    match = re.match(r"^(\d{8})(\d{6})?(?:\.\d+)?(?:\[([+-]?\d+(?:\.\d+)?)(?::\w+)?\])?", value.strip())
+    if not match:
+        raise ValueError(f"некорректная дата {value!r}")
+
+    date_part, time_part, offset = match.groups()
+    parsed = datetime.strptime(date_part + (time_part or "000000"), "%Y%m%d%H%M%S")
+    if offset is None:
+        return validate_occurred_at(parsed.replace(tzinfo=timezone.utc))
+
+    return validate_occurred_at(parsed.replace(tzinfo=timezone(timedelta(hours=float(offset)))))
+
+
+def parse_ofx(lines: Iterable[str]) -> Iterator[ParseResult]:
+    """
+    OFX 1.x (SGML, закрывающие теги необязательны) и 2.x (XML).
+    Разбираются только блоки <STMTTRN>; остальная часть документа пропускается.
+    """
+    current: Optional[dict[str, str]] = None
+    started_at = 0
+    seen_ofx = False
+
+    for line_number, line in enumerate(lines, start=1):
+        for closing, tag, value in _OFX_TAG.findall(line):
+            tag = tag.upper()
+            if tag == "OFX":
+                seen_ofx = True
+            if tag == "STMTTRN":
+                if not closing:
+                    current, started_at = {}, line_number
+                    continue
+                if current is None:
+                    continue
+                fields, current = current, None
+                try:
+                    description = " ".join(
+                        part for part in (fields.get("NAME"), fields.get("MEMO")) if part
+                    )
+                    yield ParsedRow(
+                        line=started_at,
+                        occurred_at=_parse_ofx_date(fields.get("DTPOSTED", "")),
+                        amount=parse_amount(fields.get("TRNAMT", "")),
+                        description=_clean_description(description),
+                        category=None,
+                    )
+                except ValueError as e:
+                    yield RowError(line=started_at, reason=str(e))
+            elif current is not None and not closing and value.strip():
+                current[tag] = value.strip()
+
+    if not seen_ofx:
+        raise StatementFormatError("Файл не похож на OFX")
+
+
+def parse_statement(fmt: ImportFormat, lines: Iterable[str]) -> Iterator[ParseResult]:
+    if fmt == "ofx":
+        return parse_ofx(lines)
+    return parse_csv(lines)
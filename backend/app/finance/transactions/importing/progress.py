@@ -0,0 +1,56 @@
+# app/finance/transactions/importing/progress.py
+import json
+from typing import Any, Dict, Optional
+
+from redis.asyncio import Redis
+
+
+class ImportProgressRepository:
+    """
+    Состояние импорта в Redis-хэше import:{id}: статус, счётчики и примеры ошибок.
+    Хэш живёт ttl секунд после последнего обновления.
+    """
+    PREFIX = "import:"
+    COUNTERS = ("parsed", "rejected", "inserted", "duplicates")
+
+    def __init__(self, redis: Redis, ttl: int) -> None:
+        self.redis = redis
+        self.ttl = ttl
+
+    def _key(self, import_id: str) -> str:
+        return f"{self.PREFIX}{import_id}"
+
+    async def create(self, import_id: str, *, user_id: int, filename: str) -> None:
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.hset(self._key(import_id), mapping={
+                "user_id": user_id,
+                "filename": filename,
+                "status": "pending",
+                **{counter: 0 for counter in self.COUNTERS},
+                "errors": "[]",
+            })
+            pipe.expire(self._key(import_id), self.ttl)
+            await pipe.execute()
+
+    async def update(self, import_id: str, **fields: Any) -> None:
+        mapping = {
+            name: json.dumps(value, ensure_ascii=False) if isinstance(value, list) else value
+            for name, value in fields.items()
+            if value is not None
+        }
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.hset(self._key(import_id), mapping=mapping)
+            pipe.expire(self._key(import_id), self.ttl)
+            await pipe.execute()
+
+    async def get(self, import_id: str) -> Optional[Dict[str, Any]]:
+        data = await self.redis.hgetall(self._key(import_id))  # type: ignore[misc]
+        if not data:
+            return None
+
+        progress: Dict[str, Any] = dict(data)
+        progress["user_id"] = int(progress["user_id"])
+        for counter in self.COUNTERS:
+            progress[counter] = int(progress.get(counter, 0))
+        progress["errors"] = json.loads(progress.get("errors", "[]"))
+        return progress
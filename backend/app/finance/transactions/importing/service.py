@@ -0,0 +1,261 @@
+# app/finance/transactions/importing/service.py
+import asyncio
+import os
+import tempfile
+from decimal import Decimal, ROUND_HALF_UP
+from itertools import islice
+from typing import Any, BinaryIO, Dict, Iterator, Optional
+from uuid import uuid4
+
+from loguru import logger
+from redis.asyncio import Redis
+from sqlalchemy import text
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.core.config import settings
+from app.core.metrics import metrics
+from app.db.database import async_session_factory
+from app.db.partitions import is_missing_partition_error
+from app.finance.categories.repository import CategoryRepository
+from app.finance.transactions.importing.parsers import (
+    ImportFormat,
+    ParsedRow,
+    ParseResult,
+    RowError,
+    StatementFormatError,
+    parse_statement,
+)
+from app.finance.transactions.importing.progress import ImportProgressRepository
+from app.api.errors.exceptions import TransactionImportNotFound, TransactionImportTooLarge
+
+STAGING_TABLE = "transactions_import_staging"
+STAGING_COLUMNS = ("category_id", "amount", "description", "occurred_at")
+FALLBACK_CATEGORY = "Без категории"
+MAX_AMOUNT = Decimal("1e10")  # предел Numeric(12, 2)
+CENT = Decimal("0.01")
+
+_CREATE_STAGING = text(f"""
+    CREATE TEMP TABLE {STAGING_TABLE} (
+        category_id integer NOT NULL,
+        amount numeric(12, 2) NOT NULL,
+        description varchar(255),
+        occurred_at timestamptz NOT NULL
+    ) ON COMMIT DROP
+""")
+
+# Параллельные импорты одного пользователя иначе не видят строк друг друга в NOT EXISTS
+# и оба вставляют одну и ту же операцию; блокировка снимается вместе с транзакцией
+_LOCK_USER_IMPORT = text("SELECT pg_advisory_xact_lock(hashtext('transactions_import'), :user_id)")
+
+# Дубликатом считается операция пользователя с той же датой, суммой и описанием;
+# повторный импорт той же или перекрывающейся выписки ничего не добавляет
+_INSERT_FROM_STAGING = text(f"""
+    INSERT INTO transactions (user_id, category_id, amount, description, occurred_at)
+    SELECT :user_id, s.category_id, s.amount, s.description, s.occurred_at
+    FROM {STAGING_TABLE} s
+    WHERE NOT EXISTS (
+        SELECT 1 FROM transactions t
+        WHERE t.user_id = :user_id
+          AND t.occurred_at = s.occurred_at
+          AND t.amount = s.amount
+          AND t.description IS NOT DISTINCT FROM s.description
+    )
+""")
+
+# Задачи импорта, выполняемые этим процессом
+_running_imports: set[asyncio.Task[None]] = set()
+
+
+class TransactionImporter:
+    """
+    Импорт одной выписки: файл разбирается генератором пачками по batch_size строк
+    (разбор идёт в потоке, чтобы не занимать event loop), каждая пачка загружается
+    через COPY во временную таблицу, затем один INSERT ... SELECT переносит в transactions
+    только новые строки. Всё выполняется в одной транзакции, в памяти — одна пачка.
+    """
+
+    def __init__(
+        self,
+        session: AsyncSession,
+        progress: ImportProgressRepository,
+        *,
+        batch_size: int = settings.transactions_import_batch_size,
+        max_reported_errors: int = 20,
+    ) -> None:
+        self.session = session
+        self.progress = progress
+        self.category_repo = CategoryRepository(session)
+        self.batch_size = batch_size
+        self.max_reported_errors = max_reported_errors
+        self._categories: dict[tuple[str, str], int] = {}
+
+    async def _load_categories(self, user_id: int) -> None:
+        for category in await self.category_repo.get_all_by_user(user_id=user_id):
+            self._categories.setdefault((category.type, category.name.lower()), category.id)
+
+    async def _category_id(self, user_id: int, type: str, name: Optional[str]) -> int:
+        name = (name or FALLBACK_CATEGORY).strip()[:100] or FALLBACK_CATEGORY
+        key = (type, name.lower())
+        category_id = self._categories.get(key)
+        if category_id is None:
+            category_id = await self.category_repo.create_in_transaction(user_id=user_id, name=name, type=type)
+            self._categories[key] = category_id
+        return category_id
+
+    def _next_batch(self, results: Iterator[ParseResult]) -> list[ParseResult]:
+        return list(islice(results, self.batch_size))
+
+    async def _to_record(self, user_id: int, row: ParsedRow) -> tuple[Any, ...] | str:
+        amount = row.amount.quantize(CENT, rounding=ROUND_HALF_UP) if row.amount.is_finite() else None
+        if amount is None or amount == 0 or abs(amount) >= MAX_AMOUNT:
+            return f"недопустимая сумма {row.amount}"
+
+        # знак суммы определяет тип категории, в таблице хранится модуль
+        type = "income" if amount > 0 else "expense"
+        category_id = await self._category_id(user_id, type, row.category)
+        return category_id, abs(amount), row.description, row.occurred_at
+
+    async def run(self, import_id: str, user_id: int, path: str, fmt: ImportFormat) -> None:
+        counters = {"parsed": 0, "rejected": 0}
+        errors: list[str] = []
+        await self.progress.update(import_id, status="running")
+
+        await self._load_categories(user_id)
+        await self.session.execute(_CREATE_STAGING)
+        connection = await self.session.connection()
+        raw_connection = await connection.get_raw_connection()
+        copy_connection: Any = raw_connection.driver_connection  # asyncpg.Connection
+
+        with open(path, encoding="utf-8-sig", errors="replace", newline="") as statement:
+            results = parse_statement(fmt, statement)
+            while batch := await asyncio.to_thread(self._next_batch, results):
+                records = []
+                for item in batch:
+                    reason = item.reason if isinstance(item, RowError) else None
+                    if isinstance(item, ParsedRow):
+                        record = await self._to_record(user_id, item)
+                        if isinstance(record, str):
+                            reason = record
+                        else:
+                            records.append(record)
+
+                    if reason is not None:
+                        counters["rejected"] += 1
+                        if len(errors) < self.max_reported_errors:
+                            errors.append(f"строка {item.line}: {reason}")
+
+                if records:
+                    await copy_connection.copy_records_to_table(
+                        STAGING_TABLE,
+                        records=records,
+                        columns=STAGING_COLUMNS,
+                    )
+                counters["parsed"] += len(batch)
+                await self.progress.update(import_id, **counters, errors=errors)
+
+        staged = counters["parsed"] - counters["rejected"]
+        # даты выписки проверены парсером по окну секций, сами секции здесь не создаются:
+        # подключение секции внутри этой длинной транзакции заблокировало бы чтение transactions
+        await self.session.execute(_LOCK_USER_IMPORT, {"user_id": user_id})
+        result = await self.session.execute(_INSERT_FROM_STAGING, {"user_id": user_id})
+        inserted = result.rowcount  # type: ignore[attr-defined]
+        await self.session.commit()
+
+        await self.progress.update(
+            import_id,
+            status="completed",
+            inserted=inserted,
+            duplicates=staged - inserted,
+        )
+        metrics.inc("transaction_import_rows_total", inserted, result="inserted")
+        metrics.inc("transaction_import_rows_total", staged - inserted, result="duplicate")
+        metrics.inc("transaction_import_rows_total", counters["rejected"], result="rejected")
+
+
+async def run_import(
+    import_id: str,
+    user_id: int,
+    path: str,
+    fmt: ImportFormat,
+    progress: ImportProgressRepository,
+    session_factory: async_sessionmaker[AsyncSession] = async_session_factory,
+) -> None:
+    try:
+        async with session_factory() as session:
+            await TransactionImporter(session, progress).run(import_id, user_id, path, fmt)
+        logger.info(f"Импорт {import_id} пользователя {user_id} завершён")
+    except StatementFormatError as e:
+        await progress.update(import_id, status="failed", error=str(e))
+    except IntegrityError as e:
+        # секция месяца из окна ещё не создана фоновой задачей app.db.partitions
+        if is_missing_partition_error(e):
+            logger.warning(f"Импорт {import_id}: нет секции для части операций: {e.orig}")
+            error = "Операции за часть месяцев выписки пока нельзя сохранить, повторите импорт позже"
+        else:
+            logger.exception(f"Импорт {import_id} завершился ошибкой: {e}")
+            error = "Внутренняя ошибка импорта"
+        await progress.update(import_id, status="failed", error=error)
+    except asyncio.CancelledError:
+        await asyncio.shield(progress.update(import_id, status="failed", error="Импорт прерван остановкой сервера"))
+        raise
+    except Exception as e:
+        logger.exception(f"Импорт {import_id} завершился ошибкой: {e}")
+        await progress.update(import_id, status="failed", error="Внутренняя ошибка импорта")
+    finally:
+        os.unlink(path)
+
+
+def _copy_upload(source: BinaryIO, suffix: str, max_bytes: int) -> str:
+    with tempfile.NamedTemporaryFile(delete=False, suffix=suffix, prefix="import-") as target:
+        copied = 0
+        while chunk := source.read(1024 * 1024):
+            copied += len(chunk)
+            if copied > max_bytes:
+                target.close()
+                os.unlink(target.name)
+                raise TransactionImportTooLarge(max_bytes)
+            target.write(chunk)
+        return target.name
+
+
+def detect_format(filename: str) -> ImportFormat:
+    return "ofx" if filename.lower().endswith((".ofx", ".qfx")) else "csv"
+
+
+class TransactionImportService:
+    def __init__(self, redis: Redis):
+        self.progress = ImportProgressRepository(redis, ttl=settings.transactions_import_progress_ttl)
+
+    async def start(
+        self,
+        user_id: int,
+        file: BinaryIO,
+        filename: str,
+        fmt: Optional[ImportFormat] = None,
+    ) -> str:
+        fmt = fmt or detect_format(filename)
+        # загруженный файл закрывается вместе с запросом, поэтому импорт работает со своей копией
+        path = await asyncio.to_thread(
+            _copy_upload, file, f".{fmt}", settings.transactions_import_max_bytes
+        )
+
+        import_id = uuid4().hex
+        await self.progress.create(import_id, user_id=user_id, filename=filename)
+
+        task = asyncio.create_task(run_import(import_id, user_id, path, fmt, self.progress))
+        _running_imports.add(task)
+        task.add_done_callback(_running_imports.discard)
+        return import_id
+
+    async def get_progress(self, user_id: int, import_id: str) -> Dict[str, Any]:
+        progress = await self.progress.get(import_id)
+        if not progress or progress["user_id"] != user_id:
+            raise TransactionImportNotFound(import_id)
+        return progress
+
+
+async def cancel_running_imports() -> None:
+    for task in list(_running_imports):
+        task.cancel()
+    await asyncio.gather(*_running_imports, return_exceptions=True)
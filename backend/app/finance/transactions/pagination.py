@@ -0,0 +1,34 @@
+# app/finance/transactions/pagination.py
+import base64
+import binascii
+import json
+from datetime import datetime
+from typing import Optional
+
+from app.api.errors.exceptions import InvalidTransactionCursor
+
+# Позиция в выдаче (occurred_at, id) — ключ сортировки списка транзакций
+Cursor = tuple[Optional[datetime], int]
+
+
+def encode_cursor(occurred_at: Optional[datetime], transaction_id: int) -> str:
+    payload = json.dumps(
+        {"t": occurred_at.isoformat() if occurred_at else None, "id": transaction_id},
+        separators=(",", ":"),
+    )
+    return base64.urlsafe_b64encode(payload.encode()).rstrip(b"=").decode()
+
+
+def decode_cursor(cursor: str) -> Cursor:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        payload = json.loads(raw)
+        occurred_at = datetime.fromisoformat(payload["t"]) if payload["t"] is not None else None
+        transaction_id = payload["id"]
+    except (binascii.Error, UnicodeDecodeError, ValueError, KeyError, TypeError):
+        raise InvalidTransactionCursor()
+
+    if not isinstance(transaction_id, int):
+        raise InvalidTransactionCursor()
+
+    return occurred_at, transaction_id
@@ -1,29 +1,86 @@
 # app/finance/transactions/repository.py
 from decimal import Decimal
-from typing import Optional, Sequence
+from typing import Any, AsyncIterator, Literal, Optional, Sequence
 from datetime import datetime
 
-from sqlalchemy import select, func, delete
+from sqlalchemy import Row, Select, String, select, insert, update, func, delete, tuple_, exists, literal, cast
 
-from app.db.models.models import Transaction
+from app.db.models.models import Category, Transaction
 from app.db.repository import BaseRepository
+from app.finance.transactions.pagination import Cursor
+
+
+TransactionSort = Literal["date", "relevance"]
+
+
+def escape_like(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+# Колонки ответа TransactionResponse: выборка без ORM-объектов и связей
+LIST_COLUMNS = (
+    Transaction.id,
+    Transaction.user_id,
+    Transaction.category_id,
+    Transaction.amount,
+    Transaction.description,
+    Transaction.occurred_at,
+    Transaction.created_at,
+)
+
+
+def _select_type(column: Any) -> Any:
+    # явный CAST к VARCHAR(255) молча обрезает строку; без длины лишнее отклонит сама колонка,
+    # как и при UPDATE
+    if isinstance(column.type, String):
+        return String()
+    return column.type
 
 
 class TransactionRepository(BaseRepository[Transaction]):
     model = Transaction
 
     # Получить все транзакции конкретного пользователя
-    async def list_by_user(self, user_id: int) -> Sequence[Transaction]:
-        return await self.get_all(user_id=user_id)
+    async def list_by_user(self, user_id: int) -> Sequence[Row]:
+        result = await self.session.execute(select(*LIST_COLUMNS).where(Transaction.user_id == user_id))
+        return result.all()
+
+    async def add_many(self, rows: Sequence[dict[str, Any]]) -> Sequence[Row]:
+        """
+        Вставка пачкой: SQLAlchemy собирает строки в многострочные INSERT ... VALUES ... RETURNING,
+        всё в одной транзакции. Возвращённые строки идут в порядке rows.
+        """
+        result = await self.session.execute(
+            insert(Transaction).returning(*LIST_COLUMNS, sort_by_parameter_order=True),
+            rows,
+        )
+        created = result.all()
+        await self.session.commit()
+        return created
+
+    async def stream_by_user(
+        self,
+        user_id: int,
+        batch_size: int,
+        **filters: Any,
+    ) -> AsyncIterator[Sequence[Row]]:
+        """
+        Транзакции пользователя (с фильтрами как в list_by_user_filtered) пачками по batch_size
+        через серверный курсор: в памяти одновременно находится только одна пачка кортежей.
+        """
+        result = await self.session.stream(
+            self._filtered(user_id, **filters).execution_options(yield_per=batch_size)
+        )
+        async for partition in result.partitions():
+            yield partition
 
-    # Получить транзакцию по ID и user_id (чтобы нельзя было получить чужую)
-    async def get_by_id_for_user(self, transaction_id: int, user_id: int) -> Optional[Transaction]:
+    async def get_by_id_for_user(self, transaction_id: int, user_id: int) -> Optional[Row]:
         result = await self.session.execute(
-            select(self.model)
-            .where(self.model.id == transaction_id)
-            .where(self.model.user_id == user_id)
+            select(*LIST_COLUMNS)
+            .where(Transaction.id == transaction_id)
+            .where(Transaction.user_id == user_id)
         )
-        return result.scalar_one_or_none()
+        return result.one_or_none()
 
     # Получить сумму транзакций по категории
     async def sum_amounts_by_category(self, user_id: int, category_id: int) -> Decimal:
@@ -34,26 +91,70 @@ class TransactionRepository(BaseRepository[Transaction]):
         result = await self.session.execute(stmt)
         return result.scalar() or Decimal(0)
 
-    # Удаление транзакции по ID и user_id (чтобы нельзя было удалить чужую)
-    async def delete_for_user(self, transaction_id: int, user_id: int) -> None:
-        stmt = delete(Transaction).where(
-        Transaction.id == transaction_id,
-        Transaction.user_id == user_id
-    )
-        await self.session.execute(stmt)
+    # Создание одним запросом: INSERT ... SELECT выполняется, только если категория принадлежит пользователю
+    async def create_for_user(self, user_id: int, data: dict[str, Any]) -> Optional[Row]:
+        values = {"user_id": user_id, **data}
+        columns = [getattr(Transaction, name) for name in values]
+        stmt = (
+            insert(Transaction)
+            .from_select(
+                list(values),
+                # явные CAST: asyncpg не выводит типы параметров в списке SELECT
+                select(*(cast(literal(value, column.type), _select_type(column)) for value, column in zip(values.values(), columns)))
+                .where(self._category_owned(user_id, data["category_id"])),
+            )
+            .returning(*LIST_COLUMNS)
+        )
+        result = await self.session.execute(stmt)
+        row = result.one_or_none()
         await self.session.commit()
+        return row
+
+    # Обновление одним запросом; None — транзакции нет у пользователя или новая категория чужая
+    async def update_for_user(self, transaction_id: int, user_id: int, data: dict[str, Any]) -> Optional[Row]:
+        stmt = (
+            update(Transaction)
+            .where(Transaction.id == transaction_id, Transaction.user_id == user_id)
+            .values(**data)
+            .returning(*LIST_COLUMNS)
+        )
+        if "category_id" in data:
+            stmt = stmt.where(self._category_owned(user_id, data["category_id"]))
 
-    async def list_by_user_filtered( self, user_id: int, *,
+        result = await self.session.execute(stmt)
+        row = result.one_or_none()
+        await self.session.commit()
+        return row
+
+    # Удаление транзакции по ID и user_id (чтобы нельзя было удалить чужую); False — удалять нечего
+    async def delete_for_user(self, transaction_id: int, user_id: int) -> bool:
+        stmt = (
+            delete(Transaction)
+            .where(Transaction.id == transaction_id, Transaction.user_id == user_id)
+            .returning(Transaction.id)
+        )
+        result = await self.session.execute(stmt)
+        deleted = result.scalar_one_or_none() is not None
+        await self.session.commit()
+        return deleted
+
+    @staticmethod
+    def _category_owned(user_id: int, category_id: int) -> Any:
+        return exists().where(Category.id == category_id, Category.user_id == user_id)
+
+    def _filtered(
+        self,
+        user_id: int,
+        *,
         date_from: Optional[datetime] = None,
         date_to: Optional[datetime] = None,
         category_id: Optional[int] = None,
         min_amount: Optional[Decimal] = None,
         max_amount: Optional[Decimal] = None,
         search: Optional[str] = None,
-        limit: int = 20,
-        offset: int = 0,
-    ):
-        stmt = select(Transaction).where(Transaction.user_id == user_id)
+        sort: TransactionSort = "date",
+    ) -> Select[Any]:
+        stmt = select(*LIST_COLUMNS).where(Transaction.user_id == user_id)
 
         if date_from:
             stmt = stmt.where(Transaction.occurred_at >= date_from)
@@ -71,10 +172,74 @@ class TransactionRepository(BaseRepository[Transaction]):
             stmt = stmt.where(Transaction.amount <= max_amount)
 
         if search:
-            stmt = stmt.where(Transaction.description.ilike(f"%{search}%"))
-
-        stmt = stmt.order_by(Transaction.occurred_at.desc())
-        stmt = stmt.limit(limit).offset(offset)
+            # ILIKE по подстроке вместе с user_id обслуживается GIN-индексом (user_id, description gin_trgm_ops);
+            # % и _ из поискового запроса ищутся как обычные символы
+            stmt = stmt.where(Transaction.description.ilike(f"%{escape_like(search)}%", escape="\\"))
+
+        order_by = [Transaction.occurred_at.desc().nulls_last(), Transaction.id.desc()]
+        if sort == "relevance" and search:
+            # сначала описания, где запрос совпадает с целым словом, затем по дате
+            order_by.insert(0, func.word_similarity(search, Transaction.description).desc())
+
+        # id разрешает равные occurred_at, поэтому порядок строк полностью определён
+        return stmt.order_by(*order_by)
+
+    async def list_by_user_filtered(
+        self,
+        user_id: int,
+        *,
+        limit: int = 20,
+        offset: int = 0,
+        **filters: Any,
+    ) -> Sequence[Row]:
+        stmt = self._filtered(user_id, **filters).limit(limit).offset(offset)
 
         result = await self.session.execute(stmt)
-        return result.scalars().all()
+        return result.all()
+
+    async def list_by_user_after(
+        self,
+        user_id: int,
+        *,
+        after: Optional[Cursor] = None,
+        limit: int = 20,
+        **filters: Any,
+    ) -> Sequence[Row]:
+        """
+        Keyset-пагинация: строки строго после позиции after в порядке
+        (occurred_at DESC NULLS LAST, id DESC). Стоимость не зависит от глубины страницы,
+        а вставки во время прокрутки не сдвигают уже выданные строки.
+        """
+        stmt = self._filtered(user_id, **filters)
+
+        if after is None:
+            result = await self.session.execute(stmt.limit(limit))
+            return result.all()
+
+        occurred_at, transaction_id = after
+        if occurred_at is None:
+            # строки без даты идут последними, внутри них — по убыванию id
+            result = await self.session.execute(
+                stmt.where(Transaction.occurred_at.is_(None), Transaction.id < transaction_id).limit(limit)
+            )
+            return result.all()
+
+        # сравнение кортежей — условие индекса (user_id, occurred_at DESC, id DESC);
+        # OR с IS NULL превратил бы его в фильтр по всем строкам пользователя,
+        # поэтому строки без даты добираются вторым запросом, только когда датированные закончились
+        # отдельное условие на occurred_at избыточно для индекса, но по нему отсекаются
+        # секции с более поздними месяцами — сравнение кортежей для этого не используется
+        result = await self.session.execute(
+            stmt.where(
+                tuple_(Transaction.occurred_at, Transaction.id) < tuple_(occurred_at, transaction_id),
+                Transaction.occurred_at <= occurred_at,
+            ).limit(limit)
+        )
+        rows = list(result.all())
+        if len(rows) < limit:
+            result = await self.session.execute(
+                stmt.where(Transaction.occurred_at.is_(None)).limit(limit - len(rows))
+            )
+            rows.extend(result.all())
+
+        return rows
@@ -1,17 +1,32 @@
 # app/finance/transactions/router.py
-from fastapi import APIRouter, Depends, status, Query
-from typing import List
+from fastapi import APIRouter, Depends, status, Query, UploadFile, File
+from fastapi.responses import Response, StreamingResponse
+from redis.asyncio import Redis
+from typing import List, Optional
 
 from app.api.dependencies.auth_dep import get_current_user
-from app.db.models.models import User
+from app.auth.principal import Principal
 from app.finance.transactions.schemas.requests import (
     TransactionCreate,
     TransactionUpdate,
+    TransactionBulkCreate,
+)
+from app.finance.transactions.schemas.responses import (
+    TransactionResponse,
+    TransactionPageResponse,
+    TransactionBulkResponse,
+    TransactionImportStarted,
+    TransactionImportProgress,
 )
-from app.finance.transactions.schemas.responses import TransactionResponse
 from app.finance.transactions.schemas.filters import TransactionFilter
 from app.finance.transactions.service import TransactionService
+from app.finance.transactions.repository import TransactionSort
+from app.finance.transactions.streaming import StreamFormat, ExportFormat, MEDIA_TYPES
+from app.finance.transactions.importing.parsers import ImportFormat
+from app.finance.transactions.importing.service import TransactionImportService
 from app.api.dependencies.transaction_dep import get_transaction_service
+from app.api.dependencies.redis_dep import get_redis
+from app.core.config import settings
 
 router = APIRouter(prefix="/transactions", tags=["Транзакции"])
 
@@ -20,7 +35,7 @@ router = APIRouter(prefix="/transactions", tags=["Транзакции"])
 @router.post("/", response_model=TransactionResponse, status_code=status.HTTP_201_CREATED)
 async def create_transaction(
     data: TransactionCreate,
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
     service: TransactionService = Depends(get_transaction_service),
 ):
     """
@@ -29,16 +44,115 @@ async def create_transaction(
     return await service.create(user_id=current_user.id, data=data)
 
 
+# --- BULK CREATE ---
+@router.post("/bulk", response_model=TransactionBulkResponse, status_code=status.HTTP_201_CREATED)
+async def create_transactions_bulk(
+    data: TransactionBulkCreate,
+    current_user: Principal = Depends(get_current_user),
+    service: TransactionService = Depends(get_transaction_service),
+):
+    """
+    Создать пачку транзакций за один запрос.
+    Корректные элементы сохраняются, для остальных возвращается ошибка с их позицией
+    """
+    return await service.create_bulk(user_id=current_user.id, data=data)
+
+
+# --- IMPORT ---
+@router.post(
+    "/import",
+    response_model=TransactionImportStarted,
+    status_code=status.HTTP_202_ACCEPTED,
+    summary="Импорт банковской выписки (CSV или OFX)",
+)
+async def import_transactions(
+    file: UploadFile = File(...),
+    format: Optional[ImportFormat] = Query(None, description="По умолчанию определяется по расширению файла"),
+    current_user: Principal = Depends(get_current_user),
+    redis: Redis = Depends(get_redis),
+):
+    """
+    Файл обрабатывается в фоне; ход импорта — GET /transactions/import/{import_id}.
+    Операции, уже существующие у пользователя (та же дата, сумма и описание), пропускаются
+    """
+    service = TransactionImportService(redis)
+    import_id = await service.start(
+        user_id=current_user.id,
+        file=file.file,
+        filename=file.filename or "statement",
+        fmt=format,
+    )
+    return TransactionImportStarted(import_id=import_id)
+
+
+@router.get("/import/{import_id}", response_model=TransactionImportProgress, summary="Ход импорта выписки")
+async def get_import_progress(
+    import_id: str,
+    current_user: Principal = Depends(get_current_user),
+    redis: Redis = Depends(get_redis),
+):
+    return await TransactionImportService(redis).get_progress(user_id=current_user.id, import_id=import_id)
+
+
 # --- LIST ---
 @router.get("/", response_model=List[TransactionResponse])
 async def list_transactions(
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
     service: TransactionService = Depends(get_transaction_service),
 ):
     """
     Получить все транзакции пользователя
     """
-    return await service.list(user_id=current_user.id)
+    # готовый JSON отдаётся как есть; response_model остаётся для схемы OpenAPI
+    return Response(await service.list(user_id=current_user.id), media_type="application/json")
+
+
+@router.get("/stream", summary="Все транзакции пользователя потоком (NDJSON или CSV)")
+async def stream_transactions(
+    format: StreamFormat = Query("ndjson"),
+    current_user: Principal = Depends(get_current_user),
+    service: TransactionService = Depends(get_transaction_service),
+):
+    """
+    Строки отдаются по мере чтения из БД, поэтому память воркера не зависит от размера истории
+    """
+    headers = {}
+    if format == "csv":
+        headers["Content-Disposition"] = 'attachment; filename="transactions.csv"'
+
+    return StreamingResponse(
+        service.stream(
+            user_id=current_user.id,
+            fmt=format,
+            batch_size=settings.transactions_stream_batch_size,
+        ),
+        media_type=MEDIA_TYPES[format],
+        headers=headers,
+    )
+
+
+@router.get("/export", summary="Выгрузка транзакций в CSV или Parquet")
+async def export_transactions(
+    filters: TransactionFilter = Depends(),
+    format: ExportFormat = Query("csv"),
+    current_user: Principal = Depends(get_current_user),
+    service: TransactionService = Depends(get_transaction_service),
+):
+    """
+    Фильтры как у /filtered. Файл формируется по пачкам из серверного курсора
+    и отдаётся частями, поэтому объём выгрузки не ограничен памятью воркера.
+    Parquet доступен, если установлен pyarrow (extra export)
+    """
+    return StreamingResponse(
+        service.export(
+            user_id=current_user.id,
+            filters=filters,
+            fmt=format,
+            batch_size=settings.transactions_export_batch_size,
+        ),
+        media_type=MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="transactions.{format}"'},
+    )
 
 
 @router.get("/filtered", response_model=List[TransactionResponse], summary="Фильтрация и пагинация транзакций")
@@ -46,14 +160,33 @@ async def list_transactions_filtered(
     filters: TransactionFilter = Depends(),
     limit: int = Query(20, ge=1, le=100),
     offset: int = Query(0, ge=0),
-    current_user: User = Depends(get_current_user),
+    sort: TransactionSort = Query("date", description="relevance — по близости описания к search"),
+    current_user: Principal = Depends(get_current_user),
     service: TransactionService = Depends(get_transaction_service),
 ):
-    return await service.list_filtered(
+    content = await service.list_filtered(
         user_id=current_user.id,
-        filters=filters,    
+        filters=filters,
         limit=limit,
         offset=offset,
+        sort=sort,
+    )
+    return Response(content, media_type="application/json")
+
+
+@router.get("/page", response_model=TransactionPageResponse, summary="Фильтрация транзакций с курсорной пагинацией")
+async def list_transactions_page(
+    filters: TransactionFilter = Depends(),
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="next_cursor из предыдущего ответа"),
+    current_user: Principal = Depends(get_current_user),
+    service: TransactionService = Depends(get_transaction_service),
+):
+    return await service.list_page(
+        user_id=current_user.id,
+        filters=filters,
+        limit=limit,
+        cursor=cursor,
     )
 
 
@@ -61,7 +194,7 @@ async def list_transactions_filtered(
 @router.get("/{transaction_id}", response_model=TransactionResponse)
 async def get_transaction(
     transaction_id: int,
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
     service: TransactionService = Depends(get_transaction_service),
 ):
     """
@@ -78,7 +211,7 @@ async def get_transaction(
 async def update_transaction(
     transaction_id: int,
     data: TransactionUpdate,
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
     service: TransactionService = Depends(get_transaction_service),
 ):
     """
@@ -95,7 +228,7 @@ async def update_transaction(
 @router.delete("/{transaction_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_transaction(
     transaction_id: int,
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
     service: TransactionService = Depends(get_transaction_service),
 ):
     """
@@ -1,18 +1,37 @@
 # app/finance/transaction/schemas/requests.py
 from datetime import datetime
 from decimal import Decimal
-from pydantic import BaseModel
+from typing import Annotated, List
+from pydantic import AfterValidator, BaseModel, Field
+
+from app.core.config import settings
+from app.db.partitions import validate_occurred_at
+
+# Границы колонок transactions: значение за их пределами отклоняется валидацией (422),
+# а не ошибкой базы посреди INSERT
+INT4_MAX = 2**31 - 1
+AMOUNT_MAX_DIGITS = 12  # NUMERIC(12, 2)
+AMOUNT_DECIMAL_PLACES = 2
+DESCRIPTION_MAX_LENGTH = 255  # VARCHAR(255)
+
+# Дата операции ограничена окном, для которого существуют месячные секции (app/db/partitions.py)
+OccurredAt = Annotated[datetime, AfterValidator(validate_occurred_at)]
 
 
 class TransactionCreate(BaseModel):
-    category_id: int
-    amount: Decimal
-    description: str | None = None
-    occurred_at: datetime | None = None
+    category_id: int = Field(gt=0, le=INT4_MAX)
+    amount: Decimal = Field(max_digits=AMOUNT_MAX_DIGITS, decimal_places=AMOUNT_DECIMAL_PLACES)
+    description: str | None = Field(None, max_length=DESCRIPTION_MAX_LENGTH)
+    occurred_at: OccurredAt | None = None
 
 
 class TransactionUpdate(BaseModel):
-    category_id: int | None = None
-    amount: Decimal | None = None
-    description: str | None = None
-    occurred_at: datetime | None = None
+    category_id: int | None = Field(None, gt=0, le=INT4_MAX)
+    amount: Decimal | None = Field(None, max_digits=AMOUNT_MAX_DIGITS, decimal_places=AMOUNT_DECIMAL_PLACES)
+    description: str | None = Field(None, max_length=DESCRIPTION_MAX_LENGTH)
+    occurred_at: OccurredAt | None = None
+
+
+class TransactionBulkCreate(BaseModel):
+    # длина проверяется при валидации списка: лишние элементы не разбираются в модели
+    items: List[TransactionCreate] = Field(min_length=1, max_length=settings.transactions_bulk_max_items)
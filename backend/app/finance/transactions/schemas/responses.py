@@ -1,7 +1,9 @@
 # app/finance/transaction/schemas/responses.py
 from datetime import datetime
 from decimal import Decimal
-from pydantic import BaseModel, ConfigDict
+from typing import Any, List, Optional, Sequence
+from pydantic import BaseModel, ConfigDict, TypeAdapter
+from typing_extensions import TypedDict
 
 
 class TransactionResponse(BaseModel):
@@ -10,8 +12,58 @@ class TransactionResponse(BaseModel):
     category_id: int
     amount: Decimal
     description: str | None
-    occurred_at: datetime
+    occurred_at: datetime | None
     created_at: datetime
 
     class Config:
         model_config = ConfigDict(from_attributes=True)
+
+
+class TransactionRecord(TypedDict):
+    """Та же схема, что TransactionResponse, но без создания модели на каждую строку."""
+    id: int
+    user_id: int
+    category_id: int
+    amount: Decimal
+    description: Optional[str]
+    occurred_at: Optional[datetime]
+    created_at: datetime
+
+
+_TRANSACTION_LIST_ADAPTER = TypeAdapter(List[TransactionRecord])
+
+
+def dump_transaction_list(rows: Sequence[Any]) -> bytes:
+    # строки из LIST_COLUMNS сериализуются в JSON за один проход в pydantic-core,
+    # без валидации через TransactionResponse и json.dumps на стороне Python
+    return _TRANSACTION_LIST_ADAPTER.dump_json([row._asdict() for row in rows])
+
+
+class TransactionPageResponse(BaseModel):
+    items: List[TransactionResponse]
+    next_cursor: Optional[str] = None
+
+
+class TransactionBulkItemError(BaseModel):
+    index: int  # позиция элемента в запросе
+    detail: str
+
+
+class TransactionBulkResponse(BaseModel):
+    created: List[TransactionResponse]
+    errors: List[TransactionBulkItemError]
+
+
+class TransactionImportStarted(BaseModel):
+    import_id: str
+
+
+class TransactionImportProgress(BaseModel):
+    status: str  # pending, running, completed, failed
+    filename: str
+    parsed: int
+    rejected: int
+    inserted: int
+    duplicates: int
+    errors: List[str]  # первые ошибки разбора
+    error: Optional[str] = None
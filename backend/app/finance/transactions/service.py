@@ -1,23 +1,57 @@
 # app/finance/transactions/service.py
-from typing import Sequence, Dict, Any, cast
+from contextlib import contextmanager
+from typing import AsyncIterator, Iterator, Optional, Dict, Any, Union
 
-from app.finance.transactions.repository import TransactionRepository
+from sqlalchemy.exc import IntegrityError
+
+from app.finance.transactions.repository import TransactionRepository, TransactionSort, LIST_COLUMNS
+from app.finance.transactions.streaming import (
+    StreamFormat,
+    ExportFormat,
+    serialize,
+    csv_chunks,
+    parquet_chunks,
+    parquet_available,
+)
 from app.finance.categories.repository import CategoryRepository
 from app.finance.transactions.schemas.requests import (
     TransactionCreate,
     TransactionUpdate,
+    TransactionBulkCreate,
 )
 from app.finance.transactions.schemas.filters import TransactionFilter
-from app.db.models.models import Transaction
+from app.finance.transactions.schemas.responses import (
+    TransactionResponse,
+    TransactionPageResponse,
+    TransactionBulkResponse,
+    TransactionBulkItemError,
+    dump_transaction_list,
+)
+from app.finance.transactions.pagination import encode_cursor, decode_cursor
+from app.db.partitions import is_missing_partition_error
 from app.api.errors.exceptions import (
     TransactionNotFound,
     InvalidTransactionAmount,
     TransactionCategoryAccessDenied,
+    TransactionExportFormatUnavailable,
+    TransactionPeriodUnavailable,
 )
 
 ALLOWED_TRANSACTION_TYPES = {"income", "expense"}
 
 
+@contextmanager
+def _partition_required() -> Iterator[None]:
+    # Секции создаёт только app.db.partitions, а не запись пользователя: строка за месяц,
+    # секция которого ещё не создана, нарушает CHECK секции DEFAULT и отклоняется
+    try:
+        yield
+    except IntegrityError as e:
+        if is_missing_partition_error(e):
+            raise TransactionPeriodUnavailable()
+        raise
+
+
 class TransactionService:
     def __init__(
         self,
@@ -28,44 +62,104 @@ class TransactionService:
         self.category_repo = category_repo
 
     # --- CREATE ---
-    async def create(self, user_id: int, data: TransactionCreate) -> Transaction:
+    async def create(self, user_id: int, data: TransactionCreate) -> TransactionResponse:
         # 1️⃣ Валидация суммы
         if data.amount <= 0:
             raise InvalidTransactionAmount(data.amount)
 
-        # 3️⃣ Проверка доступа к категории
-        category = await self.category_repo.find_one_or_none(
-            id=data.category_id,
+        # 2️⃣ Создание транзакции вместе с проверкой доступа к категории — один запрос
+        with _partition_required():
+            row = await self.transaction_repo.create_for_user(
+                user_id,
+                {
+                    "category_id": data.category_id,
+                    "amount": data.amount,
+                    "description": data.description,
+                    "occurred_at": data.occurred_at,
+                },
+            )
+        if row is None:
+            raise TransactionCategoryAccessDenied(data.category_id)
+
+        return TransactionResponse.model_validate(row, from_attributes=True)
+
+    # --- BULK CREATE ---
+    async def create_bulk(self, user_id: int, data: TransactionBulkCreate) -> TransactionBulkResponse:
+        # все категории проверяются одним запросом
+        owned = await self.category_repo.owned_ids(
             user_id=user_id,
+            category_ids={item.category_id for item in data.items},
         )
-        if not category:
-            raise TransactionCategoryAccessDenied(data.category_id)
 
-        # 4️⃣ Создание транзакции
-        return await self.transaction_repo.add(
-            {
-                "user_id": user_id,
-                "category_id": data.category_id,
-                "amount": data.amount,
-                "description": data.description,
-                "occurred_at": data.occurred_at,
-            }
+        rows: list[Dict[str, Any]] = []
+        errors: list[TransactionBulkItemError] = []
+        for index, item in enumerate(data.items):
+            if item.amount <= 0:
+                errors.append(TransactionBulkItemError(index=index, detail=InvalidTransactionAmount(item.amount).detail))
+            elif item.category_id not in owned:
+                errors.append(TransactionBulkItemError(
+                    index=index,
+                    detail=TransactionCategoryAccessDenied(item.category_id).detail,
+                ))
+            else:
+                rows.append({
+                    "user_id": user_id,
+                    "category_id": item.category_id,
+                    "amount": item.amount,
+                    "description": item.description,
+                    "occurred_at": item.occurred_at,
+                })
+
+        with _partition_required():
+            created = await self.transaction_repo.add_many(rows) if rows else []
+
+        return TransactionBulkResponse(
+            created=[TransactionResponse.model_validate(row, from_attributes=True) for row in created],
+            errors=errors,
         )
 
     # --- LIST ---
-    async def list(self, user_id: int) -> Sequence[Transaction]:
-        return await self.transaction_repo.list_by_user(user_id=user_id)
+    async def list(self, user_id: int) -> bytes:
+        rows = await self.transaction_repo.list_by_user(user_id=user_id)
+        return dump_transaction_list(rows)
+
+    # --- STREAM ---
+    def stream(self, user_id: int, fmt: StreamFormat, batch_size: int) -> AsyncIterator[str]:
+        partitions = self.transaction_repo.stream_by_user(user_id=user_id, batch_size=batch_size)
+        columns = [column.key for column in LIST_COLUMNS]
+        return serialize(fmt, columns, partitions)
+
+    # --- EXPORT ---
+    def export(
+        self,
+        user_id: int,
+        filters: TransactionFilter,
+        fmt: ExportFormat,
+        batch_size: int,
+    ) -> Union[AsyncIterator[str], AsyncIterator[bytes]]:
+        # проверяется до начала ответа: после первого куска статус уже не изменить
+        if fmt == "parquet" and not parquet_available():
+            raise TransactionExportFormatUnavailable(fmt)
+
+        partitions = self.transaction_repo.stream_by_user(
+            user_id=user_id,
+            batch_size=batch_size,
+            **filters.model_dump(exclude_none=True),
+        )
+        if fmt == "parquet":
+            return parquet_chunks(LIST_COLUMNS, partitions)
+        return csv_chunks([column.key for column in LIST_COLUMNS], partitions)
 
     # --- GET BY ID ---
-    async def get_by_id(self, user_id: int, transaction_id: int) -> Transaction:
-        transaction = await self.transaction_repo.get_by_id_for_user(
+    async def get_by_id(self, user_id: int, transaction_id: int) -> TransactionResponse:
+        row = await self.transaction_repo.get_by_id_for_user(
             transaction_id=transaction_id,
             user_id=user_id,
         )
-        if not transaction:
+        if not row:
             raise TransactionNotFound(transaction_id)
 
-        return transaction
+        return TransactionResponse.model_validate(row, from_attributes=True)
 
     # --- UPDATE ---
     async def update(
@@ -73,9 +167,7 @@ class TransactionService:
         user_id: int,
         transaction_id: int,
         data: TransactionUpdate,
-    ) -> Transaction:
-        transaction = await self.get_by_id(user_id, transaction_id)
-
+    ) -> TransactionResponse:
         update_data: Dict[str, Any] = {}
 
         if data.amount is not None:
@@ -84,12 +176,6 @@ class TransactionService:
             update_data["amount"] = data.amount
 
         if data.category_id is not None:
-            category = await self.category_repo.find_one_or_none(
-                id=data.category_id,
-                user_id=user_id,
-            )
-            if not category:
-                raise TransactionCategoryAccessDenied(data.category_id)
             update_data["category_id"] = data.category_id
 
         if data.description is not None:
@@ -98,20 +184,34 @@ class TransactionService:
         if data.occurred_at is not None:
             update_data["occurred_at"] = data.occurred_at
 
-        updated = await self.transaction_repo.update(
-            model_id=transaction.id,
-            data=update_data,
-        )
+        if not update_data:
+            return await self.get_by_id(user_id, transaction_id)
 
-        return cast(Transaction, updated)
+        with _partition_required():
+            row = await self.transaction_repo.update_for_user(
+                transaction_id=transaction_id,
+                user_id=user_id,
+                data=update_data,
+            )
+        if row is None:
+            # дополнительный запрос только при ошибке: отличаем чужую категорию от отсутствующей транзакции
+            if data.category_id is not None and await self.transaction_repo.get_by_id_for_user(
+                transaction_id=transaction_id,
+                user_id=user_id,
+            ):
+                raise TransactionCategoryAccessDenied(data.category_id)
+            raise TransactionNotFound(transaction_id)
+
+        return TransactionResponse.model_validate(row, from_attributes=True)
 
     # --- DELETE ---
     async def delete(self, user_id: int, transaction_id: int) -> None:
-        await self.get_by_id(user_id, transaction_id)
-        await self.transaction_repo.delete_for_user(
+        deleted = await self.transaction_repo.delete_for_user(
             transaction_id=transaction_id,
             user_id=user_id,
         )
+        if not deleted:
+            raise TransactionNotFound(transaction_id)
 
     async def list_filtered(
         self,
@@ -119,10 +219,39 @@ class TransactionService:
         filters: TransactionFilter,
         limit: int,
         offset: int,
-    ):
-        return await self.transaction_repo.list_by_user_filtered(
+        sort: TransactionSort = "date",
+    ) -> bytes:
+        rows = await self.transaction_repo.list_by_user_filtered(
             user_id=user_id,
             **filters.model_dump(exclude_none=True),  # ✅ распаковка
             limit=limit,
             offset=offset,
+            sort=sort,
+        )
+        return dump_transaction_list(rows)
+
+    async def list_page(
+        self,
+        user_id: int,
+        filters: TransactionFilter,
+        limit: int,
+        cursor: Optional[str] = None,
+    ) -> TransactionPageResponse:
+        # берём на одну строку больше, чтобы узнать, есть ли следующая страница
+        rows = await self.transaction_repo.list_by_user_after(
+            user_id=user_id,
+            **filters.model_dump(exclude_none=True),
+            after=decode_cursor(cursor) if cursor else None,
+            limit=limit + 1,
+        )
+
+        items = rows[:limit]
+        next_cursor = None
+        if len(rows) > limit:
+            last = items[-1]
+            next_cursor = encode_cursor(last.occurred_at, last.id)
+
+        return TransactionPageResponse(
+            items=[TransactionResponse.model_validate(row, from_attributes=True) for row in items],
+            next_cursor=next_cursor,
         )
@@ -0,0 +1,142 @@
+# app/finance/transactions/streaming.py
+import csv
+import io
+import json
+from datetime import datetime
+from decimal import Decimal
+from typing import Any, AsyncIterator, Literal, Sequence
+
+from sqlalchemy import DateTime, Integer, Numeric, Row
+from sqlalchemy.orm import InstrumentedAttribute
+
+StreamFormat = Literal["ndjson", "csv"]
+ExportFormat = Literal["csv", "parquet"]
+
+MEDIA_TYPES: dict[str, str] = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv; charset=utf-8",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+
+def _json_default(value: Any) -> str:
+    if isinstance(value, Decimal):
+        return str(value)
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Тип {type(value).__name__} не сериализуется в JSON")
+
+
+async def ndjson_chunks(columns: Sequence[str], partitions: AsyncIterator[Sequence[Row]]) -> AsyncIterator[str]:
+    # одна пачка строк из курсора — один кусок ответа
+    async for rows in partitions:
+        yield "".join(
+            json.dumps(dict(zip(columns, row)), default=_json_default, ensure_ascii=False) + "\n"
+            for row in rows
+        )
+
+
+# Ячейка, начинающаяся с этих символов, открывается в Excel и LibreOffice как формула
+CSV_FORMULA_PREFIXES = ("=", "+", "-", "@", "\t", "\r")
+
+
+def _csv_cell(value: Any) -> Any:
+    # апостроф заставляет табличный редактор показать текст как есть, а не выполнить его
+    if isinstance(value, str) and value.startswith(CSV_FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+async def csv_chunks(columns: Sequence[str], partitions: AsyncIterator[Sequence[Row]]) -> AsyncIterator[str]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+
+    async for rows in partitions:
+        writer.writerows([_csv_cell(value) for value in row] for row in rows)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+
+    # заголовок отдаём даже для пустой истории
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def parquet_available() -> bool:
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+class _ChunkSink(io.RawIOBase):
+    """Файл для ParquetWriter: записанные байты копятся до drain() и отдаются клиенту."""
+
+    def __init__(self) -> None:
+        self._chunks: list[bytes] = []
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data: Any) -> int:
+        chunk = bytes(data)
+        self._chunks.append(chunk)
+        self._position += len(chunk)
+        return len(chunk)
+
+    def tell(self) -> int:
+        return self._position
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def _arrow_type(column: InstrumentedAttribute[Any]) -> Any:
+    import pyarrow as pa
+
+    column_type = column.type
+    if isinstance(column_type, Integer):
+        return pa.int64()
+    if isinstance(column_type, Numeric):
+        return pa.decimal128(column_type.precision or 38, column_type.scale or 0)
+    if isinstance(column_type, DateTime):
+        return pa.timestamp("us", tz="UTC")
+    return pa.string()
+
+
+async def parquet_chunks(
+    columns: Sequence[InstrumentedAttribute[Any]],
+    partitions: AsyncIterator[Sequence[Row]],
+) -> AsyncIterator[bytes]:
+    """
+    Каждая пачка строк из курсора становится колоночными массивами и отдельной row group:
+    сразу после записи её байты уходят клиенту, в конце дописывается футер файла.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.schema([(column.key, _arrow_type(column)) for column in columns])
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(sink, schema)
+    try:
+        async for rows in partitions:
+            arrays = [
+                pa.array(values, type=field.type)
+                for values, field in zip(zip(*rows), schema)
+            ]
+            writer.write_batch(pa.RecordBatch.from_arrays(arrays, schema=schema))
+            yield sink.drain()
+    finally:
+        writer.close()
+    yield sink.drain()
+
+
+def serialize(fmt: StreamFormat, columns: Sequence[str], partitions: AsyncIterator[Sequence[Row]]) -> AsyncIterator[str]:
+    if fmt == "csv":
+        return csv_chunks(columns, partitions)
+    return ndjson_chunks(columns, partitions)
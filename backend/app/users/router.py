@@ -1,5 +1,5 @@
 from fastapi import APIRouter, status, Depends, Request
-from app.api.dependencies.auth_dep import get_current_user
+from app.api.dependencies.auth_dep import get_current_user_model
 from app.users.schemas.responses import UserBaseResponse
 from app.api.dependencies.limiter import limiter
 from app.db.models.models import User
@@ -9,9 +9,9 @@ router = APIRouter(prefix="/users", tags=["Пользователи"])
 
 
 @router.get("/profile", response_model=UserBaseResponse, status_code=status.HTTP_200_OK)
-@limiter.limit("5/minute")
+@limiter.limit("5/minute", key="user")
 async def get_current_user_profile(
     request: Request,
-    current_user: User = Depends(get_current_user),
+    current_user: User = Depends(get_current_user_model),
     ) -> UserBaseResponse:
     return UserBaseResponse.model_validate(current_user)
\ No newline at end of file
@@ -0,0 +1,157 @@
+"""
+Бенчмарк поиска по описанию транзакций: ILIKE '%...%' без индекса, с глобальным триграммным
+GIN-индексом по description и с составным (user_id, description gin_trgm_ops) через btree_gin.
+
+Создаёт отдельную таблицу bench_transactions (по умолчанию 10M строк), замеряет задержку
+одних и тех же поисковых запросов на каждом этапе и удаляет таблицу. Частые слова («кофе», «такс»)
+встречаются у каждого пользователя — на них разница между глобальным и составным индексом
+заметнее всего. Рабочие таблицы приложения не затрагиваются.
+Нужен Postgres с доступными расширениями pg_trgm и btree_gin.
+
+    cd backend && python scripts/benchmark_description_search.py [--rows 10000000] [--dsn ...] [--keep]
+"""
+import argparse
+import asyncio
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from sqlalchemy import text  # noqa: E402
+from sqlalchemy.ext.asyncio import AsyncConnection, create_async_engine  # noqa: E402
+
+from app.core.config import settings  # noqa: E402
+from app.finance.transactions.repository import escape_like  # noqa: E402
+
+WORDS = [
+    "кофе", "такси", "продукты", "аренда", "зарплата", "кино", "аптека", "бензин", "ресторан", "подписка",
+    "coffee", "uber", "grocery", "netflix", "spotify", "amazon", "salary", "rent", "pharmacy", "parking",
+]
+TERMS = ["кофе", "такс", "netfl", "аптека 12", "grocery store", "parking 7", "несуществующее"]
+
+SETUP_SQL = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE EXTENSION IF NOT EXISTS btree_gin",
+    "DROP TABLE IF EXISTS bench_transactions",
+    """
+    CREATE UNLOGGED TABLE bench_transactions (
+        id bigint PRIMARY KEY,
+        user_id integer NOT NULL,
+        description varchar(255),
+        occurred_at timestamptz
+    )
+    """,
+    # описания — случайные сочетания двух слов и номера, как у реальных операций
+    """
+    INSERT INTO bench_transactions
+    SELECT g,
+           1 + (g % CAST(:users AS int)),
+           words[1 + floor(random() * array_length(words, 1))::int] || ' '
+               || words[1 + floor(random() * array_length(words, 1))::int] || ' ' || (g % 1000),
+           now() - (g || ' seconds')::interval
+    FROM generate_series(1, CAST(:rows AS bigint)) AS g,
+         (SELECT CAST(:words AS text[]) AS words) AS w
+    """,
+    "CREATE INDEX ON bench_transactions (user_id, occurred_at DESC NULLS LAST, id DESC)",
+    "ANALYZE bench_transactions",
+]
+
+SEARCH_SQL = """
+SELECT id, description FROM bench_transactions
+WHERE {user_filter} description ILIKE :pattern ESCAPE '\\'
+ORDER BY occurred_at DESC NULLS LAST, id DESC
+LIMIT 20
+"""
+
+
+async def _measure(conn: AsyncConnection, sql: str, params: dict, repeats: int) -> list[float]:
+    timings = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        await conn.execute(text(sql), params)
+        timings.append((time.perf_counter() - started) * 1000)
+    return timings
+
+
+async def _run_suite(conn: AsyncConnection, user_id: int, repeats: int) -> dict[str, list[float]]:
+    results: dict[str, list[float]] = {}
+    for scope, user_filter in (("all users", ""), ("one user", "user_id = :user_id AND")):
+        sql = SEARCH_SQL.format(user_filter=user_filter)
+        for term in TERMS:
+            params = {"pattern": f"%{escape_like(term)}%", "user_id": user_id}
+            results[f"{scope}: {term}"] = await _measure(conn, sql, params, repeats)
+    return results
+
+
+# этапы замера: название -> SQL, выполняемый перед ним
+STAGES = {
+    "без индекса": [],
+    "description": [
+        "CREATE INDEX bench_transactions_description_trgm "
+        "ON bench_transactions USING gin (description gin_trgm_ops)",
+    ],
+    "user_id + description": [
+        "DROP INDEX bench_transactions_description_trgm",
+        "CREATE INDEX bench_transactions_user_description_trgm "
+        "ON bench_transactions USING gin (user_id, description gin_trgm_ops)",
+    ],
+}
+
+
+def _report(results: dict[str, dict[str, list[float]]]) -> None:
+    p95 = lambda values: values[min(len(values) - 1, int(len(values) * 0.95))]  # noqa: E731
+    header = "".join(f" {stage + ', p50/p95':>30}" for stage in results)
+    print(f"{'запрос':<32}{header}")
+    names = next(iter(results.values()))
+    for name in names:
+        line = f"{name:<32}"
+        for stage in results.values():
+            timings = sorted(stage[name])
+            line += f" {f'{statistics.median(timings):.1f} / {p95(timings):.1f} ms':>30}"
+        print(line)
+
+
+async def main(dsn: str, rows: int, users: int, repeats: int, keep: bool) -> None:
+    engine = create_async_engine(dsn, isolation_level="AUTOCOMMIT")
+    try:
+        async with engine.connect() as conn:
+            print(f"Заполнение bench_transactions: {rows} строк...")
+            started = time.perf_counter()
+            params = {"rows": rows, "users": users, "words": WORDS}
+            for sql in SETUP_SQL:
+                await conn.execute(text(sql), params)
+            print(f"готово за {time.perf_counter() - started:.0f} с")
+
+            # один и тот же пользователь на всех этапах, чтобы замеры были сравнимы
+            user_id = random.randint(1, users)
+            results: dict[str, dict[str, list[float]]] = {}
+            for stage, statements in STAGES.items():
+                if statements:
+                    started = time.perf_counter()
+                    for sql in statements:
+                        await conn.execute(text(sql))
+                    await conn.execute(text("ANALYZE bench_transactions"))
+                    print(f"Индекс «{stage}» построен за {time.perf_counter() - started:.0f} с")
+                results[stage] = await _run_suite(conn, user_id, repeats)
+
+            _report(results)
+
+            if not keep:
+                await conn.execute(text("DROP TABLE bench_transactions"))
+    finally:
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Бенчмарк триграммного поиска по описанию")
+    parser.add_argument("--dsn", default=settings.database_url.unicode_string())
+    parser.add_argument("--rows", type=int, default=10_000_000)
+    parser.add_argument("--users", type=int, default=10_000)
+    parser.add_argument("--repeats", type=int, default=20)
+    parser.add_argument("--keep", action="store_true", help="Не удалять таблицу после замера")
+    args = parser.parse_args()
+
+    asyncio.run(main(args.dsn, args.rows, args.users, args.repeats, args.keep))
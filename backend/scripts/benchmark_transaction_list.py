@@ -0,0 +1,166 @@
+"""
+Бенчмарк выдачи списка транзакций: строк в секунду до и после перехода на проекцию колонок.
+
+«до» — ORM-сущности Transaction, валидация в TransactionResponse и сериализация так,
+как это делает FastAPI для response_model (dump_python(mode="json") + json.dumps);
+«после» — кортежи LIST_COLUMNS из репозитория и dump_transaction_list.
+
+С базой данных тестовый пользователь с --rows транзакциями создаётся внутри транзакции,
+которая в конце откатывается. С --serialization-only база не нужна: строки генерируются
+в памяти и сравнивается только сериализация.
+
+    cd backend && python scripts/benchmark_transaction_list.py [--rows 100000] [--dsn ...] [--serialization-only]
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import sys
+import time
+from collections import namedtuple
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+from pathlib import Path
+from typing import Any, Awaitable, Callable, List, Sequence
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from pydantic import TypeAdapter  # noqa: E402
+from sqlalchemy import select, text  # noqa: E402
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine  # noqa: E402
+
+from app.core.config import settings  # noqa: E402
+from app.db.models.models import Transaction  # noqa: E402
+from app.finance.transactions.repository import LIST_COLUMNS, TransactionRepository  # noqa: E402
+from app.finance.transactions.schemas.responses import TransactionResponse, dump_transaction_list  # noqa: E402
+
+SEED_SQL = [
+    """
+    INSERT INTO users (email, first_name, last_name, hashed_password, is_active, created_at, email_confirmed)
+    VALUES ('list-bench@example.com', 'List', 'Bench', 'x', true, now(), true)
+    """,
+    """
+    INSERT INTO categories (user_id, name, type)
+    SELECT id, 'bench', 'expense' FROM users WHERE email = 'list-bench@example.com'
+    """,
+    # в DEFAULT только строки без даты: секции месяцев заполнения создаются до вставки
+    """
+    SELECT create_transactions_partition(month::date)
+    FROM generate_series(
+        date_trunc('month', (now() - (CAST(:rows AS int) || ' minutes')::interval) AT TIME ZONE 'UTC'),
+        date_trunc('month', now() AT TIME ZONE 'UTC'),
+        interval '1 month'
+    ) AS month
+    """,
+    """
+    INSERT INTO transactions (user_id, category_id, amount, description, occurred_at)
+    SELECT c.user_id, c.id, (random() * 1000 + 1)::numeric(12, 2), 'list bench ' || g,
+           now() - (g || ' minutes')::interval
+    FROM categories c
+    JOIN users u ON u.id = c.user_id AND u.email = 'list-bench@example.com'
+    CROSS JOIN generate_series(1, CAST(:rows AS int)) AS g
+    """,
+    "ANALYZE transactions",
+]
+
+_RESPONSE_LIST_ADAPTER = TypeAdapter(List[TransactionResponse])
+
+
+def serialize_before(entities: Sequence[Any]) -> bytes:
+    # путь FastAPI для response_model=List[TransactionResponse]
+    validated = _RESPONSE_LIST_ADAPTER.validate_python(entities, from_attributes=True)
+    return json.dumps(_RESPONSE_LIST_ADAPTER.dump_python(validated, mode="json"), ensure_ascii=False).encode()
+
+
+async def _best(run: Callable[[], Awaitable[int]], repeats: int) -> float:
+    timings = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        await run()
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings)
+
+
+def _report(rows: int, results: dict[str, float]) -> None:
+    print(f"{'вариант':<40} {'время, с':>10} {'строк/с':>12}")
+    for name, seconds in results.items():
+        print(f"{name:<40} {seconds:>10.3f} {rows / seconds:>12,.0f}")
+
+
+async def serialization_only(rows: int, repeats: int) -> None:
+    now = datetime.now(timezone.utc)
+    entities = [
+        Transaction(
+            id=i, user_id=1, category_id=1, amount=Decimal("123.45"),
+            description=f"list bench {i}", occurred_at=now - timedelta(minutes=i), created_at=now,
+        )
+        for i in range(rows)
+    ]
+    Record = namedtuple("Record", [column.key for column in LIST_COLUMNS])  # type: ignore[misc]
+    records = [Record(*(getattr(entity, column.key) for column in LIST_COLUMNS)) for entity in entities]
+
+    async def before() -> int:
+        return len(serialize_before(entities))
+
+    async def after() -> int:
+        return len(dump_transaction_list(records))  # type: ignore[arg-type]
+
+    _report(rows, {
+        "до: ORM + response_model": await _best(before, repeats),
+        "после: кортежи + dump_transaction_list": await _best(after, repeats),
+    })
+
+
+async def with_database(dsn: str, rows: int, repeats: int) -> None:
+    engine = create_async_engine(dsn)
+    try:
+        async with engine.connect() as conn:
+            transaction = await conn.begin()
+            try:
+                print(f"Заполнение: {rows} транзакций...")
+                for sql in SEED_SQL:
+                    await conn.execute(text(sql), {"rows": rows})
+                user_id = (await conn.execute(
+                    text("SELECT id FROM users WHERE email = 'list-bench@example.com'")
+                )).scalar_one()
+
+                session = AsyncSession(bind=conn)
+
+                async def before() -> int:
+                    result = await session.execute(select(Transaction).where(Transaction.user_id == user_id))
+                    entities = result.scalars().all()
+                    size = len(serialize_before(entities))
+                    session.expunge_all()
+                    return size
+
+                async def after() -> int:
+                    records = await TransactionRepository(session).list_by_user(user_id)
+                    return len(dump_transaction_list(records))
+
+                _report(rows, {
+                    "до: select(Transaction) + response_model": await _best(before, repeats),
+                    "после: LIST_COLUMNS + dump_transaction_list": await _best(after, repeats),
+                })
+                await session.close()
+            finally:
+                await transaction.rollback()
+    finally:
+        await engine.dispose()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Бенчмарк выдачи списка транзакций")
+    parser.add_argument("--dsn", default=settings.database_url.unicode_string())
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--serialization-only", action="store_true")
+    args = parser.parse_args()
+
+    if args.serialization_only:
+        asyncio.run(serialization_only(args.rows, args.repeats))
+    else:
+        asyncio.run(with_database(args.dsn, args.rows, args.repeats))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,323 @@
+"""
+Проверка планов запросов репозиториев к таблице transactions.
+
+Тест заполняет базу из docker-compose тестовыми данными внутри транзакции (в конце она откатывается),
+выполняет EXPLAIN для каждого запроса, который строят репозитории, и падает, если в плане есть
+Seq Scan по transactions или её секциям, сортировка там, где порядок должен давать индекс,
+или запрос с фильтром по датам читает больше месячных секций, чем покрывает период.
+
+    docker compose up -d db
+    cd backend && alembic upgrade head && python -m pytest tests/test_query_plans.py
+
+Адрес базы берётся из DATABASE_URL (.env), его можно переопределить переменной PLAN_CHECK_DSN.
+"""
+import asyncio
+import json
+import os
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Any, Awaitable, Callable, Iterator, Optional
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.ext.asyncio import AsyncConnection, create_async_engine
+
+from app.core.config import settings
+from app.finance.analytics.repository import AnalyticsRepository
+from app.finance.reports.repository import DigestRepository
+from app.finance.transactions.repository import TransactionRepository
+
+SORT_NODES = {"Sort", "Incremental Sort"}
+
+USERS = 100
+CATEGORIES = 5
+PER_CATEGORY_MONTH = 4  # строк на категорию в каждой месячной секции
+
+SEED_SQL = [
+    """
+    INSERT INTO users (email, first_name, last_name, hashed_password, is_active, created_at, email_confirmed)
+    SELECT 'plan-check-' || g || '@example.com', 'Plan', 'Check', 'x', true, now(), true
+    FROM generate_series(1, :users) AS g
+    """,
+    """
+    INSERT INTO categories (user_id, name, type)
+    SELECT u.id, 'category-' || c, CASE WHEN c = 1 THEN 'income' ELSE 'expense' END
+    FROM users u CROSS JOIN generate_series(1, :categories) AS c
+    WHERE u.email LIKE 'plan-check-%'
+    """,
+    # секции, которые читают проверки с периодом: прошлый и текущий месяц и месяцы наперёд
+    """
+    SELECT create_transactions_partition(month::date)
+    FROM generate_series(
+        date_trunc('month', now() AT TIME ZONE 'UTC') - interval '1 month',
+        date_trunc('month', now() AT TIME ZONE 'UTC') + make_interval(months => CAST(:months_ahead AS int)),
+        interval '1 month'
+    ) AS month
+    """,
+    # строки попадают в каждую месячную секцию: у пустой секции после ANALYZE Seq Scan честно
+    # самый дешёвый план, и проверка не отличила бы его от пропущенного индекса
+    """
+    INSERT INTO transactions (user_id, category_id, amount, description, occurred_at)
+    SELECT c.user_id, c.id, (random() * 1000 + 1)::numeric(12, 2), 'plan check ' || g,
+           p.month_start + g * interval '6 days 1 hour'
+    FROM (
+        SELECT to_date(substring(c.relname FROM 'transactions_p(\\d{4}_\\d{2})'), 'YYYY_MM')::timestamp
+               AT TIME ZONE 'UTC' AS month_start
+        FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = 'transactions'::regclass AND c.relname ~ '^transactions_p\\d{4}_\\d{2}$'
+    ) AS p
+    CROSS JOIN categories c
+    JOIN users u ON u.id = c.user_id AND u.email LIKE 'plan-check-%'
+    CROSS JOIN generate_series(1, :per_category_month) AS g
+    """,
+    # в DEFAULT только строки без даты
+    """
+    INSERT INTO transactions (user_id, category_id, amount, description, occurred_at)
+    SELECT c.user_id, c.id, (random() * 1000 + 1)::numeric(12, 2), 'plan check undated ' || g, NULL
+    FROM categories c
+    JOIN users u ON u.id = c.user_id AND u.email LIKE 'plan-check-%'
+    CROSS JOIN generate_series(1, :per_category_month) AS g
+    """,
+    "ANALYZE users",
+    "ANALYZE categories",
+    "ANALYZE transactions",
+]
+
+
+class RecordingSession:
+    """Подставляется в репозиторий вместо AsyncSession и запоминает построенные запросы."""
+
+    def __init__(self) -> None:
+        self.statements: list[Any] = []
+
+    async def execute(self, statement: Any, *args: Any, **kwargs: Any) -> Any:
+        self.statements.append(statement)
+        return _EmptyResult()
+
+    async def stream(self, statement: Any, *args: Any, **kwargs: Any) -> Any:
+        self.statements.append(statement)
+        return _EmptyResult()
+
+    async def commit(self) -> None:
+        pass
+
+
+class _EmptyResult:
+    def scalars(self) -> "_EmptyResult":
+        return self
+
+    def all(self) -> list[Any]:
+        return []
+
+    def scalar(self) -> None:
+        return None
+
+    def scalar_one_or_none(self) -> None:
+        return None
+
+    def one_or_none(self) -> None:
+        return None
+
+    def __iter__(self) -> Iterator[Any]:
+        return iter(())
+
+    async def partitions(self) -> Any:
+        return
+        yield
+
+
+@dataclass
+class PlanCheck:
+    name: str
+    build: Callable[[Any], Awaitable[Any]]
+    repository: type
+    # Сортировка допустима только там, где её не может дать индекс (поиск по GIN-индексу),
+    # и только top-N под LIMIT: в памяти держится не больше limit строк
+    allow_top_n_sort: bool = False
+    max_partitions: Optional[int] = None  # сколько секций transactions может прочитать запрос
+
+
+def _walk(plan: dict[str, Any], parent: Optional[dict[str, Any]] = None) -> Iterator[tuple[dict[str, Any], Optional[dict[str, Any]]]]:
+    yield plan, parent
+    for child in plan.get("Plans", []):
+        yield from _walk(child, plan)
+
+
+async def _capture(check: PlanCheck) -> list[str]:
+    session = RecordingSession()
+    result = check.build(check.repository(session))
+    if hasattr(result, "__anext__"):
+        async for _ in result:
+            pass
+    else:
+        await result
+
+    # запросы из нескольких шагов (list_by_user_after с хвостом без даты) проверяются целиком
+    return [
+        str(statement.compile(dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True}))
+        for statement in session.statements
+    ]
+
+
+def _checks(user_id: int, category_id: int, user_ids: list[int]) -> list[PlanCheck]:
+    now = datetime.now(timezone.utc)
+    week_ago = now - timedelta(days=7)
+    month_ago = now - timedelta(days=30)
+    return [
+        PlanCheck("list_by_user", lambda r: r.list_by_user(user_id), TransactionRepository),
+        PlanCheck("get_by_id_for_user", lambda r: r.get_by_id_for_user(1, user_id), TransactionRepository),
+        PlanCheck("list_by_user_filtered", lambda r: r.list_by_user_filtered(user_id, limit=20, offset=40), TransactionRepository),
+        PlanCheck(
+            "list_by_user_filtered(date range)",
+            lambda r: r.list_by_user_filtered(user_id, date_from=week_ago, date_to=now, limit=20),
+            TransactionRepository,
+            max_partitions=2,
+        ),
+        PlanCheck(
+            "list_by_user_filtered(last 30 days)",
+            lambda r: r.list_by_user_filtered(user_id, date_from=month_ago, limit=20),
+            TransactionRepository,
+            # без верхней границы: прошлый и текущий месяц, секции наперёд и DEFAULT
+            max_partitions=3 + settings.transactions_partition_months_ahead,
+        ),
+        PlanCheck(
+            "list_by_user_filtered(search)",
+            lambda r: r.list_by_user_filtered(user_id, search="check 1", limit=20),
+            TransactionRepository,
+            allow_top_n_sort=True,
+        ),
+        PlanCheck("list_by_user_after(first page)", lambda r: r.list_by_user_after(user_id, limit=21), TransactionRepository),
+        PlanCheck(
+            "list_by_user_after(cursor)",
+            lambda r: r.list_by_user_after(user_id, after=(week_ago, 1_000_000), limit=21),
+            TransactionRepository,
+        ),
+        PlanCheck(
+            "list_by_user_after(undated tail)",
+            lambda r: r.list_by_user_after(user_id, after=(None, 1_000_000), limit=21),
+            TransactionRepository,
+        ),
+        PlanCheck("stream_by_user", lambda r: r.stream_by_user(user_id, batch_size=1000), TransactionRepository),
+        PlanCheck(
+            "stream_by_user(export, date range)",
+            lambda r: r.stream_by_user(user_id, batch_size=1000, date_from=week_ago, date_to=now),
+            TransactionRepository,
+            max_partitions=2,
+        ),
+        PlanCheck(
+            "sum_amounts_by_category",
+            lambda r: r.sum_amounts_by_category(user_id, category_id),
+            TransactionRepository,
+        ),
+        PlanCheck("analytics.summary", lambda r: r.summary(user_id), AnalyticsRepository),
+        PlanCheck("analytics.by_category", lambda r: r.by_category(user_id), AnalyticsRepository),
+        PlanCheck(
+            "analytics.summary(date range)",
+            lambda r: r.summary(user_id, date_from=week_ago, date_to=now),
+            AnalyticsRepository,
+            max_partitions=2,
+        ),
+        PlanCheck(
+            "analytics.by_category(date range)",
+            lambda r: r.by_category(user_id, date_from=week_ago, date_to=now),
+            AnalyticsRepository,
+            max_partitions=2,
+        ),
+        PlanCheck(
+            "digest.weekly_totals",
+            lambda r: r.weekly_totals(user_ids, week_ago, now),
+            DigestRepository,
+            max_partitions=2,
+        ),
+    ]
+
+
+CHECK_NAMES = [check.name for check in _checks(0, 0, [])]
+
+
+async def _explain(conn: AsyncConnection, sql: str) -> dict[str, Any]:
+    result = await conn.execute(text(f"EXPLAIN (FORMAT JSON) {sql}"))
+    plan = result.scalar_one()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return plan[0]["Plan"]
+
+
+def _problems(check: PlanCheck, plan: dict[str, Any]) -> list[str]:
+    problems = []
+    partitions = set()
+    for node, parent in _walk(plan):
+        # у секционированной таблицы в плане указаны секции: transactions_p2026_10, transactions_default
+        relation = node.get("Relation Name", "")
+        if relation.startswith("transactions"):
+            partitions.add(relation)
+            if node["Node Type"] == "Seq Scan":
+                problems.append(f"Seq Scan on {relation}")
+        if node["Node Type"] in SORT_NODES:
+            top_n = parent is not None and parent["Node Type"] == "Limit"
+            if not (check.allow_top_n_sort and top_n):
+                problems.append(f"{node['Node Type']} ({', '.join(node.get('Sort Key', []))})")
+    if check.max_partitions is not None and len(partitions) > check.max_partitions:
+        problems.append(f"секций прочитано {len(partitions)}: {', '.join(sorted(partitions))}")
+    return problems
+
+
+async def _collect_plans(dsn: str) -> dict[str, list[tuple[str, dict[str, Any]]]]:
+    engine = create_async_engine(dsn)
+    plans: dict[str, list[tuple[str, dict[str, Any]]]] = {}
+    try:
+        async with engine.connect() as conn:
+            transaction = await conn.begin()
+            try:
+                params = {
+                    "users": USERS,
+                    "categories": CATEGORIES,
+                    "per_category_month": PER_CATEGORY_MONTH,
+                    "months_ahead": settings.transactions_partition_months_ahead,
+                }
+                for sql in SEED_SQL:
+                    await conn.execute(text(sql), params)
+
+                user_ids = list((await conn.execute(
+                    text("SELECT id FROM users WHERE email LIKE 'plan-check-%' ORDER BY id")
+                )).scalars())
+                user_id = user_ids[len(user_ids) // 2]
+                category_id = (await conn.execute(
+                    text("SELECT id FROM categories WHERE user_id = :user_id LIMIT 1"), {"user_id": user_id}
+                )).scalar_one()
+
+                for check in _checks(user_id, category_id, user_ids[:50]):
+                    plans[check.name] = [
+                        (sql, await _explain(conn, sql)) for sql in await _capture(check)
+                    ]
+            finally:
+                await transaction.rollback()
+    finally:
+        await engine.dispose()
+
+    return plans
+
+
+@pytest.fixture(scope="module")
+def plans() -> dict[str, list[tuple[str, dict[str, Any]]]]:
+    dsn = os.environ.get("PLAN_CHECK_DSN", settings.database_url.unicode_string())
+    try:
+        return asyncio.run(_collect_plans(dsn))
+    except (OSError, ConnectionError) as e:
+        pytest.skip(f"база для проверки планов недоступна ({dsn}): {e}")
+
+
+@pytest.mark.parametrize("name", CHECK_NAMES)
+def test_query_plan(plans: dict[str, list[tuple[str, dict[str, Any]]]], name: str) -> None:
+    check = next(check for check in _checks(0, 0, []) if check.name == name)
+    assert plans[name], "репозиторий не выполнил ни одного запроса"
+
+    failures = []
+    for sql, plan in plans[name]:
+        problems = _problems(check, plan)
+        if problems:
+            failures.append(f"{'; '.join(problems)}\n{sql}")
+
+    assert not failures, "\n\n".join(failures)